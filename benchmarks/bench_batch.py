@@ -0,0 +1,48 @@
+"""
+Compares single-book edits committed one by one with the same edits grouped in one batch
+Run from the repository root: python -m benchmarks.bench_batch [edits]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.performance import PerformanceProfile, SQLITE_DEFAULT_PRAGMAS
+
+
+def edit_books(manager, books):
+    for book in books:
+        book.copies += 1
+        manager.save_book()
+
+
+def edit_books_in_batch(manager, books):
+    with manager.batch():
+        edit_books(manager, books)
+
+
+def run(edits):
+    table = make_table(edits)
+    for profile_name, profile in (("sqlite defaults", PerformanceProfile(**SQLITE_DEFAULT_PRAGMAS)),
+                                  ("profile", PerformanceProfile())):
+        for name, function in (("one by one", edit_books), ("batch", edit_books_in_batch)):
+            directory = tempfile.mkdtemp() + "/"
+            try:
+                manager = BookcaseDbManager(directory, db_name="bench", profile=profile)
+                manager.create_db()
+                manager.import_table(table)
+                books = manager.get_all_books()
+                start = time.perf_counter()
+                function(manager, books)
+                elapsed = time.perf_counter() - start
+                manager.cleanup()
+                print("{profile:>15}, {name:>10}: {edits} edits in {elapsed:.2f}s ({rate:.0f} edits/s)".format(
+                    profile=profile_name, name=name, edits=edits, elapsed=elapsed, rate=edits / elapsed))
+            finally:
+                shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,55 @@
+"""
+Compares importing many Excel files one by one with the parallel batch importer at several worker counts,
+the workers parse the sheets while the writer imports their validated chunks
+Run from the repository root: python -m benchmarks.bench_batch_import [files] [rows per file] [worker counts, e.g. 1,2,4]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_excel.batch_import import BatchImporter
+from bookcase_excel.bookcase_excel import Excel
+
+
+def import_serially(directory, manager, filenames):
+    for filename in filenames:
+        manager.import_table(Excel(directory).iter_excel(filename))
+
+
+def import_in_parallel(directory, manager, filenames, workers):
+    BatchImporter(directory, workers).import_files(manager, filenames)
+
+
+def runs(worker_counts):
+    yield "serial", import_serially
+    for workers in worker_counts:
+        yield ("{} worker{}".format(workers, "" if workers == 1 else "s"),
+               lambda *args, workers=workers: import_in_parallel(*args, workers=workers))
+
+
+def run(files, rows, worker_counts):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        table = make_table(rows)
+        filenames = [os.path.basename(Excel(directory).write_excel("branch{}".format(i), table))
+                     for i in range(files)]
+        for name, function in runs(worker_counts):
+            manager = BookcaseDbManager(directory, db_name=name.replace(" ", "_"))
+            manager.create_db()
+            start = time.perf_counter()
+            function(directory, manager, filenames)
+            elapsed = time.perf_counter() - start
+            manager.cleanup()
+            print("{name:>10}: {files} files x {rows} rows in {elapsed:.2f}s".format(
+                name=name, files=files, rows=rows, elapsed=elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 8, int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+        [int(workers) for workers in sys.argv[3].split(",")] if len(sys.argv) > 3 else (1, 2, 4))
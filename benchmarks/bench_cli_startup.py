@@ -0,0 +1,50 @@
+"""
+Times the startup of the command line interface in a fresh interpreter, best of several runs, against a target.
+--help only parses the arguments, stats also imports the DB modules and opens a DB
+Run from the repository root: python -m benchmarks.bench_cli_startup [runs]
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+
+TARGETS = (("--help", 0.15), ("stats", 0.5))
+
+
+def best_time(argv, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(runs):
+    directory = tempfile.mkdtemp()
+    try:
+        manager = BookcaseDbManager(directory + "/", db_name="bench")
+        manager.create_db()
+        manager.import_table(make_table(1000))
+        manager.cleanup()
+        print("bare interpreter: {:.0f}ms".format(best_time(["-c", "pass"], runs) * 1000))
+        failed = False
+        for command, target in TARGETS:
+            argv = ["-m", "bookcase"] + ([command] if command.startswith("--") else
+                                         ["--data-dir", directory, command, "bench"])
+            timing = best_time(argv, runs)
+            failed = failed or timing > target
+            print("{command:>8}: {timing:.0f}ms, target {target:.0f}ms {status}".format(
+                command=command, timing=timing * 1000, target=target * 1000,
+                status="ok" if timing <= target else "SLOW"))
+        return 1 if failed else 0
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    sys.exit(run(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,63 @@
+"""
+Compares configuration lookups and changes through ConfigStore with configparser, as Configuration used it before:
+lookups through a ConfigParser section, every change writing the whole file
+Run from the repository root: python -m benchmarks.bench_config [operations]
+"""
+import configparser
+import shutil
+import sys
+import tempfile
+import time
+
+from bookcase_lib import ConfigStore
+
+
+def configparser_lookups(config_file, operations):
+    parser = configparser.ConfigParser()
+    parser.read(config_file)
+    for _ in range(operations):
+        parser["LOCAL"]["gui_language"]
+
+
+def store_lookups(config_file, operations):
+    store = ConfigStore(config_file)
+    for _ in range(operations):
+        store.get_config("gui_language")
+
+
+def configparser_changes(config_file, operations):
+    parser = configparser.ConfigParser()
+    for i in range(operations):
+        parser["LOCAL"] = {"page_size": str(i)}
+        with open(config_file, "w") as configuration:
+            parser.write(configuration)
+
+
+def store_changes(config_file, operations):
+    store = ConfigStore(config_file)
+    for i in range(operations):
+        store.set_config("page_size", i)
+    store.write_config()
+
+
+def run(operations):
+    directory = tempfile.mkdtemp()
+    try:
+        config_file = directory + "/config.ini"
+        with open(config_file, "w") as configuration:
+            configuration.write("[LOCAL]\ngui_language = en\n")
+        for name, function, count in (("configparser lookups", configparser_lookups, operations),
+                                      ("store lookups", store_lookups, operations),
+                                      ("configparser changes", configparser_changes, operations // 100),
+                                      ("store changes", store_changes, operations // 100)):
+            start = time.perf_counter()
+            function(config_file, count)
+            elapsed = time.perf_counter() - start
+            print("{name:>20}: {count} in {elapsed:.1f}ms, {per:.2f}us each".format(
+                name=name, count=count, elapsed=elapsed * 1000, per=elapsed / count * 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
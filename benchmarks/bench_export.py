@@ -0,0 +1,66 @@
+"""
+Measures export throughput and peak memory of the streaming Excel export
+Populating the DB and every export run in fresh processes so the peak RSS of the export is measured alone
+Run from the repository root: python -m benchmarks.bench_export [rows ...]
+"""
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_excel.bookcase_excel import Excel
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+
+def peak_rss():
+    """
+    :return: peak resident set size of this process in MB
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def populate(directory, rows):
+    manager = BookcaseDbManager(directory, db_name="bench")
+    manager.create_db()
+    manager.import_table(make_table(rows))
+    manager.cleanup()
+
+
+def export(directory, rows):
+    manager = BookcaseDbManager(directory, db_name="bench")
+    start = time.perf_counter()
+    Excel(path=directory).write_excel("bench", manager.iter_table())
+    elapsed = time.perf_counter() - start
+    print("{rows:>8} rows: {elapsed:.2f}s ({rate:.0f} rows/s), peak RSS {rss:.0f} MB".format(
+        rows=rows, elapsed=elapsed, rate=rows / elapsed, rss=peak_rss()))
+
+
+def run(sizes):
+    for rows in sizes:
+        directory = tempfile.mkdtemp() + "/"
+        try:
+            for step in ("--populate", "--export"):
+                subprocess.check_call([sys.executable, "-m", "benchmarks.bench_export", step, directory, str(rows)])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ["--populate"]:
+        populate(sys.argv[2], int(sys.argv[3]))
+    elif sys.argv[1:2] == ["--export"]:
+        export(sys.argv[2], int(sys.argv[3]))
+    else:
+        run([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,52 @@
+"""
+Compares export and import times of the supported interchange formats
+Run from the repository root: python -m benchmarks.bench_formats [rows]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_csv.bookcase_csv import Csv, JsonLines
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_excel.bookcase_excel import Excel
+
+
+def export(file_format, manager, compress):
+    if compress:
+        return file_format.write_table("bench", manager.iter_table(), compress=True)
+    return file_format.write_table("bench", manager.iter_table())
+
+
+def run(rows):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        source = BookcaseDbManager(directory, db_name="source")
+        source.create_db()
+        source.import_table(make_table(rows))
+        for file_format, compress in ((Excel(directory), False), (Csv(directory), False), (Csv(directory), True),
+                                      (JsonLines(directory), False), (JsonLines(directory), True)):
+            start = time.perf_counter()
+            file = export(file_format, source, compress)
+            exported = time.perf_counter() - start
+
+            target = BookcaseDbManager(directory, db_name="target")
+            target.create_db()
+            start = time.perf_counter()
+            target.import_table(file_format.iter_table(os.path.basename(file)))
+            imported = time.perf_counter() - start
+            target.cleanup()
+            os.remove(directory + "target.db")
+
+            print("{name:>15}: export {exported:6.2f}s, import {imported:6.2f}s, {size:6.1f} MB".format(
+                name=file_format.name + (" (gz)" if compress else ""), exported=exported, imported=imported,
+                size=os.path.getsize(file) / 2 ** 20))
+        source.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,49 @@
+"""
+Times typo tolerant searches through the trigram index against computing the edit distance of every book
+Run from the repository root: python -m benchmarks.bench_fuzzy [rows]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.data_schema import Book, BookSummary
+from bookcase_db.trigrams import rank_candidates
+
+SEARCHES = (("author", "Auhtor 123"), ("title", "Titel 4321"), ("author", "Tolkein"), ("title", "Titl"))
+
+
+def search_trigrams(manager, field, query):
+    return manager.search_fuzzy(field, query)
+
+
+def search_every_row(manager, field, query):
+    books = [BookSummary._make(row) for row in manager.session.query(*BookSummary.columns()).order_by(Book.id)]
+    return rank_candidates(field, query, books, dict.fromkeys((book.id for book in books), 0), 20)
+
+
+def run(rows):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        table = make_table(rows)
+        manager = BookcaseDbManager(directory, db_name="bench", cache_size=0)
+        manager.create_db()
+        start = time.perf_counter()
+        manager.import_table(table + (("The Hobbit", "J.R.R. Tolkien", "", "", 1937, "", 1, "", "-"),))
+        print("import of {rows} rows: {elapsed:.2f}s".format(rows=rows, elapsed=time.perf_counter() - start))
+        for field, query in SEARCHES:
+            for function in (search_trigrams, search_every_row):
+                start = time.perf_counter()
+                result = function(manager, field, query)
+                print("{field:>6} {query!r:13} {name:>16}: {elapsed:9.1f} ms, best {best}".format(
+                    field=field, query=query, name=function.__name__, elapsed=(time.perf_counter() - start) * 1000,
+                    best=result[0] if result else None))
+        manager.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
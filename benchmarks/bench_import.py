@@ -0,0 +1,50 @@
+"""
+Compares the ORM import path with the bulk importer used by BookcaseDbManager.import_table
+Run from the repository root: python -m benchmarks.bench_import [rows]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.data_schema import book_header
+
+
+def make_table(rows):
+    table = [book_header()]
+    for i in range(rows):
+        table.append(("Title {}".format(i), "Author {}".format(i % 1000), "", "Publisher {}".format(i % 50),
+                      1900 + i % 120, "{:013d}".format(i), 1, "Genre {}".format(i % 20), "1-{}".format(i % 10)))
+    return tuple(table)
+
+
+def import_with_orm(manager, table):
+    attributes_to_index = manager.get_indexes_for_book_attributes(table[0])
+    manager.session.add_all(manager.create_books_from_table(attributes_to_index, table[1:]))
+    manager.session.flush()
+
+
+def import_with_bulk_importer(manager, table):
+    manager.import_table(table)
+
+
+def run(rows):
+    table = make_table(rows)
+    for name, function in (("orm", import_with_orm), ("bulk", import_with_bulk_importer)):
+        directory = tempfile.mkdtemp()
+        try:
+            manager = BookcaseDbManager(directory + "/", db_name="bench")
+            manager.create_db()
+            start = time.perf_counter()
+            function(manager, table)
+            elapsed = time.perf_counter() - start
+            manager.cleanup()
+            print("{name:>5}: {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)".format(
+                name=name, rows=rows, elapsed=elapsed, rate=rows / elapsed))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
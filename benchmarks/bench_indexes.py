@@ -0,0 +1,115 @@
+"""
+Times the statements of the search_by_* methods on a DB created before the indexes existed, then migrates it
+and times the statements BookcaseDbManager.search_query issues on it, with their query plans.
+isbn and shelf are equality lookups that use their indexes; title, author and genre are substring matches on the
+normalised columns, which no B-tree index serves, so they stay full scans. The text fields are indexed through the
+FTS5 table instead, which search() uses and which is timed last
+Run from the repository root: python -m benchmarks.bench_indexes [rows]
+"""
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager, FULLTEXT_FIELDS
+
+REPEATS = 50
+SEARCHES = (("isbn", "{:013d}".format(12345)), ("shelf", "1-3"), ("author", "Author 123"), ("genre", "Genre 7"),
+            ("title", "Title 1234"))
+
+LEGACY_SCHEMA = ("CREATE TABLE books (id INTEGER PRIMARY KEY, title VARCHAR, author VARCHAR, translator VARCHAR, "
+                 "publication_year INTEGER, isbn VARCHAR, publisher VARCHAR, shelf VARCHAR, copies INTEGER, "
+                 "genre VARCHAR)")
+
+
+def create_legacy_db(file, rows):
+    connection = sqlite3.connect(file)
+    connection.execute(LEGACY_SCHEMA)
+    connection.executemany("INSERT INTO books (title, author, translator, publisher, publication_year, isbn, "
+                           "copies, genre, shelf) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           [tuple(value.upper() if isinstance(value, str) else value for value in row)
+                            for row in make_table(rows)[1:]])
+    connection.commit()
+    connection.close()
+
+
+def time_statements(file, searches):
+    """
+    Times statements through sqlite3, so that both schemas are measured without the ORM overhead
+    :param searches: (name, statement, parameters) tuples
+    :return: list of (name, milliseconds per execution, query plan) tuples
+    """
+    connection = sqlite3.connect(file)
+    timings = []
+    for name, statement, parameters in searches:
+        plan = "; ".join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + statement, parameters))
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            connection.execute(statement, parameters).fetchall()
+        timings.append((name, (time.perf_counter() - start) / REPEATS * 1000, plan))
+    connection.close()
+    return timings
+
+
+def legacy_searches():
+    """
+    :return: the statements of the search_by_* methods before the indexes, substring LIKE on the upper case columns
+    """
+    return [(field, "SELECT * FROM books WHERE {field} {condition}".format(
+        field=field, condition="= ?" if field in ("isbn", "shelf") else "LIKE '%' || ? || '%'"),
+        (value if field in ("isbn", "shelf") else value.upper(),)) for field, value in SEARCHES]
+
+
+def manager_searches(manager):
+    """
+    :return: the statements BookcaseDbManager.search_query issues for SEARCHES, compiled for sqlite3
+    """
+    searches = []
+    for field, value in SEARCHES:
+        compiled = manager.search_query(field, value).statement.compile(dialect=manager.engine.dialect)
+        searches.append((field, str(compiled), tuple(compiled.params[name] for name in compiled.positiontup)))
+    return searches
+
+
+def time_fulltext_searches(manager):
+    """
+    Times search() on the text fields without its cache, which matches them through the FTS5 index
+    """
+    timings = []
+    for field, value in SEARCHES:
+        if field not in FULLTEXT_FIELDS:
+            continue
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            manager.search_uncached(field, value, None, 0, False)
+        timings.append((field, (time.perf_counter() - start) / REPEATS * 1000))
+    return timings
+
+
+def run(rows):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        file = directory + "legacy.db"
+        create_legacy_db(file, rows)
+        before = time_statements(file, legacy_searches())
+        manager = BookcaseDbManager(directory, db_name="legacy")
+        start = time.perf_counter()
+        manager.create_db()
+        print("migration of {rows} rows: {elapsed:.2f}s".format(rows=rows, elapsed=time.perf_counter() - start))
+        after = time_statements(file, manager_searches(manager))
+        print("search_query statements, before -> after the migration:")
+        for (name, before_ms, _), (_, after_ms, plan) in zip(before, after):
+            print("{name:>6}: {before:8.2f} ms -> {after:8.2f} ms  {plan}".format(
+                name=name, before=before_ms, after=after_ms, plan=plan))
+        print("search() through the full text index:")
+        for name, elapsed in time_fulltext_searches(manager):
+            print("{name:>6}: {elapsed:8.2f} ms".format(name=name, elapsed=elapsed))
+        manager.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
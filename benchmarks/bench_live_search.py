@@ -0,0 +1,66 @@
+"""
+Times every keystroke of a live search typed one character at a time, narrowing in memory when possible,
+against querying the DB for every keystroke with the substring search.
+Narrowed keystrokes are marked with *, the others are DB queries that the search view runs in a background thread
+Run from the repository root: python -m benchmarks.bench_live_search [rows]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.live_search import SearchResults
+
+PAGE_SIZE = 100
+
+QUERIES = (("title", "title 4321"), ("author", "author 98"), ("title", "title 12 x"))
+
+
+def type_live(manager, field, query):
+    timings = []
+    results = None
+    for end in range(1, len(query) + 1):
+        value = query[:end]
+        start = time.perf_counter()
+        narrowed = bool(results and results.can_narrow(field, value))
+        if narrowed:
+            results = results.narrow(value)
+        else:
+            results = SearchResults.query(manager, field, value, PAGE_SIZE)
+        timings.append((time.perf_counter() - start, narrowed))
+    return timings
+
+
+def type_like(manager, field, query):
+    timings = []
+    for end in range(1, len(query) + 1):
+        value = query[:end]
+        start = time.perf_counter()
+        manager.like_query(value, field).count()
+        manager.search_like(value, PAGE_SIZE, field)
+        timings.append((time.perf_counter() - start, False))
+    return timings
+
+
+def run(rows):
+    directory = tempfile.mkdtemp()
+    try:
+        manager = BookcaseDbManager(directory + "/", db_name="bench")
+        manager.create_db()
+        manager.import_table(make_table(rows))
+        for field, query in QUERIES:
+            for name, function in (("live", type_live), ("like", type_like)):
+                timings = function(manager, field, query)
+                print("{field:>6} {query!r:14} {name}: per key {keys}".format(
+                    field=field, query=query, name=name,
+                    keys=" ".join("{:.1f}{}".format(timing * 1000, "*" if narrowed else "")
+                                  for timing, narrowed in timings)))
+        manager.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
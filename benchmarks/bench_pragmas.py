@@ -0,0 +1,41 @@
+"""
+Compares insert and search throughput with SQLite's default pragmas and with the default performance profile
+Run from the repository root: python -m benchmarks.bench_pragmas [inserts] [searches]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.performance import PerformanceProfile, SQLITE_DEFAULT_PRAGMAS
+
+
+def run(inserts, searches):
+    table = make_table(inserts)
+    for name, profile in (("sqlite defaults", PerformanceProfile(**SQLITE_DEFAULT_PRAGMAS)),
+                          ("profile", PerformanceProfile())):
+        directory = tempfile.mkdtemp() + "/"
+        try:
+            manager = BookcaseDbManager(directory, db_name="bench", profile=profile)
+            manager.create_db()
+            start = time.perf_counter()
+            for row in table[1:]:
+                manager.add_book(**dict(zip(table[0], row)))
+            insert_rate = inserts / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for i in range(searches):
+                manager.search_by_isbn("{:013d}".format(i % inserts))
+                manager.search_fulltext("title {}".format(i % inserts), limit=20)
+            search_rate = searches / (time.perf_counter() - start)
+            manager.cleanup()
+            print("{name:>15}: {inserts:.0f} inserts/s, {searches:.0f} searches/s".format(
+                name=name, inserts=insert_rate, searches=search_rate))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
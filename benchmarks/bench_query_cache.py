@@ -0,0 +1,40 @@
+"""
+Times repeated searches with the query cache enabled and disabled
+Run from the repository root: python -m benchmarks.bench_query_cache [rows]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+
+REPEATS = 200
+
+SEARCHES = (("search_by_author", "Author 123"), ("search_by_genre", "Genre 7"), ("search_by_shelf", "1-3"))
+
+
+def run(rows):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        manager = BookcaseDbManager(directory, db_name="bench")
+        manager.create_db()
+        manager.import_table(make_table(rows))
+        manager.cleanup()
+        for cache_size in (0, 128):
+            manager = BookcaseDbManager(directory, db_name="bench", cache_size=cache_size)
+            for method, value in SEARCHES:
+                start = time.perf_counter()
+                for _ in range(REPEATS):
+                    getattr(manager, method)(value)
+                print("cache {size:>3} {method:>17}: {elapsed:8.3f} ms per search".format(
+                    size=cache_size, method=method, elapsed=(time.perf_counter() - start) / REPEATS * 1000))
+            print("cache {size:>3} {stats}".format(size=cache_size, stats=manager.cache_stats()))
+            manager.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,51 @@
+"""
+Compares a combined search through BookcaseDbManager.find with running one search per field
+and intersecting the results in Python
+Run from the repository root: python -m benchmarks.bench_query_planner [rows]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.query_planner import BookQuery
+
+REPEATS = 5
+
+
+def intersect_searches(manager):
+    ids = None
+    for field, value in (("author", "author 123"), ("genre", "genre 3"), ("shelf", "1-3")):
+        found = set(book.id for book in manager.search(field, value))
+        ids = found if ids is None else ids & found
+    return [book for book in manager.search("title", "title") if book.id in ids
+            and 1950 <= book.publication_year <= 2000]
+
+
+def combined_query(manager):
+    query = (BookQuery().contains("title", "title").contains("author", "author 123").equals("genre", "genre 3")
+             .prefix("shelf", "1-3").between("publication_year", 1950, 2000))
+    return manager.find(query)
+
+
+def run(rows):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        manager = BookcaseDbManager(directory, db_name="bench", cache_size=0)
+        manager.create_db()
+        manager.import_table(make_table(rows))
+        for function in (intersect_searches, combined_query):
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                result = function(manager)
+            print("{name:>18}: {count} books in {elapsed:8.1f} ms".format(
+                name=function.__name__, count=len(result), elapsed=(time.perf_counter() - start) / REPEATS * 1000))
+        manager.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,57 @@
+"""
+Measures the memory held by 100k search results loaded as ORM books and as BookSummary rows
+Run from the repository root: python -m benchmarks.bench_read_model [rows]
+"""
+import gc
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_import import make_table
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.data_schema import Book
+
+
+def load_books(manager, rows):
+    return manager.session.query(Book).order_by(Book.id).limit(rows).all()
+
+
+def load_summaries(manager, rows):
+    return manager.search(limit=rows)
+
+
+def measure(directory, function, rows):
+    manager = BookcaseDbManager(directory, db_name="bench", cache_size=0)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = function(manager, rows)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{name:>14}: {count} results in {elapsed:.2f}s, held {held:7.1f} MB "
+          "({per_result} bytes per result), peak {peak:7.1f} MB".format(
+              name=function.__name__, count=len(results), elapsed=elapsed, held=held / 2 ** 20,
+              per_result=held // len(results), peak=peak / 2 ** 20))
+    del results
+    manager.cleanup()
+
+
+def run(rows):
+    directory = tempfile.mkdtemp() + "/"
+    try:
+        manager = BookcaseDbManager(directory, db_name="bench")
+        manager.create_db()
+        manager.import_table(make_table(rows))
+        manager.cleanup()
+        for function in (load_books, load_summaries):
+            measure(directory, function, rows)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
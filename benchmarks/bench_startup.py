@@ -0,0 +1,83 @@
+"""
+Measures the cold start of the GUI in a fresh interpreter against thresholds:
+- the import of bookcase_gui.gui, analysed with python -X importtime, and the heavy modules it must not import
+- the time to the first frame, from starting the interpreter until the main window has been drawn once
+The first frame needs a display, without one only the imports are measured.
+Exits with status 1 if a threshold is exceeded
+Run from the repository root: python -m benchmarks.bench_startup [runs]
+"""
+import subprocess
+import sys
+import time
+
+IMPORT_THRESHOLD = 0.15
+FIRST_FRAME_THRESHOLD = 0.6
+HEAVY_MODULES = ("sqlalchemy", "openpyxl")
+SLOWEST = 10
+
+FIRST_FRAME = """
+from bookcase_gui.gui import BookcaseGui
+gui = BookcaseGui()
+try:
+    gui.show()
+    gui.root.update()
+finally:
+    gui.cleanup()
+"""
+
+
+def import_times():
+    """
+    :return: list of (cumulative microseconds, self microseconds, module) of every module imported by the GUI
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bookcase_gui.gui"],
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        times.append((int(cumulative), int(own), module.strip()))
+    return times
+
+
+def best_time(code, runs):
+    """
+    :return: the shortest wall time of running the code in a fresh interpreter, None if it fails
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if subprocess.run([sys.executable, "-c", code], stderr=subprocess.DEVNULL).returncode:
+            return None
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(name, timing, threshold):
+    print("{name}: {timing:.0f}ms, threshold {threshold:.0f}ms {status}".format(
+        name=name, timing=timing * 1000, threshold=threshold * 1000,
+        status="ok" if timing <= threshold else "SLOW"))
+    return timing <= threshold
+
+
+def run(runs):
+    times = import_times()
+    print("slowest imports, self time:")
+    for cumulative, own, module in sorted(times, key=lambda entry: entry[1], reverse=True)[:SLOWEST]:
+        print("{own:8.1f}ms {module}".format(own=own / 1000, module=module))
+    heavy = sorted(set(module.split(".")[0] for _, _, module in times) & set(HEAVY_MODULES))
+    print("heavy modules imported: {}".format(", ".join(heavy) or "none"))
+
+    ok = not heavy
+    ok = report("import bookcase_gui.gui", best_time("import bookcase_gui.gui", runs), IMPORT_THRESHOLD) and ok
+    first_frame = best_time(FIRST_FRAME, runs)
+    if first_frame is None:
+        print("first frame: not measured, no display")
+    else:
+        ok = report("first frame", first_frame, FIRST_FRAME_THRESHOLD) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(run(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
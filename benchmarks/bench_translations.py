@@ -0,0 +1,65 @@
+"""
+Compares text lookups through the compiled catalogs with the previous per access language resolution,
+where every text was a dict of all languages indexed with the language read from the configuration.
+The build of a book view, which looks up its texts on every build, is timed too when a display is available
+Run from the repository root: python -m benchmarks.bench_translations [builds]
+"""
+import sys
+import time
+import tkinter as tk
+
+import bookcase_lib as lib
+from bookcase_translations import Translations, TEXTS, TEXT_NAMES, get_language
+
+
+class LegacyTranslations(object, metaclass=lib.Singleton):
+    def __init__(self):
+        for name, texts in TEXTS.items():
+            setattr(self, name, texts)
+
+    def __getattribute__(self, item):
+        text = super(LegacyTranslations, self).__getattribute__(item)
+        return text[get_language()]
+
+
+def lookups(translations, builds):
+    start = time.perf_counter()
+    for _ in range(builds):
+        for name in TEXT_NAMES:
+            getattr(translations(), name)
+    return time.perf_counter() - start
+
+
+def view_builds(builds):
+    from bookcase_gui.gui_frames import BookViewNew
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    try:
+        start = time.perf_counter()
+        for _ in range(builds):
+            view = BookViewNew(root, None, None, lambda: None)
+            view.open_book_view()
+            root.update()
+            view.destroy()
+        return time.perf_counter() - start
+    finally:
+        root.destroy()
+
+
+def run(builds):
+    for name, translations in (("per access", LegacyTranslations), ("catalog", Translations)):
+        elapsed = lookups(translations, builds)
+        print("{name:>10}: {count} lookups in {elapsed:.1f}ms, {per:.2f}us each".format(
+            name=name, count=builds * len(TEXT_NAMES), elapsed=elapsed * 1000,
+            per=elapsed / (builds * len(TEXT_NAMES)) * 1e6))
+    elapsed = view_builds(builds)
+    if elapsed is None:
+        print("book view build: not measured, no display")
+    else:
+        print("book view build: {:.2f}ms each".format(elapsed / builds * 1000))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -14,14 +14,15 @@ GNU General Public License for more details.
 You have received a copy of the GNU General Public License
 along with Bookcase Manager.
 """
-import os
-
+import multiprocessing
+import sys
 import traceback
+
 from bookcase_lib import FileManager
-from bookcase_gui.gui import BookcaseGui
 
-if __name__ == '__main__':
-    FileManager().setup_data_directory()
+
+def run_gui():
+    from bookcase_gui.gui import BookcaseGui
     gui = BookcaseGui()
     try:
         gui.run()
@@ -29,3 +30,24 @@ if __name__ == '__main__':
         traceback.print_exc()
     finally:
         gui.cleanup()
+
+
+def main(argv):
+    """
+    Starts the GUI when run without arguments, otherwise runs a command of the headless CLI, which never imports
+    tkinter:
+        python -m bookcase --help
+    :param argv: the command line arguments without the program name
+    :return: the exit status
+    """
+    FileManager().setup_data_directory()
+    if not argv:
+        run_gui()
+        return 0
+    from bookcase_cli.bookcase_cli import BookcaseCli
+    return BookcaseCli().run(argv)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main(sys.argv[1:]))
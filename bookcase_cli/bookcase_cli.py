@@ -0,0 +1,204 @@
+import argparse
+from collections import OrderedDict
+import os
+import sys
+
+from bookcase_csv.bookcase_csv import Csv, JsonLines
+from bookcase_excel.bookcase_excel import Excel
+import bookcase_exceptions as exc
+import bookcase_lib as lib
+
+# the same as bookcase_db.SEARCH_FIELDS, repeated so that parsing the arguments does not import SQLAlchemy
+SEARCH_FIELDS = ("title", "author", "isbn", "shelf", "genre")
+FILE_FORMATS = OrderedDict((("excel", Excel), ("csv", Csv), ("jsonl", JsonLines)))
+# the commands that lock the DB exclusively, the others share it with GUI sessions and other readers
+WRITE_COMMANDS = ("create-db", "import", "vacuum")
+
+
+def format_of(filename):
+    """
+    :return: the file format class of a file, chosen by its extension
+    :raises: InvalidInputException if no format handles the extension
+    """
+    name = filename[:-len(".gz")] if filename.endswith(".gz") else filename
+    for file_format in FILE_FORMATS.values():
+        if name.endswith(file_format.extension):
+            return file_format
+    raise exc.InvalidInputException("Unknown file format: " + filename)
+
+
+class BookcaseCli(object):
+    """
+    Headless command line interface for the batch operations on a Bookcase DB, e.g. from cron:
+        python -m bookcase import my_books /backups/bookcase_my_books.csv.gz
+    It never imports tkinter. Commands lock the DB like the GUI does, writers wait for the GUI sessions of the DB
+    to close for up to --lock-timeout seconds while readers run alongside them, waiting only for their writes.
+    The DB modules are imported by the commands, so --help and argument errors return quickly
+    """
+    def __init__(self, out=sys.stdout, err=sys.stderr):
+        """
+        :param out: stream of the command output
+        :param err: stream of the error messages
+        """
+        self.out = out
+        self.err = err
+        self.parser = self.create_parser()
+
+    def create_parser(self):
+        parser = argparse.ArgumentParser(prog="bookcase", description="Batch operations on Bookcase Manager DBs. "
+                                                                      "Run without arguments to start the GUI")
+        parser.add_argument("--data-dir", default=lib.FileManager().path,
+                            help="directory of the DB files (default: %(default)s)")
+        parser.add_argument("--lock-timeout", type=float, default=lib.LOCK_TIMEOUT,
+                            help="seconds to wait for other programs using the DB (default: %(default)s)")
+        commands = parser.add_subparsers(dest="command", metavar="command")
+        commands.required = True
+
+        command = commands.add_parser("create-db", help="create a new DB or migrate an existing one")
+        command.add_argument("name", help="the name of the DB")
+        command.set_defaults(run=self.create_db)
+
+        command = commands.add_parser("import", help="import books from Excel, CSV or JSON Lines files, "
+                                                     "creating the DB if needed")
+        command.add_argument("name", help="the name of the DB")
+        command.add_argument("files", nargs="+", metavar="file",
+                             help="files named bookcase_<name>.xlsx, .csv or .jsonl, the last two optionally .gz")
+        command.add_argument("--all-sheets", action="store_true", help="import every worksheet of Excel files")
+        command.set_defaults(run=self.import_files)
+
+        command = commands.add_parser("export", help="export all books to a file")
+        command.add_argument("name", help="the name of the DB")
+        command.add_argument("--format", choices=FILE_FORMATS, default="excel", help="default: %(default)s")
+        command.add_argument("--output", help="directory of the exported file (default: the data directory)")
+        command.add_argument("--gzip", action="store_true", help="compress CSV and JSON Lines files")
+        command.set_defaults(run=self.export)
+
+        command = commands.add_parser("search", help="print the books matching a search, tab separated")
+        command.add_argument("name", help="the name of the DB")
+        command.add_argument("field", choices=SEARCH_FIELDS)
+        command.add_argument("value")
+        command.add_argument("--limit", type=int, default=None, help="maximum number of books printed")
+        command.add_argument("--fuzzy", action="store_true", help="tolerate typos in title and author searches")
+        command.set_defaults(run=self.search)
+
+        command = commands.add_parser("stats", help="print the size and contents of a DB")
+        command.add_argument("name", help="the name of the DB")
+        command.set_defaults(run=self.stats)
+
+        command = commands.add_parser("vacuum", help="reclaim unused space and refresh the query planner statistics")
+        command.add_argument("name", help="the name of the DB")
+        command.set_defaults(run=self.vacuum)
+        return parser
+
+    def run(self, argv):
+        """
+        Runs a command, create-db and import create the DB if it does not exist
+        :param argv: the command line arguments without the program name
+        :return: the exit status, 0 on success
+        """
+        arguments = self.parser.parse_args(argv)
+        reader = arguments.command not in WRITE_COMMANDS
+        db_lock = lib.DbLock(self.db_file(arguments))
+        write_lock = lib.DbLock.for_writes(self.db_file(arguments))
+        db_manager = None
+        try:
+            if arguments.command not in ("create-db", "import") and not os.path.isfile(self.db_file(arguments)):
+                raise exc.InvalidInputException("No such DB: " + self.db_file(arguments))
+            db_lock.acquire(shared=reader, timeout=arguments.lock_timeout)
+            if reader:
+                write_lock.acquire(shared=True, timeout=arguments.lock_timeout)
+            db_manager = self.open_db(arguments)
+            arguments.run(db_manager, arguments)
+            return 0
+        except self.handled_errors() as e:
+            self.err.write("bookcase {command}: {error}\n".format(command=arguments.command, error=e))
+            return 1
+        finally:
+            if db_manager is not None:
+                db_manager.cleanup()
+            write_lock.release()
+            db_lock.release()
+
+    @staticmethod
+    def handled_errors():
+        """
+        :return: the exception types reported as command errors, SQLAlchemy errors such as those of a DB whose schema
+                 is older than the program are only possible once the commands imported it
+        """
+        errors = (exc.BookcaseManagerException, OSError)
+        sqlalchemy_exc = sys.modules.get("sqlalchemy.exc")
+        return errors + (sqlalchemy_exc.SQLAlchemyError,) if sqlalchemy_exc is not None else errors
+
+    @staticmethod
+    def db_file(arguments):
+        return os.path.join(arguments.data_dir, arguments.name + ".db")
+
+    @staticmethod
+    def open_db(arguments):
+        """
+        :return: the BookcaseDbManager of the DB the command runs on
+        """
+        from bookcase_db.bookcase_db import BookcaseDbManager
+        return BookcaseDbManager(os.path.join(arguments.data_dir, ""), db_name=arguments.name)
+
+    def print_row(self, row):
+        self.out.write("\t".join("" if value is None else str(value) for value in row) + "\n")
+
+    def create_db(self, db_manager, arguments):
+        db_manager.create_db()
+        self.out.write("Created {file}\n".format(file=self.db_file(arguments)))
+
+    def import_files(self, db_manager, arguments):
+        """
+        Imports every file in a single pass over it; with --all-sheets Excel workbooks go through the BatchImporter
+        """
+        db_manager.create_db()
+        for file in arguments.files:
+            path, filename = os.path.split(os.path.abspath(file))
+            file_format = format_of(filename)
+            file_format.validate_filename(filename)
+            if arguments.all_sheets and file_format.extension == ".xlsx":
+                from bookcase_excel.batch_import import BatchImporter
+                result = BatchImporter(os.path.join(path, "")).import_files(db_manager, [filename])
+            else:
+                result = db_manager.import_table(file_format(os.path.join(path, "")).iter_table(filename))
+            self.out.write("{file}: imported {imported}, rejected {rejected}\n".format(
+                file=file, imported=result.imported, rejected=result.rejected))
+
+    def export(self, db_manager, arguments):
+        file_format = FILE_FORMATS[arguments.format]
+        table_file = file_format(os.path.join(arguments.output or arguments.data_dir, ""))
+        if arguments.gzip and arguments.format != "excel":
+            file = table_file.write_table(db_manager.db_name, db_manager.iter_table(), compress=True)
+        else:
+            file = table_file.write_table(db_manager.db_name, db_manager.iter_table())
+        self.out.write("Exported {file}\n".format(file=file))
+
+    def search(self, db_manager, arguments):
+        from bookcase_db.data_schema import BookSummary
+        from bookcase_db.trigrams import FUZZY_RESULTS
+        if arguments.fuzzy:
+            books = db_manager.search_fuzzy(arguments.field, arguments.value, arguments.limit or FUZZY_RESULTS)
+        else:
+            books = db_manager.search(arguments.field, arguments.value, limit=arguments.limit)
+        self.print_row(BookSummary._fields[1:])
+        for book in books:
+            self.print_row(book.get_row())
+
+    def stats(self, db_manager, arguments):
+        self.print_row(("file", self.db_file(arguments)))
+        self.print_row(("size", os.path.getsize(self.db_file(arguments))))
+        self.print_row(("books", db_manager.count()))
+        for label, field in (("authors", "author"), ("publishers", "publisher"), ("genres", "genre"),
+                             ("shelves", "shelf")):
+            self.print_row((label, db_manager.count_distinct(field)))
+
+    def vacuum(self, db_manager, arguments):
+        size = os.path.getsize(self.db_file(arguments))
+        db_manager.vacuum()
+        self.out.write("{file}: {before} -> {after} bytes\n".format(file=self.db_file(arguments), before=size,
+                                                                  after=os.path.getsize(self.db_file(arguments))))
+
+
+def main(argv=None):
+    return BookcaseCli().run(sys.argv[1:] if argv is None else argv)
@@ -0,0 +1,192 @@
+import io
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from bookcase_cli.bookcase_cli import BookcaseCli
+from bookcase_csv.bookcase_csv import Csv
+from bookcase_db.data_schema import book_header
+import bookcase_exceptions as exc
+import bookcase_lib as lib
+
+
+class BookcaseCliSuite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.out = io.StringIO()
+        self.err = io.StringIO()
+        self.table = (book_header(),
+                      ("Ιλιάδα", "Όμηρος", None, "Κάκτος", 1990, "9789603820001", 1, "Έπος", "1-1"),
+                      ("The Hobbit", "J. R. R. Tolkien", None, "Allen & Unwin", 1937, "9780261102217", 2,
+                       "Fantasy", "2-1"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *argv):
+        self.out.seek(0)
+        self.out.truncate()
+        return BookcaseCli(self.out, self.err).run(["--data-dir", self.directory] + list(argv))
+
+    def import_table(self):
+        file = Csv(os.path.join(self.directory, "")).write_table("test_lib", self.table)
+        self.assertEqual(self.run_cli("import", "test_lib", file), 0)
+        return file
+
+    def test_create_db(self):
+        self.assertEqual(self.run_cli("create-db", "test_lib"), 0)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, "test_lib.db")))
+
+    def test_import_and_search(self):
+        self.import_table()
+        self.assertIn("imported 2, rejected 0", self.out.getvalue())
+        self.assertEqual(self.run_cli("search", "test_lib", "author", "ομηρος"), 0)
+        lines = self.out.getvalue().splitlines()
+        self.assertEqual(lines[0].split("\t"), list(book_header()))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("ΙΛΙΆΔΑ\tΌΜΗΡΟΣ\t\t"))
+
+    def test_import_blank_and_short_rows(self):
+        file = os.path.join(self.directory, "bookcase_test_lib.csv")
+        with open(file, "w", newline="", encoding="utf-8") as csv_file:
+            csv_file.write(",".join(book_header()) + "\r\n\r\n"
+                           "The Hobbit,J. R. R. Tolkien\r\n"
+                           "Untitled\r\n"
+                           "Odyssey,Homer,,,,,2\r\n\r\n")
+        self.assertEqual(self.run_cli("import", "test_lib", file), 0)
+        self.assertIn("imported 2, rejected 1", self.out.getvalue())
+
+    def test_fuzzy_search(self):
+        self.import_table()
+        self.assertEqual(self.run_cli("search", "test_lib", "author", "Tolkein", "--fuzzy"), 0)
+        self.assertIn("THE HOBBIT", self.out.getvalue())
+
+    def test_export(self):
+        self.import_table()
+        self.assertEqual(self.run_cli("export", "test_lib", "--format", "jsonl", "--gzip"), 0)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, "bookcase_test_lib.jsonl.gz")))
+
+    def test_stats_and_vacuum(self):
+        self.import_table()
+        self.assertEqual(self.run_cli("stats", "test_lib"), 0)
+        stats = dict(line.split("\t") for line in self.out.getvalue().splitlines())
+        self.assertEqual(stats["books"], "2")
+        self.assertEqual(stats["genres"], "2")
+        self.assertEqual(self.run_cli("vacuum", "test_lib"), 0)
+
+    def test_missing_db(self):
+        self.assertEqual(self.run_cli("stats", "missing"), 1)
+        self.assertIn("missing.db", self.err.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "missing.db")))
+
+    def test_db_error(self):
+        connection = sqlite3.connect(os.path.join(self.directory, "legacy.db"))
+        connection.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title VARCHAR, author VARCHAR)")
+        connection.close()
+        self.assertEqual(self.run_cli("search", "legacy", "title", "hobbit"), 1)
+        self.assertIn("bookcase search: ", self.err.getvalue())
+
+    def test_unknown_file_format(self):
+        self.run_cli("create-db", "test_lib")
+        self.assertEqual(self.run_cli("import", "test_lib", "bookcase_test_lib.txt"), 1)
+
+    def test_no_tkinter(self):
+        code = ("import sys, bookcase\n"
+                "try:\n"
+                "    bookcase.main(sys.argv[1:])\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                "print('tkinter' in sys.modules)")
+        for argv in (["--help"], ["--data-dir", self.directory, "create-db", "test_lib"]):
+            process = subprocess.run([sys.executable, "-c", code] + argv, stdout=subprocess.PIPE,
+                                     universal_newlines=True)
+            self.assertTrue(process.stdout.endswith("False\n"))
+
+    def test_readers_run_alongside_a_session(self):
+        self.import_table()
+        with lib.DbLock(os.path.join(self.directory, "test_lib.db")).acquire(shared=True):
+            self.assertEqual(self.run_cli("--lock-timeout", "0", "export", "test_lib", "--format", "csv"), 0)
+            self.assertEqual(self.run_cli("--lock-timeout", "0", "stats", "test_lib"), 0)
+
+    def test_readers_wait_for_session_writes(self):
+        self.import_table()
+        with lib.DbLock(os.path.join(self.directory, "test_lib.db")).acquire(shared=True):
+            with lib.DbLock.for_writes(os.path.join(self.directory, "test_lib.db")).acquire():
+                self.assertEqual(self.run_cli("--lock-timeout", "0", "stats", "test_lib"), 1)
+                self.assertIn("test_lib.db is in use by process {}".format(os.getpid()), self.err.getvalue())
+            self.assertEqual(self.run_cli("--lock-timeout", "0", "stats", "test_lib"), 0)
+
+    def test_writers_wait_for_sessions(self):
+        file = self.import_table()
+        with lib.DbLock(os.path.join(self.directory, "test_lib.db")).acquire(shared=True):
+            self.assertEqual(self.run_cli("--lock-timeout", "0.1", "import", "test_lib", file), 1)
+            self.assertIn("in use", self.err.getvalue())
+        self.assertEqual(self.run_cli("--lock-timeout", "0", "import", "test_lib", file), 0)
+
+    def test_readers_wait_for_writers(self):
+        self.import_table()
+        with lib.DbLock(os.path.join(self.directory, "test_lib.db")).acquire():
+            self.assertEqual(self.run_cli("--lock-timeout", "0", "stats", "test_lib"), 1)
+            self.assertIn("process {}".format(os.getpid()), self.err.getvalue())
+
+
+class DbLockSuite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "test_lib.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_and_exclusive(self):
+        with lib.DbLock(self.db_file).acquire(shared=True):
+            with lib.DbLock(self.db_file).acquire(shared=True, timeout=0):
+                pass
+            self.assertRaises(exc.LockedException, lib.DbLock(self.db_file).acquire, timeout=0)
+        with lib.DbLock(self.db_file).acquire(timeout=0):
+            self.assertRaises(exc.LockedException, lib.DbLock(self.db_file).acquire, shared=True, timeout=0)
+
+    def test_timeout(self):
+        with lib.DbLock(self.db_file).acquire():
+            start = time.monotonic()
+            self.assertRaises(exc.LockedException, lib.DbLock(self.db_file).acquire, timeout=0.2)
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_lock_of_crashed_process_is_released(self):
+        code = "import os, sys, bookcase_lib as lib\nlib.DbLock(sys.argv[1]).acquire()\nos._exit(1)"
+        subprocess.run([sys.executable, "-c", code, self.db_file])
+        with lib.DbLock(self.db_file).acquire(timeout=0):
+            pass
+
+    def test_lock_files_are_not_listed_as_dbs(self):
+        open(self.db_file, "w").close()
+        for lock in (lib.DbLock(self.db_file), lib.DbLock.for_writes(self.db_file)):
+            lock.acquire(timeout=0)
+            lock.release()
+            self.assertTrue(os.path.isfile(lock.file))
+        file_manager = lib.FileManager()
+        file_manager._path = os.path.join(self.directory, "")
+        self.assertEqual(file_manager.find_all_db_files(), ["test_lib.db"])
+
+    def test_lock_file_fallback(self):
+        lock_file = lib.DbLock(self.db_file).file
+        with mock.patch.object(lib, "fcntl", None):
+            with lib.DbLock(self.db_file).acquire():
+                self.assertRaises(exc.LockedException, lib.DbLock(self.db_file).acquire, shared=True, timeout=0)
+            self.assertFalse(os.path.exists(lock_file))
+            process = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                                     stdout=subprocess.PIPE, universal_newlines=True)
+            with open(lock_file, "w") as file:
+                file.write(process.stdout.strip())
+            with lib.DbLock(self.db_file).acquire(timeout=0):
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
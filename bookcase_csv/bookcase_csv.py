@@ -0,0 +1,111 @@
+import csv
+import gzip
+import json
+import re
+
+import bookcase_exceptions as exc
+import bookcase_lib as lib
+from bookcase_translations import Translations
+
+
+class TableFile(object):
+    """
+    Base class for input/output of tables to text files
+    Files ending in .gz are transparently gzip compressed
+    """
+    name = None
+    extension = None
+
+    def __init__(self, path=lib.FileManager().path):
+        self.path = path
+
+    @classmethod
+    def validate_filename(cls, filename):
+        """
+        Make sure that filename is consistent with the format of Bookcase manager generated files
+        :param filename:
+        :return: name of the database exported
+        """
+        exp = re.compile(r'(?<=bookcase_).*(?={extension}(\.gz)?$)'.format(extension=re.escape(cls.extension)))
+        name = re.search(exp, filename)
+        if not name:
+            raise exc.InvalidInputException(Translations().invalid_file_msg)
+        return name
+
+    def open_file(self, filename, mode):
+        if filename.endswith(".gz"):
+            return gzip.open(self.path + filename, mode + "t", encoding="utf-8", newline="")
+        return open(self.path + filename, mode, encoding="utf-8", newline="")
+
+    def iter_table(self, filename):
+        """
+        Streams the table from the specified file
+        :param filename:
+        :return: generator of tuples, the header followed by one tuple per row
+        """
+        self.validate_filename(filename)
+        return self.read_rows(self.open_file(filename, "r"))
+
+    def read_rows(self, file):
+        raise NotImplementedError
+
+    def write_table(self, name, table, compress=False):
+        """
+        Writes a table to a file, one row at a time
+        :param name: the name of the exported DB
+        :param table: iterable of rows, the first one being the header
+        :param compress: gzip the file if True
+        :return: absolute path to file + filename
+        """
+        filename = "bookcase_{name}{extension}{gz}".format(name=name, extension=self.extension,
+                                                           gz=".gz" if compress else "")
+        with self.open_file(filename, "w") as file:
+            self.write_rows(file, iter(table))
+        return self.path + filename
+
+    def write_rows(self, file, rows):
+        raise NotImplementedError
+
+
+class Csv(TableFile):
+    """
+    Class for input/output to CSV files
+    Empty fields are read as None, the same as empty Excel cells, and blank lines are skipped
+    """
+    name = "CSV"
+    extension = ".csv"
+
+    def read_rows(self, file):
+        with file:
+            for row in csv.reader(file):
+                if row:
+                    yield tuple(value if value != "" else None for value in row)
+
+    def write_rows(self, file, rows):
+        csv.writer(file).writerows(rows)
+
+
+class JsonLines(TableFile):
+    """
+    Class for input/output to JSON Lines files, one object per book keyed by the table header
+    """
+    name = "JSON Lines"
+    extension = ".jsonl"
+
+    def read_rows(self, file):
+        with file:
+            header = None
+            for line in file:
+                if not line.strip():
+                    continue
+                book = json.loads(line)
+                if header is None:
+                    header = tuple(book.keys())
+                    yield header
+                yield tuple(book.get(key) for key in header)
+
+    def write_rows(self, file, rows):
+        header = next(rows, None)
+        for row in rows:
+            file.write(json.dumps(dict(zip(header, row)), ensure_ascii=False))
+            file.write("\n")
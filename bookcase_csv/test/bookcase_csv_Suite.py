@@ -0,0 +1,64 @@
+import os
+import unittest
+from bookcase_csv.bookcase_csv import Csv, JsonLines
+import bookcase_exceptions as exc
+
+
+class BookcaseCsvSuite(unittest.TestCase):
+    def setUp(self):
+        self.csv = Csv(path="")
+        self.json_lines = JsonLines(path="")
+        self.input_data = (("title", "author", "copies"), ("Ιλιάδα", "Όμηρος", 2), ("Odyssey", "Homer", None))
+        self.files = []
+
+    def tearDown(self):
+        for file in self.files:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def write(self, table_file, compress=False):
+        file = table_file.write_table("test_lib", self.input_data, compress=compress)
+        self.files.append(file)
+        return os.path.basename(file)
+
+    def test_invalid_filename(self):
+        try:
+            self.csv.validate_filename("bookcase_test_lib.xlsx")
+            self.fail()
+        except exc.InvalidInputException:
+            pass
+
+    def test_valid_filename(self):
+        try:
+            self.csv.validate_filename("bookcase_test_lib.csv")
+            self.csv.validate_filename("bookcase_test_lib.csv.gz")
+            self.json_lines.validate_filename("bookcase_test_lib.jsonl")
+        except exc.InvalidInputException:
+            self.fail()
+
+    def test_write_csv(self):
+        filename = self.write(self.csv)
+        self.assertEqual(filename, "bookcase_test_lib.csv")
+        read_data = tuple(self.csv.iter_table(filename))
+        self.assertEqual(read_data, (("title", "author", "copies"), ("Ιλιάδα", "Όμηρος", "2"),
+                                     ("Odyssey", "Homer", None)))
+
+    def test_read_csv_skips_blank_lines(self):
+        self.files.append("bookcase_test_lib.csv")
+        with open(self.files[-1], "w", newline="") as file:
+            file.write("title,author,copies\r\n\r\nOdyssey,Homer\r\n\r\n")
+        self.assertEqual(tuple(self.csv.iter_table("bookcase_test_lib.csv")),
+                         (("title", "author", "copies"), ("Odyssey", "Homer")))
+
+    def test_write_csv_compressed(self):
+        filename = self.write(self.csv, compress=True)
+        self.assertEqual(filename, "bookcase_test_lib.csv.gz")
+        self.assertEqual(len(tuple(self.csv.iter_table(filename))), 3)
+
+    def test_write_json_lines(self):
+        filename = self.write(self.json_lines)
+        self.assertEqual(tuple(self.json_lines.iter_table(filename)), self.input_data)
+
+    def test_write_json_lines_compressed(self):
+        filename = self.write(self.json_lines, compress=True)
+        self.assertEqual(tuple(self.json_lines.iter_table(filename)), self.input_data)
@@ -1,20 +1,52 @@
+from contextlib import contextmanager
+from functools import partial
+
 import sqlalchemy as sql
-from sqlalchemy.orm import create_session
+from sqlalchemy.orm import Session
 
-from bookcase_db.data_schema import Base, Book, book_header
+from bookcase_db.data_schema import Book, BookSummary, book_header, normalise_text
+from bookcase_db.bulk_import import BulkImporter, ImportResult, RowValidator, CHUNK_SIZE
+from bookcase_db.fulltext import FullTextIndex, INDEXED_COLUMNS
+from bookcase_db.migrations import SchemaMigrator
+from bookcase_db.performance import PerformanceProfile, PROFILE_LABEL
+from bookcase_db.query_cache import DataVersion, Generation, QueryCache, CACHE_SIZE
+from bookcase_db.query_planner import QueryPlanner, like_condition
+from bookcase_db.trigrams import TrigramIndex, CANDIDATE_FACTOR, FUZZY_FIELDS, FUZZY_RESULTS, rank_candidates
 import bookcase_exceptions as exc
+import bookcase_lib as lib
 from bookcase_translations import Translations
 
+PAGE_SIZE = 500
+SEARCH_FIELDS = ("title", "author", "isbn", "shelf", "genre")
+FULLTEXT_FIELDS = ("title", "author", "genre")
+
 
 class BookcaseDbManager(object):
     """
     Class that manages all DB operations
     """
-    def __init__(self, path="", db_name="bookcase"):
+    def __init__(self, path="", db_name="bookcase", profile=None, cache_size=None):
+        """
+        :param path: the directory of the DB file
+        :param db_name: the name of the DB file without the extension
+        :param profile: the PerformanceProfile of the connections, read from the configuration if None
+        :param cache_size: maximum number of search results cached, 0 disables the cache,
+                           read from the search_cache_size of the configuration if None
+        """
         self._db_name = self.validate_db_name(db_name)
-        self.engine = sql.create_engine('sqlite:///{path}{db_name}.db'
-                                        .format(path=path, db_name=self.db_name))
-        self.session = create_session(bind=self.engine)
+        filename = '{path}{db_name}.db'.format(path=path, db_name=self.db_name)
+        self.engine = sql.create_engine('sqlite:///' + filename,
+                                        poolclass=sql.pool.QueuePool,
+                                        connect_args=dict(check_same_thread=False))
+        (profile or PerformanceProfile.from_configuration()).install(self.engine)
+        self.session = Session(bind=self.engine, autocommit=True, autoflush=False, expire_on_commit=False)
+        self.fulltext = FullTextIndex(self.engine)
+        self.planner = QueryPlanner(self.fulltext)
+        self.trigrams = TrigramIndex(self.engine)
+        if cache_size is None:
+            cache_size = lib.Configuration().get_int("search_cache_size", label=PROFILE_LABEL, default=CACHE_SIZE)
+        self.data_version = DataVersion(filename)
+        self.cache = QueryCache(Generation.of_database(filename), max_size=cache_size, data_version=self.data_version)
 
     @property
     def db_name(self):
@@ -32,8 +64,19 @@ class BookcaseDbManager(object):
             raise exc.InvalidInputException(Translations().no_spaces_in_names_warn)
         return name if not ".db" in name else name.strip(".db")
 
-    def create_db(self):
-        Base.metadata.create_all(self.engine)
+    def create_db(self, report_progress=lambda steps: None):
+        """
+        Creates the schema of a new DB or migrates an existing DB to the current schema, then builds the missing
+        search indexes, which takes long on large DBs
+        :param report_progress: called with the number of steps done after each of the schema, the full text index
+                                and the trigram index, e.g. Task.report_progress of a background task
+        """
+        SchemaMigrator(self.engine).migrate()
+        report_progress(1)
+        self.fulltext.create()
+        report_progress(2)
+        self.trigrams.create()
+        report_progress(3)
 
     def add_book(self, **kwargs):
         """
@@ -47,60 +90,361 @@ class BookcaseDbManager(object):
         self.session.add(new_book)
         print(new_book)
         self.session.flush()
+        self.cache.invalidate()
 
     def save_book(self):
         self.session.flush()
+        self.cache.invalidate()
 
     def delete_book(self, row):
         self.session.delete(row)
         self.session.flush()
+        self.cache.invalidate()
 
     def clear_table(self):
-        for row in self.get_all_books():
-            self.session.delete(row)
-        self.session.flush()
+        """
+        Deletes all books
+        :return: the number of deleted books
+        """
+        return self.delete_books()
+
+    def delete_books(self, shelf=None, genre=None, id_range=None):
+        """
+        Deletes the books matching all the given filters with a single statement, all books if none is given
+        Deleted books are also removed from the session
+        :param shelf: delete only the books on this shelf
+        :param genre: delete only the books of this genre
+        :param id_range: (first, last) inclusive range of book ids to delete
+        :return: the number of deleted books
+        """
+        query = self.session.query(Book)
+        if shelf is not None:
+            query = query.filter(Book.shelf == shelf)
+        if genre is not None:
+            query = query.filter(Book.genre_normalised == normalise_text(genre))
+        if id_range is not None:
+            query = query.filter(Book.id >= id_range[0], Book.id <= id_range[1])
+        with self.batch():
+            return query.delete(synchronize_session="evaluate")
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups adds, edits and deletes in a single transaction, committed when the block exits
+        Outside of a batch every operation is committed on its own
+        Nested batches join the outermost one and any error rolls back the whole of it
+        :return: the manager itself
+        """
+        transaction = self.session.begin(subtransactions=True)
+        try:
+            yield self
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            self.cache.invalidate()
+
+    def get_book(self, book_id):
+        """
+        :return: the book with the given id or None if it does not exist
+        """
+        return self.session.query(Book).get(book_id)
 
     def get_all_books(self):
         return self.session.query(Book).all()
 
     def cleanup(self):
+        self.data_version.close()
         self.session.close()
+        self.engine.dispose()
 
     def search_by_title(self, title):
-        return self.session.query(Book).filter(Book.title.contains(title.upper())).all()
+        return self.cached_search_by("title", title)
 
     def search_by_author(self, author):
-        return self.session.query(Book).filter(Book.author.contains(author.upper())).all()
+        return self.cached_search_by("author", author)
 
     def search_by_isbn(self, isbn):
-        return self.session.query(Book).filter_by(isbn=isbn).all()
+        return self.cached_search_by("isbn", isbn)
 
     def search_by_shelf(self, shelf):
-        return self.session.query(Book).filter_by(shelf=shelf).all()
+        return self.cached_search_by("shelf", shelf)
 
     def search_by_genre(self, genre):
-        return self.session.query(Book).filter(Book.genre.contains(genre.upper())).all()
+        return self.cached_search_by("genre", genre)
+
+    def cached_search_by(self, field, value):
+        return self.cache.get(("search_by", field, self.cache_value(field, value)),
+                              lambda: self.search_query(field, value).all())
+
+    @staticmethod
+    def cache_value(field, value):
+        """
+        :return: the search value normalised so that values matching the same books share a cache entry
+        """
+        return normalise_text(value) if field in FULLTEXT_FIELDS else value
+
+    def cache_stats(self):
+        """
+        :return: CacheStats with the hits and misses of the search cache
+        """
+        return self.cache.stats()
+
+    def search_fulltext(self, query, limit=None, column=None, offset=0, ranked=True):
+        """
+        Ranked search over title, author, translator, publisher and genre
+        Falls back to substring matching when SQLite is built without FTS5
+        :param query: the search string, every word of it is matched as a prefix
+        :param limit: maximum number of books returned, all matches if None
+        :param column: restrict the search to one of the indexed columns
+        :param offset: number of best matches to skip
+        :param ranked: False to order the matches by id, ranking all of them is slow when they are many
+        :return: list of books, best matches first
+        """
+        if not self.fulltext.available:
+            return self.search_like(query, limit, column, offset)
+        match = self.fulltext.build_match_expression(query, column)
+        if not match:
+            return []
+        statement = self.fulltext.search_statement(ranked)
+        return self.session.query(Book).from_statement(statement).params(
+            match=match, limit=limit if limit is not None else -1, offset=offset).all()
+
+    def search_like(self, query, limit=None, column=None, offset=0):
+        """
+        Substring search over the full text columns
+        :param query: the search string
+        :param limit: maximum number of books returned, all matches if None
+        :param column: restrict the search to one of the indexed columns
+        :param offset: number of matches to skip
+        :return: list of books
+        """
+        return self.like_query(query, column).order_by(Book.id).limit(limit).offset(offset).all()
+
+    def like_query(self, query, column=None):
+        columns = (column,) if column else INDEXED_COLUMNS
+        return self.session.query(Book).filter(sql.or_(*[like_condition(name, query) for name in columns]))
+
+    def search(self, field=None, value="", limit=None, offset=0, ranked=True):
+        """
+        Returns one page of the books matching a search, as read only BookSummary rows
+        Use get_book to load a result for editing
+        :param field: one of SEARCH_FIELDS, or None to page through all books
+        :param value: the search string, all books are matched if empty
+        :param limit: page size, the rest of the results if None
+        :param offset: number of results to skip
+        :param ranked: False to order full text matches by id instead of rank
+        :return: list of BookSummary
+        """
+        if not value:
+            field = None
+        return self.cache.get(("search", field, self.cache_value(field, value), limit, offset, ranked),
+                              partial(self.search_uncached, field, value, limit, offset, ranked))
+
+    def search_uncached(self, field, value, limit, offset, ranked):
+        if field in FULLTEXT_FIELDS and self.fulltext.available:
+            match = self.fulltext.build_match_expression(value, field)
+            if not match:
+                return []
+            rows = self.session.execute(self.fulltext.search_statement(ranked, columns=BookSummary._fields),
+                                        dict(match=match, limit=limit if limit is not None else -1, offset=offset))
+        else:
+            rows = self.search_query(field, value).with_entities(*BookSummary.columns()).order_by(Book.id)\
+                .limit(limit).offset(offset)
+        return [BookSummary._make(row) for row in rows]
+
+    def count(self, field=None, value=""):
+        """
+        :param field: one of SEARCH_FIELDS, or None to count all books
+        :param value: the search string, all books are counted if empty
+        :return: the number of books a search matches
+        """
+        if not value:
+            field = None
+        return self.cache.get(("count", field, self.cache_value(field, value)),
+                              partial(self.count_uncached, field, value))
+
+    def count_uncached(self, field, value):
+        if field in FULLTEXT_FIELDS:
+            if not self.fulltext.available:
+                return self.like_query(value, field).count()
+            match = self.fulltext.build_match_expression(value, field)
+            if not match:
+                return 0
+            return self.session.execute(self.fulltext.count_statement(), dict(match=match)).scalar()
+        return self.search_query(field, value).count()
+
+    def search_query(self, field=None, value=""):
+        """
+        :return: query object filtering books on a search field, text fields are matched as substrings
+        :raises: InvalidInputException if the field is unknown
+        """
+        query = self.session.query(Book)
+        if field is None:
+            return query
+        if field not in SEARCH_FIELDS:
+            raise exc.InvalidInputException(field)
+        if field in FULLTEXT_FIELDS:
+            return self.like_query(value, field)
+        return query.filter_by(**{field: value})
+
+    def count_distinct(self, field):
+        """
+        :param field: a column of the books table
+        :return: the number of different non empty values of the column
+        """
+        column = getattr(Book, field)
+        return self.session.query(sql.func.count(sql.distinct(column))).filter(column != "").scalar()
+
+    def vacuum(self):
+        """
+        Rebuilds the DB file to reclaim the space of deleted books and refreshes the statistics of the query planner
+        """
+        connection = self.engine.connect()
+        try:
+            connection.execute("VACUUM")
+            connection.execute("PRAGMA optimize")
+        finally:
+            connection.close()
+
+    def search_fuzzy(self, field, query, max_results=FUZZY_RESULTS):
+        """
+        Typo tolerant search, e.g. "Tolkein" finds "Tolkien"
+        Candidates are the books sharing the most trigrams with the query, read from the trigram index,
+        only they are ranked by edit distance
+        :param field: one of FUZZY_FIELDS
+        :param query: the search string
+        :param max_results: maximum number of books returned
+        :return: list of BookSummary, closest matches first
+        :raises: InvalidInputException if the field is not searched fuzzily
+        """
+        if field not in FUZZY_FIELDS:
+            raise exc.InvalidInputException(field)
+        return self.cache.get(("fuzzy", field, normalise_text(query), max_results),
+                              partial(self.search_fuzzy_uncached, field, query, max_results))
+
+    def search_fuzzy_uncached(self, field, query, max_results):
+        shared = dict(TrigramIndex.candidates(self.session, field, query, max_results * CANDIDATE_FACTOR))
+        if not shared:
+            return []
+        books = [BookSummary._make(row) for row in
+                 self.session.query(*BookSummary.columns()).filter(Book.id.in_(list(shared)))]
+        return rank_candidates(field, query, books, shared, max_results)
+
+    def find(self, query, limit=None, offset=0):
+        """
+        Returns one page of the books matching all the predicates of a query, with a single statement
+        :param query: BookQuery, all books are matched if it has no predicates
+        :param limit: page size, the rest of the results if None
+        :param offset: number of results to skip
+        :return: list of BookSummary ordered by id
+        """
+        return self.cache.get(("find", query.key, limit, offset),
+                              lambda: [BookSummary._make(row) for row in self.find_query(query)
+                                       .with_entities(*BookSummary.columns()).order_by(Book.id)
+                                       .limit(limit).offset(offset)])
+
+    def count_matching(self, query):
+        """
+        :param query: BookQuery
+        :return: the number of books matching all the predicates of the query
+        """
+        return self.cache.get(("count_matching", query.key), self.find_query(query).count)
+
+    def find_query(self, query):
+        return self.session.query(Book).filter(*self.planner.conditions(query))
+
+    def iter_search(self, field=None, value="", page_size=PAGE_SIZE):
+        """
+        Lazily yields all the books matching a search, one page at a time
+        :param field: one of SEARCH_FIELDS, or None to yield all books
+        :param value: the search string
+        :param page_size: number of books fetched per query
+        """
+        offset = 0
+        while True:
+            page = self.search(field, value, limit=page_size, offset=offset)
+            for book in page:
+                yield book
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    def iter_books(self, page_size=PAGE_SIZE, after_id=0):
+        """
+        Lazily yields all books in id order using keyset pagination
+        :param page_size: number of books fetched per query
+        :param after_id: yield only books with an id greater than this
+        """
+        while True:
+            page = self.session.query(Book).filter(Book.id > after_id).order_by(Book.id).limit(page_size).all()
+            for book in page:
+                yield book
+            if len(page) < page_size:
+                return
+            after_id = page[-1].id
 
     def dump_table(self):
         """
         Dumps all entries to a 2-D array
         :return: a tuple containing row entries as tuples
         """
-        books = self.get_all_books()
-        table = list()
-        table.append(book_header())
-        table.extend([book.get_row() for book in books])
-        return tuple(table)
+        return tuple(self.iter_table())
 
-    def import_table(self, table):
+    def iter_table(self, fetch_size=PAGE_SIZE):
         """
-        Creates book entries from a table and saves them to DB
-        :param table: a tuple of tuples containing book attributes
+        Streams all entries as rows of plain values through a single cursor, no ORM objects are created
+        :param fetch_size: number of rows fetched from the cursor at a time
+        :return: generator of tuples, the header followed by one tuple per book
         """
-        attributes_to_index = self.get_indexes_for_book_attributes(table[0])
-        books = self.create_books_from_table(attributes_to_index, table[1:])
-        self.session.add_all(books)
-        self.session.flush()
+        yield book_header()
+        columns = [Book.__table__.c[name] for name in book_header()]
+        connection = self.engine.connect().execution_options(stream_results=True)
+        try:
+            result = connection.execute(sql.select(columns).order_by(Book.__table__.c.id))
+            while True:
+                rows = result.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            connection.close()
+
+    def import_table(self, table, chunk_size=CHUNK_SIZE):
+        """
+        Validates the rows of a table and inserts them to DB in chunks, in a single batch
+        The table is consumed lazily so it can be a generator streaming rows from a file
+        :param table: an iterable of tuples containing book attributes, the first one being the header
+        :param chunk_size: number of rows inserted per statement execution
+        :return: ImportResult with the counts of imported and rejected rows
+        """
+        rows = iter(table)
+        header = next(rows, None)
+        if header is None:
+            return ImportResult(0, 0)
+        validator = RowValidator(partial(self.get_book_attributes_from_row,
+                                         self.get_indexes_for_book_attributes(header)))
+        with self.batch():
+            imported = BulkImporter(self.session.connection(), chunk_size).insert_all(validator.validate(rows))
+        return ImportResult(imported, validator.rejected)
+
+    def import_validated(self, tables, chunk_size=CHUNK_SIZE):
+        """
+        Inserts tables that were validated elsewhere, e.g. by worker processes, in a single batch
+        Tables are inserted in the order they are yielded, while later ones may still be prepared
+        :param tables: iterable of (list of book attribute dicts, number of rejected rows) pairs
+        :param chunk_size: number of rows inserted per statement execution
+        :return: ImportResult with the counts of imported and rejected rows
+        """
+        rejected = 0
+        with self.batch():
+            importer = BulkImporter(self.session.connection(), chunk_size)
+            for mappings, table_rejected in tables:
+                importer.insert_all(mappings)
+                rejected += table_rejected
+        return ImportResult(importer.imported, rejected)
 
     @staticmethod
     def get_indexes_for_book_attributes(header):
@@ -129,11 +473,15 @@ class BookcaseDbManager(object):
 
     @staticmethod
     def get_book_attributes_from_row(attributes_to_index, row):
+        """
+        Missing trailing fields of short rows, e.g. of CSV lines or of Excel rows ending in empty cells, are empty
+        :raises: InvalidInputException if the row has no title or author
+        """
         book_args = dict()
         for key, index in attributes_to_index.items():
-            value = row[index]
+            value = row[index] if index < len(row) else None
             if value:
-                book_args[key] = row[index]
-        if not book_args["author"] or not book_args["title"]:
+                book_args[key] = value
+        if not book_args.get("author") or not book_args.get("title"):
             raise exc.InvalidInputException
         return book_args
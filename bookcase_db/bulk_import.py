@@ -0,0 +1,67 @@
+from collections import namedtuple
+
+from bookcase_db.data_schema import Book, book_attributes
+import bookcase_exceptions as exc
+
+CHUNK_SIZE = 1000
+
+ImportResult = namedtuple("ImportResult", ("imported", "rejected"))
+
+
+class RowValidator(object):
+    """
+    Class that validates table rows and converts them to normalised book attribute dicts
+    Invalid rows are counted and skipped
+    """
+    def __init__(self, row_to_attributes):
+        """
+        :param row_to_attributes: function that validates a row and returns its book attributes
+        """
+        self.row_to_attributes = row_to_attributes
+        self.rejected = 0
+
+    def validate(self, rows):
+        """
+        :param rows: an iterable of tuples containing book attributes
+        :return: generator of dicts mapping column names to values, one per valid row
+        """
+        for row in rows:
+            try:
+                yield book_attributes(**self.row_to_attributes(row))
+            except (exc.InvalidInputException, AttributeError, TypeError):
+                self.rejected += 1
+
+
+class BulkImporter(object):
+    """
+    Class that inserts book attribute dicts to the books table in chunks, through executemany
+    No ORM objects are created
+    """
+    def __init__(self, connection, chunk_size=CHUNK_SIZE):
+        """
+        :param connection: the connection the rows are inserted through, inside a transaction
+        :param chunk_size: number of rows sent to DB per executemany
+        """
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.imported = 0
+
+    def insert_all(self, mappings):
+        """
+        :param mappings: an iterable of dicts mapping column names to values
+        :return: the number of rows inserted
+        """
+        inserted = self.imported
+        chunk = []
+        for mapping in mappings:
+            chunk.append(mapping)
+            if len(chunk) >= self.chunk_size:
+                self.insert(chunk)
+                chunk = []
+        if chunk:
+            self.insert(chunk)
+        return self.imported - inserted
+
+    def insert(self, chunk):
+        self.connection.execute(Book.__table__.insert(), chunk)
+        self.imported += len(chunk)
@@ -1,5 +1,9 @@
+from collections import namedtuple
+import unicodedata
+
 import sqlalchemy as sql
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import validates
 
 Base = declarative_base()
 
@@ -9,6 +13,38 @@ def book_header():
             "publication_year", "isbn", "copies", "genre", "shelf")
 
 
+NORMALISED_COLUMNS = ("title", "author", "translator", "publisher", "genre")
+
+
+def normalised_column(column):
+    return column + "_normalised"
+
+
+def normalise_text(text):
+    """
+    Accents are stripped after NFD decomposition and the text is case folded, which also unifies
+    the final sigma, so that e.g. 'Ομηρος' matches 'ΌΜΗΡΟΣ'
+    :return: text in the form stored in the normalised search columns
+    """
+    decomposed = unicodedata.normalize("NFD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def book_attributes(title="", author="", translator="", publication_year=-1, isbn="",
+                    publisher="", shelf="-", copies=1, genre=""):
+    """
+    Applies the defaults and the normalisation of the book attributes as they are stored in DB
+    :return: a dict mapping column names to values
+    """
+    attributes = dict(title=title.upper(), author=author.upper(), translator=translator.upper(),
+                      publication_year=publication_year, isbn=isbn, publisher=publisher.upper(),
+                      shelf=shelf, copies=copies, genre=genre.upper())
+    for column in NORMALISED_COLUMNS:
+        attributes[normalised_column(column)] = normalise_text(attributes[column])
+    return attributes
+
+
 class Book(Base):
     __tablename__ = 'books'
     id = sql.Column(sql.Integer, primary_key=True)
@@ -16,23 +52,32 @@ class Book(Base):
     author = sql.Column(sql.String)
     translator = sql.Column(sql.String)
     publication_year = sql.Column(sql.Integer)
-    isbn = sql.Column(sql.String)
+    isbn = sql.Column(sql.String, index=True)
     publisher = sql.Column(sql.String)
-    shelf = sql.Column(sql.String)
+    shelf = sql.Column(sql.String, index=True)
     copies = sql.Column(sql.Integer)
     genre = sql.Column(sql.String)
+    title_normalised = sql.Column(sql.String, index=True)
+    author_normalised = sql.Column(sql.String, index=True)
+    translator_normalised = sql.Column(sql.String)
+    publisher_normalised = sql.Column(sql.String)
+    genre_normalised = sql.Column(sql.String, index=True)
 
     def __init__(self, title="", author="", translator="", publication_year=-1, isbn="",
                  publisher="", shelf="-", copies=1, genre=""):
-        self.title = title.upper()
-        self.author = author.upper()
-        self.translator = translator.upper()
-        self.publication_year = publication_year
-        self.isbn = isbn
-        self.publisher = publisher.upper()
-        self.shelf = shelf
-        self.copies = copies
-        self.genre = genre.upper()
+        attributes = book_attributes(title=title, author=author, translator=translator,
+                                     publication_year=publication_year, isbn=isbn, publisher=publisher,
+                                     shelf=shelf, copies=copies, genre=genre)
+        for key, value in attributes.items():
+            setattr(self, key, value)
+
+    @validates(*NORMALISED_COLUMNS)
+    def validate_text(self, key, value):
+        """
+        Keeps the normalised search column of an edited text column in sync
+        """
+        setattr(self, normalised_column(key), normalise_text(value))
+        return value
 
     def __repr__(self):
         return "{title}, {author}, {publisher}, {year} | {shelf}".format(title=self.title,
@@ -44,3 +89,22 @@ class Book(Base):
     def get_row(self):
         return (self.title, self.author, self.translator, self.publisher,
                 self.publication_year, self.isbn, self.copies, self.genre, self.shelf)
+
+
+class BookSummary(namedtuple("BookSummary", ("id",) + book_header())):
+    """
+    Read only projection of a book, used to list search results
+    It is built from a column only query, without the instrumentation and identity map tracking of Book.
+    Load the Book by id to edit it
+    """
+    __slots__ = ()
+
+    __repr__ = Book.__repr__
+    get_row = Book.get_row
+
+    @classmethod
+    def columns(cls):
+        """
+        :return: the columns of the books table to query, in the order of the fields
+        """
+        return [getattr(Book, name) for name in cls._fields]
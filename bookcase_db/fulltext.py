@@ -0,0 +1,127 @@
+import re
+
+import sqlalchemy as sql
+
+from bookcase_db.data_schema import normalise_text, normalised_column
+
+INDEXED_COLUMNS = ("title", "author", "translator", "publisher", "genre")
+
+FTS_COLUMNS = tuple(normalised_column(column) for column in INDEXED_COLUMNS)
+
+FTS_TABLE = "books_fts"
+
+# lengths of the word prefixes indexed, short prefix terms such as the first letters typed in a live search are read
+# from these instead of merging the posting lists of every word they start
+PREFIX_LENGTHS = "1 2 3"
+
+CREATE_TABLE = ("CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({columns}, "
+                "content='books', content_rowid='id', prefix='{prefix}')")
+
+TRIGGER_NAMES = ("{table}_ai", "{table}_ad", "{table}_au")
+
+TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {columns} ON books BEGIN "
+    "INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+    "INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); "
+    "END",
+)
+
+SEARCH_STATEMENT = ("SELECT {select} FROM books JOIN {table} ON books.id = {table}.rowid "
+                    "WHERE {table} MATCH :match ORDER BY {table}.{order} LIMIT :limit OFFSET :offset")
+
+COUNT_STATEMENT = "SELECT count(*) FROM {table} WHERE {table} MATCH :match"
+
+
+def format_statement(statement, **kwargs):
+    return statement.format(table=FTS_TABLE,
+                            columns=", ".join(FTS_COLUMNS),
+                            new_values=", ".join("new." + column for column in FTS_COLUMNS),
+                            old_values=", ".join("old." + column for column in FTS_COLUMNS),
+                            prefix=PREFIX_LENGTHS,
+                            **kwargs)
+
+
+class FullTextIndex(object):
+    """
+    Class that manages the FTS5 index kept over the text columns of the books table
+    The index is an external content table over the normalised columns, kept in sync with the books table by triggers.
+    It also indexes the prefixes of up to three characters of every word, see PREFIX_LENGTHS
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self._available = None
+
+    @property
+    def available(self):
+        """
+        :return: True if the index exists in the database, False if SQLite is built without FTS5
+        """
+        if self._available is None:
+            self._available = self.exists(self.engine)
+        return self._available
+
+    @staticmethod
+    def exists(connection):
+        result = connection.execute(sql.text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+                                    name=FTS_TABLE)
+        return result.scalar() is not None
+
+    def create(self):
+        """
+        Creates the index and its triggers if missing and populates it from the existing books
+        """
+        try:
+            with self.engine.begin() as connection:
+                populate = not self.exists(connection)
+                connection.execute(format_statement(CREATE_TABLE))
+                for trigger in TRIGGERS:
+                    connection.execute(format_statement(trigger))
+                if populate:
+                    connection.execute(format_statement("INSERT INTO {table}({table}) VALUES ('rebuild')"))
+            self._available = True
+        except sql.exc.OperationalError:
+            self._available = False
+
+    @staticmethod
+    def drop(connection):
+        """
+        Drops the index and its triggers, so that create builds them again
+        """
+        for trigger in TRIGGER_NAMES:
+            connection.execute(format_statement("DROP TRIGGER IF EXISTS " + trigger))
+        connection.execute(format_statement("DROP TABLE IF EXISTS {table}"))
+
+    @staticmethod
+    def build_match_expression(query, column=None):
+        """
+        Converts user input to an FTS5 query where every normalised word is a prefix term
+        :param query: the search string as typed by the user
+        :param column: restrict the expression to one of INDEXED_COLUMNS
+        :return: the match expression or None if the query has no searchable words
+        """
+        terms = ['"{term}"*'.format(term=term) for term in re.findall(r"\w+", normalise_text(query))]
+        if not terms:
+            return None
+        expression = " AND ".join(terms)
+        if column:
+            expression = "{column} : ({expression})".format(column=normalised_column(column), expression=expression)
+        return expression
+
+    @staticmethod
+    def search_statement(ranked=True, columns=None):
+        """
+        :param ranked: order the matches by rank, or by id which is much cheaper when there are many
+        :param columns: names of the books columns selected, all of them if None
+        """
+        select = ", ".join("books." + column for column in columns) if columns else "books.*"
+        return sql.text(format_statement(SEARCH_STATEMENT, order="rank" if ranked else "rowid", select=select))
+
+    @staticmethod
+    def count_statement():
+        return sql.text(format_statement(COUNT_STATEMENT))
@@ -0,0 +1,88 @@
+import re
+
+from bookcase_db.bookcase_db import FULLTEXT_FIELDS
+from bookcase_db.data_schema import normalise_text
+
+NARROW_LIMIT = 5000
+
+
+def search_terms(query):
+    """
+    :return: the normalised words of a query, matched as prefixes like in FullTextIndex.build_match_expression
+    """
+    return re.findall(r"\w+", normalise_text(query))
+
+
+class SearchResults(object):
+    """
+    Results of a search as typed in the search view
+    When all the matches of a full text search fit in NARROW_LIMIT they are kept in memory, best matches first,
+    so that a query extending this one is answered by filtering them instead of querying the DB.
+    Larger result sets are paged in id order, as ranking all their matches takes most of the query time
+    """
+    def __init__(self, field, value, count, first_page=None, books=None, prefix_match=True, tokens=None):
+        """
+        :param count: total number of matches
+        :param first_page: the first page of matches, None when all of them are loaded
+        :param books: all the matches, None if they were not loaded
+        :param prefix_match: True if the words are matched as prefixes like the FTS index does,
+                             False for the substring search used when FTS5 is unavailable
+        :param tokens: the folded words of the searched field of every book, computed when first narrowed
+        """
+        self.field = field
+        self.value = value
+        self.count = count
+        self.first_page = first_page
+        self.books = books
+        self.prefix_match = prefix_match
+        self.tokens = tokens
+
+    @classmethod
+    def query(cls, db_manager, field, value, page_size, narrow_limit=NARROW_LIMIT):
+        """
+        Searches the DB, loading all the matches if they are few enough
+        :param db_manager: BookcaseDbManager
+        :param page_size: number of books in the first page
+        :param narrow_limit: maximum number of matches kept in memory
+        """
+        count = db_manager.count(field, value)
+        if value and field in FULLTEXT_FIELDS and count <= narrow_limit:
+            books = db_manager.search(field, value)
+            return cls(field, value, len(books), books=books, prefix_match=db_manager.fulltext.available)
+        return cls(field, value, count, db_manager.search(field, value, limit=page_size, ranked=False))
+
+    @property
+    def loaded(self):
+        return self.books is not None
+
+    def can_narrow(self, field, value):
+        """
+        :return: True if the matches of the search are a subset of these results and can be computed from them
+        """
+        return self.loaded and field == self.field and bool(self.value) and value.startswith(self.value)
+
+    def narrow(self, value):
+        """
+        Filters the results in memory for a query that extends this one
+        The books keep the order of these results
+        :param value: the extended search string
+        :return: SearchResults
+        """
+        if self.prefix_match:
+            if self.tokens is None:
+                self.tokens = [search_terms(getattr(book, self.field)) for book in self.books]
+            terms = search_terms(value)
+            matches = [(book, tokens) for book, tokens in zip(self.books, self.tokens)
+                       if terms and all(any(token.startswith(term) for token in tokens) for term in terms)]
+        else:
+            matches = [(book, None) for book in self.books if self.contains(book, value)]
+        books = [book for book, _ in matches]
+        tokens = [tokens for _, tokens in matches] if self.prefix_match else None
+        return SearchResults(self.field, value, len(books), books=books, prefix_match=self.prefix_match,
+                             tokens=tokens)
+
+    def contains(self, book, value):
+        """
+        Substring matching of query_planner.like_condition
+        """
+        return normalise_text(value) in normalise_text(getattr(book, self.field))
@@ -0,0 +1,116 @@
+import sqlalchemy as sql
+
+from bookcase_db.data_schema import Base, Book, NORMALISED_COLUMNS, normalise_text, normalised_column
+from bookcase_db.fulltext import FullTextIndex
+
+
+def add_column(connection, column):
+    """
+    Adds a column of the Book schema to the books table if it is missing
+    :return: True if the column was added
+    """
+    existing = [row[1] for row in connection.execute("PRAGMA table_info(books)")]
+    if column.name in existing:
+        return False
+    connection.execute("ALTER TABLE books ADD COLUMN {name} {type}".format(
+        name=column.name, type=column.type.compile(dialect=connection.dialect)))
+    return True
+
+
+def create_missing_indexes(connection):
+    """
+    Creates the indexes of the Book schema that are missing, skipping those whose columns are not added yet
+    """
+    existing = [index["name"] for index in sql.inspect(connection).get_indexes("books")]
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(books)")]
+    for index in Book.__table__.indexes:
+        if index.name not in existing and all(column.name in columns for column in index.columns):
+            index.create(connection)
+
+
+def add_title_normalised_and_indexes(connection):
+    """
+    Version 1: normalised title column, indexes on isbn, shelf and normalised title
+    """
+    if add_column(connection, Book.__table__.c.title_normalised):
+        rows = connection.execute("SELECT id, title FROM books").fetchall()
+        statement = sql.text("UPDATE books SET title_normalised = :title_normalised WHERE id = :id")
+        connection.execute(statement, [dict(id=book_id, title_normalised=normalise_text(title))
+                                       for book_id, title in rows])
+    create_missing_indexes(connection)
+
+
+def add_accent_insensitive_columns(connection):
+    """
+    Version 2: accent and case insensitive normalised columns of all the text columns, recomputing the title one.
+    The full text index is dropped, to be built again over the normalised columns
+    """
+    FullTextIndex.drop(connection)
+    for column in NORMALISED_COLUMNS:
+        add_column(connection, Book.__table__.c[normalised_column(column)])
+    rows = connection.execute("SELECT id, {columns} FROM books".format(columns=", ".join(NORMALISED_COLUMNS)))
+    statement = sql.text("UPDATE books SET {values} WHERE id = :id".format(
+        values=", ".join("{name} = :{name}".format(name=normalised_column(column)) for column in NORMALISED_COLUMNS)))
+    parameters = [dict([("id", row[0])] + [(normalised_column(column), normalise_text(value))
+                                           for column, value in zip(NORMALISED_COLUMNS, row[1:])])
+                  for row in rows.fetchall()]
+    if parameters:
+        connection.execute(statement, parameters)
+    create_missing_indexes(connection)
+
+
+def drop_raw_text_indexes(connection):
+    """
+    Version 3: drops the indexes of author and genre, searches use the indexes of their normalised columns
+    """
+    for name in ("ix_books_author", "ix_books_genre"):
+        connection.execute("DROP INDEX IF EXISTS {name}".format(name=name))
+
+
+def add_fulltext_prefix_indexes(connection):
+    """
+    Version 4: the full text index is dropped, to be built again with the prefix indexes of fulltext.PREFIX_LENGTHS
+    """
+    FullTextIndex.drop(connection)
+
+
+MIGRATIONS = (add_title_normalised_and_indexes, add_accent_insensitive_columns, drop_raw_text_indexes,
+              add_fulltext_prefix_indexes)
+
+
+class SchemaMigrator(object):
+    """
+    Class that brings the schema of a DB file up to date
+    The schema version is kept in SQLite's user_version pragma, each migration raises it by one
+    """
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def latest_version(self):
+        return len(MIGRATIONS)
+
+    @staticmethod
+    def get_version(connection):
+        return connection.execute("PRAGMA user_version").scalar()
+
+    @staticmethod
+    def set_version(connection, version):
+        connection.execute("PRAGMA user_version = {version:d}".format(version=version))
+
+    def migrate(self):
+        """
+        Creates the schema of a new DB, or runs the pending migrations of an existing one, in one transaction
+        :return: the list of migrations that ran
+        """
+        with self.engine.begin() as connection:
+            if not self.engine.dialect.has_table(connection, Book.__tablename__):
+                Base.metadata.create_all(connection)
+                self.set_version(connection, self.latest_version)
+                return []
+            version = self.get_version(connection)
+            pending = MIGRATIONS[version:]
+            for number, migration in enumerate(pending, start=version + 1):
+                migration(connection)
+                self.set_version(connection, number)
+            return list(pending)
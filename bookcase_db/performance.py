@@ -0,0 +1,69 @@
+from collections import OrderedDict
+import re
+
+import sqlalchemy as sql
+
+import bookcase_exceptions as exc
+import bookcase_lib as lib
+
+PROFILE_LABEL = "DB_PERFORMANCE"
+
+DEFAULT_PRAGMAS = OrderedDict([("journal_mode", "WAL"),
+                               ("synchronous", "NORMAL"),
+                               ("cache_size", "-16000"),
+                               ("mmap_size", "268435456"),
+                               ("temp_store", "MEMORY")])
+
+SQLITE_DEFAULT_PRAGMAS = OrderedDict([("journal_mode", "DELETE"),
+                                      ("synchronous", "FULL"),
+                                      ("cache_size", "-2000"),
+                                      ("mmap_size", "0"),
+                                      ("temp_store", "DEFAULT")])
+
+
+class PerformanceProfile(object):
+    """
+    Class that holds the SQLite pragmas set on every DB connection
+    The profile is stored in the DB_PERFORMANCE section of the configuration file
+    """
+    def __init__(self, **pragmas):
+        """
+        :param pragmas: values overriding DEFAULT_PRAGMAS
+        :raises: InvalidInputException for unknown pragmas or values that are not plain words or numbers
+        """
+        self.pragmas = OrderedDict(DEFAULT_PRAGMAS)
+        for key, value in pragmas.items():
+            if key not in DEFAULT_PRAGMAS or not re.match(r"^-?\w+$", str(value)):
+                raise exc.InvalidInputException("{key} = {value}".format(key=key, value=value))
+            self.pragmas[key] = str(value)
+
+    @classmethod
+    def from_configuration(cls):
+        """
+        :return: the profile stored in the configuration, defaults are used for missing pragmas
+        """
+        configuration = lib.Configuration()
+        pragmas = dict()
+        for key in DEFAULT_PRAGMAS:
+            value = configuration.get_config(key, label=PROFILE_LABEL, default=None)
+            if value is not None:
+                pragmas[key] = value
+        return cls(**pragmas)
+
+    def save(self):
+        lib.Configuration().set_section(self.pragmas, label=PROFILE_LABEL)
+
+    def apply(self, dbapi_connection, connection_record=None):
+        """
+        Sets the pragmas on a new DBAPI connection
+        """
+        cursor = dbapi_connection.cursor()
+        for key, value in self.pragmas.items():
+            cursor.execute("PRAGMA {key} = {value}".format(key=key, value=value))
+        cursor.close()
+
+    def install(self, engine):
+        """
+        Applies the profile to every connection the engine opens
+        """
+        sql.event.listen(engine, "connect", self.apply)
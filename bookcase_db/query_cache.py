@@ -0,0 +1,138 @@
+from collections import namedtuple, OrderedDict
+import os
+import sqlite3
+import threading
+
+CACHE_SIZE = 128
+
+CacheStats = namedtuple("CacheStats", ("hits", "misses", "size", "generation"))
+
+
+class Generation(object):
+    """
+    Counter of the writes to a database file, shared by all the managers of the file in the process
+    """
+    _generations = dict()
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def of_database(cls, filename):
+        """
+        :return: the Generation of the database file, created on first use
+        """
+        with cls._lock:
+            return cls._generations.setdefault(os.path.abspath(filename), cls())
+
+    def increment(self):
+        with self.lock:
+            self.value += 1
+
+
+class DataVersion(object):
+    """
+    Detects the commits of other processes to a database file through SQLite's data_version pragma
+    The pragma only changes between two reads on the same connection, so a dedicated connection is kept open
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        """
+        :return: a number that changes whenever any other connection commits to the file
+        """
+        with self.lock:
+            if self.connection is None:
+                self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+class QueryCache(object):
+    """
+    Bounded LRU cache of query results
+    Every entry is stored with the write generation it was computed in. A write increments the generation,
+    which invalidates all entries at once, including the ones of other managers of the same database file.
+    Writes of other processes are detected on every lookup through the data version of the database, which then
+    starts a new generation too. A result computed while a write happened is never served
+    """
+    def __init__(self, generation=None, max_size=CACHE_SIZE, data_version=None):
+        """
+        :param generation: the Generation shared with the other caches of the database
+        :param max_size: maximum number of cached results, the least recently used are evicted
+        :param data_version: function returning the DataVersion of the database, None if only this process writes
+        """
+        self.generation = generation or Generation()
+        self.max_size = max_size
+        self.data_version = data_version
+        self.last_data_version = None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """
+        :param key: hashable key of the query
+        :param compute: function that runs the query when its result is not cached
+        :return: the cached or computed result, lists are copied so callers can change them
+        """
+        self.check_data_version()
+        generation = self.generation.value
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.copy(entry[1])
+            self.misses += 1
+        result = compute()
+        with self.lock:
+            if generation == self.generation.value:
+                self.entries[key] = (generation, result)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return self.copy(result)
+
+    def check_data_version(self):
+        """
+        Invalidates the cached results if the database changed since the last lookup
+        """
+        if self.data_version is None:
+            return
+        data_version = self.data_version()
+        with self.lock:
+            changed = data_version != self.last_data_version
+            self.last_data_version = data_version
+        if changed:
+            self.invalidate()
+
+    @staticmethod
+    def copy(result):
+        return list(result) if isinstance(result, list) else result
+
+    def invalidate(self):
+        """
+        Called after writes, invalidates all cached results
+        """
+        self.generation.increment()
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        :return: CacheStats
+        """
+        with self.lock:
+            return CacheStats(self.hits, self.misses, len(self.entries), self.generation.value)
@@ -0,0 +1,134 @@
+from collections import namedtuple
+
+import sqlalchemy as sql
+
+from bookcase_db.data_schema import Book, NORMALISED_COLUMNS, normalise_text, normalised_column
+from bookcase_db.fulltext import FullTextIndex, FTS_TABLE, INDEXED_COLUMNS
+import bookcase_exceptions as exc
+
+NUMERIC_COLUMNS = ("publication_year", "copies")
+PREFIX_COLUMNS = ("isbn", "shelf") + NORMALISED_COLUMNS
+
+FULLTEXT_CONDITION = "books.id IN (SELECT rowid FROM {table} WHERE {table} MATCH :match)".format(table=FTS_TABLE)
+
+Predicate = namedtuple("Predicate", ("operator", "field", "value"))
+
+
+def like_condition(column, query):
+    """
+    :return: substring condition on the normalised column of a text column
+    """
+    return getattr(Book, normalised_column(column)).contains(normalise_text(query))
+
+
+class BookQuery(object):
+    """
+    Search over several fields at once, all predicates must match
+    Predicates with an empty value are ignored, so the query can be built straight from a search form:
+        BookQuery().contains("title", "ring").contains("author", "tolkien").between("publication_year", 1950, 1960)
+    """
+    def __init__(self):
+        self.predicates = []
+
+    def contains(self, field, value):
+        """
+        Text search, every word of value matched as a prefix when FTS5 is available else as a substring
+        """
+        return self.add("contains", field, value, INDEXED_COLUMNS)
+
+    def equals(self, field, value):
+        if field in NORMALISED_COLUMNS:
+            value = normalise_text(value)
+        return self.add("equals", field, value, PREFIX_COLUMNS + NUMERIC_COLUMNS)
+
+    def prefix(self, field, value):
+        """
+        Matches the values starting with value, e.g. all the shelves of a row with prefix("shelf", "3-")
+        """
+        if field in NORMALISED_COLUMNS:
+            value = normalise_text(value)
+        return self.add("prefix", field, value, PREFIX_COLUMNS)
+
+    def between(self, field, low=None, high=None):
+        """
+        Inclusive range of a numeric field, either bound can be None
+        """
+        if low is None and high is None:
+            return self
+        return self.add("between", field, (low, high), NUMERIC_COLUMNS)
+
+    def add(self, operator, field, value, fields):
+        """
+        :raises: InvalidInputException if the field does not support the operator
+        """
+        if field not in fields:
+            raise exc.InvalidInputException(field)
+        if value not in ("", None):
+            self.predicates.append(Predicate(operator, field, value))
+        return self
+
+    @property
+    def key(self):
+        """
+        :return: hashable key of the query, for the query cache, the same whatever the order of the predicates
+        """
+        return tuple(sorted(self.predicates, key=lambda predicate: (predicate.field, predicate.operator,
+                                                                     repr(predicate.value))))
+
+    def __bool__(self):
+        return bool(self.predicates)
+
+
+class QueryPlanner(object):
+    """
+    Translates a BookQuery to the filter conditions of a single statement
+    - all text searches are combined in one FTS5 match expression, looked up once in the full text index
+    - prefixes are range conditions, which unlike LIKE use the index of the column
+    - equalities are plain comparisons that use the column indexes
+    - text columns are compared on their normalised columns
+    SQLite then picks the most selective index among them
+    """
+    def __init__(self, fulltext):
+        """
+        :param fulltext: the FullTextIndex of the DB
+        """
+        self.fulltext = fulltext
+
+    def conditions(self, query):
+        """
+        :param query: BookQuery
+        :return: list of SQLAlchemy conditions, all of them must hold
+        """
+        conditions = []
+        text_predicates = [predicate for predicate in query.predicates if predicate.operator == "contains"]
+        if text_predicates:
+            conditions.append(self.text_condition(text_predicates))
+        for operator, field, value in query.predicates:
+            column = getattr(Book, normalised_column(field) if field in NORMALISED_COLUMNS else field)
+            if operator == "equals":
+                conditions.append(column == value)
+            elif operator == "prefix":
+                conditions.extend(self.prefix_conditions(column, value))
+            elif operator == "between":
+                low, high = value
+                if low is not None:
+                    conditions.append(column >= low)
+                if high is not None:
+                    conditions.append(column <= high)
+        return conditions
+
+    def text_condition(self, predicates):
+        if not self.fulltext.available:
+            return sql.and_(*[like_condition(field, value) for _, field, value in predicates])
+        expressions = [FullTextIndex.build_match_expression(value, field) for _, field, value in predicates]
+        if None in expressions:
+            return sql.false()
+        return sql.text(FULLTEXT_CONDITION).bindparams(match=" AND ".join(expressions))
+
+    @staticmethod
+    def prefix_conditions(column, value):
+        """
+        :return: the range of the values that start with value
+        """
+        upper_bound = value[:-1] + chr(ord(value[-1]) + 1)
+        return [column >= value, column < upper_bound]
@@ -1,6 +1,19 @@
 import unittest
+import sqlite3
+import subprocess
+import sys
+from unittest import mock
+import sqlalchemy as sql
 from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.data_schema import Book, BookSummary, book_header
+from bookcase_db.live_search import SearchResults
+from bookcase_db.migrations import MIGRATIONS
+from bookcase_db.performance import PerformanceProfile
+from bookcase_db.query_cache import QueryCache
+from bookcase_db.query_planner import BookQuery
+from bookcase_db.trigrams import TrigramIndex, trigrams
 import bookcase_exceptions as exc
+import bookcase_lib as lib
 import os
 
 
@@ -28,6 +41,20 @@ class BookcaseDbManagerTestSuite(unittest.TestCase):
     def test_create_db(self):
         self.assertTrue(os.path.exists("bookcase.db"))
 
+    def test_wal_files_are_not_listed_as_dbs(self):
+        self.manager.add_book(title="The Hobbit", author="J.R.Tolkien")
+        self.assertTrue(os.path.exists("bookcase.db-wal"))
+        file_manager = lib.FileManager()
+        file_manager._path = os.getcwd()
+        self.assertIn("bookcase.db", file_manager.find_all_db_files())
+        self.assertNotIn("bookcase.db-wal", file_manager.find_all_db_files())
+        self.assertNotIn("bookcase.db-shm", file_manager.find_all_db_files())
+
+    def test_create_db_reports_progress(self):
+        steps = []
+        self.manager.create_db(report_progress=steps.append)
+        self.assertEqual(steps, [1, 2, 3])
+
     def test_add_book(self):
         self.manager.add_book(title="Lord of the Rings", author="J.R.Tolkien")
         rows = self.manager.get_all_books()
@@ -121,4 +148,425 @@ class BookcaseDbManagerTestSuite(unittest.TestCase):
         self.add_three_books()
         table = self.manager.dump_table()
         self.manager.import_table(table)
-        self.assertEqual(len(self.manager.get_all_books()), 12)
\ No newline at end of file
+        self.assertEqual(len(self.manager.get_all_books()), 12)
+
+    def test_search_fulltext(self):
+        self.add_three_books()
+        result = self.manager.search_fulltext("tolk")
+        self.assertEqual(len(result), 2)
+
+    def test_search_fulltext_ranked(self):
+        self.add_three_books()
+        self.manager.add_book(title="Pride", author="Anonymous")
+        result = self.manager.search_fulltext("pride")
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0].title, "PRIDE")
+
+    def test_search_fulltext_column(self):
+        self.add_three_books()
+        self.assertEqual(len(self.manager.search_fulltext("fantasy", column="title")), 0)
+        self.assertEqual(len(self.manager.search_fulltext("fantasy", column="genre")), 2)
+
+    def test_search_fulltext_limit(self):
+        self.add_three_books()
+        result = self.manager.search_fulltext("lord of the", limit=1)
+        self.assertEqual(len(result), 1)
+
+    def test_search_fulltext_follows_deletes(self):
+        self.add_three_books()
+        self.manager.delete_book(self.manager.search_by_isbn("978-618-02-0088-1")[-1])
+        self.assertEqual(len(self.manager.search_fulltext("pride")), 0)
+
+    def test_search_like(self):
+        self.add_three_books()
+        result = self.manager.search_like("kien", column="author")
+        self.assertEqual(len(result), 2)
+
+    def test_iter_books(self):
+        self.add_three_books()
+        self.add_three_books()
+        books = list(self.manager.iter_books(page_size=4))
+        self.assertEqual(len(books), 6)
+        self.assertEqual(books, sorted(books, key=lambda book: book.id))
+
+    def test_iter_books_after_id(self):
+        self.add_three_books()
+        first = list(self.manager.iter_books())[0]
+        self.assertEqual(len(list(self.manager.iter_books(page_size=1, after_id=first.id))), 2)
+
+    def test_search_paged(self):
+        self.add_three_books()
+        self.add_three_books()
+        first_page = self.manager.search("author", "tolkien", limit=3)
+        second_page = self.manager.search("author", "tolkien", limit=3, offset=3)
+        self.assertEqual(len(first_page), 3)
+        self.assertEqual(len(second_page), 1)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_search_empty_value_pages_all_books(self):
+        self.add_three_books()
+        self.assertEqual(len(self.manager.search("isbn", "", limit=2)), 2)
+        self.assertEqual(self.manager.count("isbn", ""), 3)
+
+    def test_count(self):
+        self.add_three_books()
+        self.assertEqual(self.manager.count("title", "lord"), 2)
+        self.assertEqual(self.manager.count("shelf", "1-1"), 1)
+
+    def test_iter_search(self):
+        self.add_three_books()
+        self.add_three_books()
+        self.assertEqual(len(list(self.manager.iter_search("genre", "fantasy", page_size=3))), 4)
+
+    def test_import_table_counts(self):
+        table = (book_header(),
+                 ("The Hobbit", "J.R.Tolkien", None, None, 1937, None, 1, "fantasy", "1-2"),
+                 ("Untitled", None, None, None, None, None, None, None, None),
+                 (None, "Nobody", None, None, None, None, None, None, None))
+        result = self.manager.import_table(table)
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.rejected, 2)
+        book = self.manager.search_by_title("hobbit")[-1]
+        self.assertEqual(book.author, "J.R.TOLKIEN")
+        self.assertEqual(book.genre, "FANTASY")
+        self.assertEqual(book.publisher, "")
+
+    def test_import_table_in_chunks(self):
+        self.add_three_books()
+        table = self.manager.dump_table() + self.manager.dump_table()[1:]
+        result = self.manager.import_table(table, chunk_size=4)
+        self.assertEqual(result.imported, 6)
+        self.assertEqual(len(self.manager.get_all_books()), 9)
+        self.assertEqual(len(self.manager.search_fulltext("tolkien")), 6)
+
+    def test_import_table_from_generator(self):
+        self.add_three_books()
+        result = self.manager.import_table(row for row in self.manager.dump_table())
+        self.assertEqual(result.imported, 3)
+        self.assertEqual(len(self.manager.get_all_books()), 6)
+
+    def test_import_empty_table(self):
+        result = self.manager.import_table(iter(()))
+        self.assertEqual(result, (0, 0))
+
+    def test_iter_table(self):
+        self.add_three_books()
+        rows = self.manager.iter_table(fetch_size=2)
+        self.assertEqual(next(rows), book_header())
+        rows = list(rows)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[-1][0], "PRIDE AND PREJUDICE")
+
+    def test_create_db_sets_schema_version(self):
+        self.assertEqual(self.manager.engine.execute("PRAGMA user_version").scalar(), len(MIGRATIONS))
+
+    def test_create_db_migrates_existing_db(self):
+        connection = sqlite3.connect("legacy.db")
+        connection.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title VARCHAR, author VARCHAR, "
+                           "translator VARCHAR, publication_year INTEGER, isbn VARCHAR, publisher VARCHAR, "
+                           "shelf VARCHAR, copies INTEGER, genre VARCHAR)")
+        connection.execute("INSERT INTO books (title, author, isbn, shelf) "
+                           "VALUES ('THE  HOBBIT', 'J.R.TOLKIEN', '9789600403664', '1-1')")
+        connection.commit()
+        connection.close()
+        manager = BookcaseDbManager(db_name="legacy")
+        try:
+            manager.create_db()
+            indexes = [index["name"] for index in sql.inspect(manager.engine).get_indexes("books")]
+            self.assertIn("ix_books_isbn", indexes)
+            self.assertIn("ix_books_title_normalised", indexes)
+            self.assertIn("ix_books_author_normalised", indexes)
+            self.assertEqual(manager.search_by_title("the hobbit")[-1].title_normalised, "the hobbit")
+            self.assertEqual(manager.engine.execute("PRAGMA user_version").scalar(), len(MIGRATIONS))
+            self.assertEqual(len(manager.search_fulltext("hobbit")), 1)
+        finally:
+            manager.cleanup()
+            os.remove("legacy.db")
+
+    def test_title_normalised_follows_edits(self):
+        self.add_three_books()
+        book = self.manager.search_by_shelf("1-1")[-1]
+        book.title = "Emma"
+        self.manager.save_book()
+        self.assertEqual(self.manager.search_by_title("emma")[-1].title_normalised, "emma")
+
+    def test_performance_profile_applied(self):
+        self.assertEqual(self.manager.engine.execute("PRAGMA journal_mode").scalar(), "wal")
+        self.assertEqual(self.manager.engine.execute("PRAGMA temp_store").scalar(), 2)
+
+    def test_custom_performance_profile(self):
+        manager = BookcaseDbManager(db_name="profile",
+                                    profile=PerformanceProfile(journal_mode="DELETE", cache_size=-4000))
+        try:
+            self.assertEqual(manager.engine.execute("PRAGMA journal_mode").scalar(), "delete")
+            self.assertEqual(manager.engine.execute("PRAGMA cache_size").scalar(), -4000)
+        finally:
+            manager.cleanup()
+            os.remove("profile.db")
+
+    def test_performance_profile_invalid_value(self):
+        try:
+            PerformanceProfile(synchronous="OFF; DROP TABLE books")
+            self.fail()
+        except exc.InvalidInputException:
+            pass
+
+    def test_batch_commits_once(self):
+        with self.manager.batch():
+            self.add_three_books()
+            self.manager.delete_book(self.manager.search_by_shelf("1-1")[-1])
+        self.assertEqual(len(self.manager.get_all_books()), 2)
+
+    def test_batch_rolls_back_on_error(self):
+        try:
+            with self.manager.batch():
+                self.add_three_books()
+                self.manager.add_book(title="No author")
+            self.fail()
+        except exc.InvalidInputException:
+            pass
+        self.assertEqual(len(self.manager.get_all_books()), 0)
+
+    def test_nested_batch_joins_outer(self):
+        try:
+            with self.manager.batch():
+                with self.manager.batch():
+                    self.add_three_books()
+                self.manager.import_table(self.manager.dump_table())
+                raise exc.BookcaseManagerException()
+        except exc.BookcaseManagerException:
+            pass
+        self.assertEqual(len(self.manager.get_all_books()), 0)
+
+    def test_clear_table(self):
+        self.add_three_books()
+        self.assertEqual(self.manager.clear_table(), 3)
+        self.assertEqual(len(self.manager.get_all_books()), 0)
+        self.assertEqual(len(self.manager.search_fulltext("tolkien")), 0)
+
+    def test_delete_books_by_shelf(self):
+        self.add_three_books()
+        book = self.manager.search_by_shelf("1-1")[-1]
+        self.assertEqual(self.manager.delete_books(shelf="1-1"), 1)
+        self.assertNotIn(book, self.manager.session)
+        self.assertEqual(len(self.manager.get_all_books()), 2)
+
+    def test_delete_books_by_genre_and_id_range(self):
+        self.add_three_books()
+        first = list(self.manager.iter_books())[0]
+        self.assertEqual(self.manager.delete_books(genre="fantasy", id_range=(first.id + 1, first.id + 2)), 1)
+        self.assertEqual(len(self.manager.search_by_genre("fantasy")), 1)
+
+    def test_get_book(self):
+        self.add_three_books()
+        book = self.manager.search_by_shelf("1-1")[-1]
+        self.assertIs(self.manager.get_book(book.id), book)
+        self.assertIsNone(self.manager.get_book(book.id + 100))
+
+    def test_search_results_loaded_when_few(self):
+        self.add_three_books()
+        results = SearchResults.query(self.manager, "title", "lord", page_size=100)
+        self.assertTrue(results.loaded)
+        self.assertEqual(results.count, 2)
+        self.assertFalse(SearchResults.query(self.manager, "title", "lord", page_size=100, narrow_limit=1).loaded)
+        self.assertFalse(SearchResults.query(self.manager, "isbn", "978-618-02-0088-1", page_size=100).loaded)
+
+    def test_search_results_narrow_like_db(self):
+        self.add_three_books()
+        results = SearchResults.query(self.manager, "title", "l", page_size=100)
+        for value in ("lo", "lord of", "lord of the ret", "lord x"):
+            self.assertTrue(results.can_narrow("title", value))
+            narrowed = results.narrow(value)
+            self.assertEqual(set(narrowed.books), set(self.manager.search("title", value)))
+            self.assertEqual(narrowed.count, self.manager.count("title", value))
+        self.assertFalse(results.can_narrow("title", "pride"))
+        self.assertFalse(results.can_narrow("author", "lo"))
+
+    def test_search_cache_hits(self):
+        self.add_three_books()
+        stats = self.manager.cache_stats()
+        self.assertEqual(len(self.manager.search_by_author("tolkien")), 2)
+        self.assertEqual(len(self.manager.search_by_author(" Tolkien ")), 2)
+        self.assertEqual(self.manager.cache_stats().misses, stats.misses + 1)
+        self.assertEqual(self.manager.cache_stats().hits, stats.hits + 1)
+
+    def test_search_cache_invalidated_by_writes(self):
+        self.add_three_books()
+        self.assertEqual(len(self.manager.search_by_genre("fantasy")), 2)
+        self.manager.add_book(title="The Hobbit", author="J.R.Tolkien", genre="fantasy")
+        self.assertEqual(len(self.manager.search_by_genre("fantasy")), 3)
+        self.assertEqual(self.manager.count("genre", "fantasy"), 3)
+        self.manager.delete_books(genre="fantasy")
+        self.assertEqual(self.manager.search_by_genre("fantasy"), [])
+        self.assertEqual(self.manager.count("genre", "fantasy"), 0)
+
+    def test_search_cache_invalidated_by_other_manager(self):
+        self.add_three_books()
+        other = BookcaseDbManager()
+        self.assertEqual(other.count("author", "tolkien"), 2)
+        self.manager.add_book(title="The Hobbit", author="J.R.Tolkien")
+        self.assertEqual(other.count("author", "tolkien"), 3)
+        other.cleanup()
+
+    def test_search_cache_invalidated_by_other_process(self):
+        self.add_three_books()
+        self.assertEqual(self.manager.count("author", "tolkien"), 2)
+        code = ("import sys\n"
+                "from bookcase_db.bookcase_db import BookcaseDbManager\n"
+                "manager = BookcaseDbManager(cache_size=0)\n"
+                "manager.add_book(title='The Hobbit', author='J.R.Tolkien')\n"
+                "manager.cleanup()")
+        subprocess.run([sys.executable, "-c", code], check=True)
+        self.assertEqual(self.manager.count("author", "tolkien"), 3)
+
+    def test_query_cache_evicts_least_recently_used(self):
+        cache = QueryCache(max_size=2)
+        cache.get("a", lambda: [1])
+        cache.get("b", lambda: [2])
+        cache.get("a", lambda: [1])
+        cache.get("c", lambda: [3])
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.stats().hits, 1)
+        self.assertEqual(cache.stats().misses, 3)
+
+    def test_search_returns_summaries(self):
+        self.add_three_books()
+        for field, value in (("title", "pride"), ("shelf", "1-1"), (None, "")):
+            summary = self.manager.search(field, value)[-1]
+            self.assertIsInstance(summary, BookSummary)
+            self.assertEqual(str(summary), "PRIDE AND PREJUDICE, JANE AUSTIN, , -1 | 1-1")
+        book = self.manager.get_book(summary.id)
+        self.assertIsInstance(book, Book)
+        self.assertEqual(summary.get_row(), book.get_row())
+        self.assertRaises(AttributeError, setattr, summary, "title", "")
+
+    def test_find_combines_predicates(self):
+        self.add_three_books()
+        self.manager.add_book(title="The Hobbit", author="J.R.Tolkien", publication_year=1937, shelf="2-1")
+        self.manager.add_book(title="The Silmarillion", author="J.R.Tolkien", publication_year=1977, shelf="2-3")
+        query = BookQuery().contains("author", "tolkien").contains("title", "the").prefix("shelf", "2-")
+        self.assertEqual(self.manager.count_matching(query), 2)
+        query.between("publication_year", high=1950)
+        result = self.manager.find(query)
+        self.assertEqual([book.title for book in result], ["THE HOBBIT"])
+        self.assertEqual(self.manager.count_matching(query), 1)
+
+    def test_find_ignores_empty_predicates(self):
+        self.add_three_books()
+        query = BookQuery().contains("title", "").equals("isbn", "").between("publication_year")
+        self.assertFalse(query)
+        self.assertEqual(len(self.manager.find(query)), 3)
+        self.assertEqual(self.manager.count_matching(BookQuery().equals("genre", "fantasy")), 2)
+        self.assertEqual(self.manager.count_matching(BookQuery().contains("title", "!!")), 0)
+
+    def test_query_key(self):
+        query = BookQuery().between("publication_year", high=1950).between("publication_year", low=1930)
+        self.assertEqual(query.key, BookQuery().between("publication_year", low=1930)
+                         .between("publication_year", high=1950).key)
+        self.manager.add_book(title="The Hobbit", author="J.R.Tolkien", publication_year=1937)
+        self.assertEqual(self.manager.count_matching(query), 1)
+
+    def test_find_invalid_field(self):
+        self.assertRaises(exc.InvalidInputException, BookQuery().prefix, "copies", "1")
+
+    def query_plan(self, query):
+        statement = self.manager.find_query(query).with_entities(Book.id).statement.compile(
+            compile_kwargs={"literal_binds": True})
+        return " ".join(row[-1] for row in self.manager.session.execute("EXPLAIN QUERY PLAN " + str(statement)))
+
+    def test_find_uses_indexes(self):
+        self.assertIn("ix_books_shelf", self.query_plan(BookQuery().prefix("shelf", "1-")))
+        self.assertIn("ix_books_isbn", self.query_plan(BookQuery().equals("isbn", "978-618-02-0088-1")
+                                                       .between("publication_year", 1900, 2000)))
+        self.assertIn("books_fts", self.query_plan(BookQuery().prefix("shelf", "1-").contains("author", "tolkien")))
+
+    def test_search_greek_accent_and_case_insensitive(self):
+        self.manager.add_book(title="Ιλιάδα", author="Όμηρος", genre="Έπος")
+        self.manager.add_book(title="Οδύσσεια", author="ΌΜΗΡΟΣ", genre="έπος")
+        self.assertEqual(len(self.manager.search_by_author("Ομηρος")), 2)
+        self.assertEqual(len(self.manager.search_by_author("ομηροσ")), 2)
+        self.assertEqual(len(self.manager.search_by_title("ΟΔΥΣΣΕΙΑ")), 1)
+        self.assertEqual(len(self.manager.search_by_genre("επος")), 2)
+        self.assertEqual(len(self.manager.search_fulltext("ιλιαδα")), 1)
+        self.assertEqual(self.manager.count("author", "ομηρ"), 2)
+        self.assertEqual(self.manager.count_matching(BookQuery().equals("genre", "ΕΠΟΣ")), 2)
+
+    def test_normalised_columns_follow_edits(self):
+        self.manager.add_book(title="Ιλιάδα", author="Όμηρος")
+        book = self.manager.search_by_author("ομηρος")[-1]
+        book.author = "Ησίοδος"
+        self.manager.save_book()
+        self.assertEqual(book.author_normalised, "ησιοδοσ")
+        self.assertEqual(len(self.manager.search_fulltext("ησιοδ")), 1)
+        self.assertEqual(len(self.manager.search_fulltext("ομηρος")), 0)
+
+    def test_import_table_normalises(self):
+        self.manager.import_table((book_header(), ("Ιλιάδα", "Όμηρος", "", "", 1, "", 1, "", "-")))
+        self.assertEqual(len(self.manager.search_by_author("ΟΜΗΡΟΣ")), 1)
+
+    def test_create_db_migrates_version_1_db(self):
+        connection = sqlite3.connect("legacy.db")
+        connection.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title VARCHAR, author VARCHAR, "
+                           "translator VARCHAR, publication_year INTEGER, isbn VARCHAR, publisher VARCHAR, "
+                           "shelf VARCHAR, copies INTEGER, genre VARCHAR, title_normalised VARCHAR)")
+        connection.execute("CREATE INDEX ix_books_author ON books (author)")
+        connection.execute("CREATE INDEX ix_books_genre ON books (genre)")
+        connection.execute("CREATE VIRTUAL TABLE books_fts USING fts5(title, author, translator, publisher, genre, "
+                           "content='books', content_rowid='id')")
+        connection.execute("INSERT INTO books (title, author, translator, publisher, genre, title_normalised) "
+                           "VALUES ('ΙΛΙΆΔΑ', 'ΌΜΗΡΟΣ', '', '', '', 'ΙΛΙΆΔΑ')")
+        connection.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+        connection.execute("PRAGMA user_version = 1")
+        connection.commit()
+        connection.close()
+        manager = BookcaseDbManager(db_name="legacy")
+        try:
+            manager.create_db()
+            self.assertEqual(manager.engine.execute("PRAGMA user_version").scalar(), len(MIGRATIONS))
+            indexes = [index["name"] for index in sql.inspect(manager.engine).get_indexes("books")]
+            self.assertNotIn("ix_books_author", indexes)
+            self.assertNotIn("ix_books_genre", indexes)
+            self.assertIn("ix_books_genre_normalised", indexes)
+            book = manager.search_by_author("ομηρος")[-1]
+            self.assertEqual(book.title_normalised, "ιλιαδα")
+            self.assertEqual(len(manager.search_fulltext("ιλιαδα")), 1)
+            self.assertEqual(len(manager.search_fulltext("ιλ")), 1)
+            self.assertIn("prefix='1 2 3'", manager.engine.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'books_fts'").scalar())
+        finally:
+            manager.cleanup()
+            os.remove("legacy.db")
+
+    def test_search_fuzzy(self):
+        self.add_three_books()
+        self.manager.add_book(title="Crime and Punishment", author="Fyodor Dostoevsky")
+        self.assertEqual([book.author for book in self.manager.search_fuzzy("author", "Tolkein")],
+                         ["J.R.TOLKIEN", "J.R.TOLKIEN"])
+        self.assertEqual(self.manager.search_fuzzy("author", "Dostoyevsky")[-1].title, "CRIME AND PUNISHMENT")
+        self.assertEqual(self.manager.search_fuzzy("title", "prejudise")[-1].title, "PRIDE AND PREJUDICE")
+        self.assertEqual(self.manager.search_fuzzy("title", "tolkein"), [])
+        self.assertEqual(len(self.manager.search_fuzzy("author", "Tolkein", max_results=1)), 1)
+        self.assertRaises(exc.InvalidInputException, self.manager.search_fuzzy, "isbn", "978")
+
+    def test_fuzzy_candidates_skip_common_trigrams(self):
+        self.add_three_books()
+        session = self.manager.session
+        with mock.patch("bookcase_db.trigrams.MAX_POSTINGS", 1):
+            self.assertEqual(TrigramIndex.selective_trigrams(session, "author", "Tolkein Austin"),
+                             sorted(trigrams("Austin")))
+            self.assertEqual(TrigramIndex.selective_trigrams(session, "author", "Tolkien"),
+                             sorted(trigrams("Tolkien")))
+            self.assertEqual(len(TrigramIndex.candidates(session, "author", "Tolkien", 10)), 1)
+            self.assertEqual([book.author for book in self.manager.search_fuzzy("author", "Austen")],
+                             ["JANE AUSTIN"])
+
+    def test_search_fuzzy_follows_edits_and_deletes(self):
+        self.add_three_books()
+        book = self.manager.search_by_shelf("1-1")[-1]
+        book.author = "Jane Austen"
+        self.manager.save_book()
+        self.assertEqual(self.manager.search_fuzzy("author", "Austin")[-1].id, book.id)
+        self.manager.delete_books(shelf="1-1")
+        self.assertEqual(self.manager.search_fuzzy("author", "Austin"), [])
+        self.assertEqual(self.manager.engine.execute(
+            "SELECT count(*) FROM book_trigrams WHERE book_id = {:d}".format(book.id)).scalar(), 0)
@@ -0,0 +1,189 @@
+import re
+
+import sqlalchemy as sql
+
+from bookcase_db.data_schema import normalise_text, normalised_column
+
+FUZZY_FIELDS = ("title", "author")
+
+FUZZY_RESULTS = 20
+
+CANDIDATE_FACTOR = 10
+
+TRIGRAM_TABLE = "book_trigrams"
+
+MAX_TEXT_LENGTH = 1000
+
+CREATE_STATEMENTS = (
+    "CREATE TABLE IF NOT EXISTS {table} (field VARCHAR NOT NULL, trigram VARCHAR NOT NULL, "
+    "book_id INTEGER NOT NULL, PRIMARY KEY (field, trigram, book_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_{table}_book_id ON {table} (book_id)",
+    "CREATE TABLE IF NOT EXISTS trigram_positions (n INTEGER PRIMARY KEY)",
+)
+
+INSERT_TRIGRAMS = ("INSERT OR IGNORE INTO {table} (field, trigram, book_id) "
+                   "SELECT '{field}', substr(' ' || {row}.{column} || ' ', n, 3), {row}.id "
+                   "FROM {source}trigram_positions WHERE n <= length({row}.{column})")
+
+DELETE_TRIGRAMS = "DELETE FROM {table} WHERE book_id = old.id"
+
+# trigrams in more books than this are too common to tell candidates apart, at most this many of their books are read
+MAX_POSTINGS = 5000
+
+POSTINGS_STATEMENT = ("SELECT :{name}, count(*) FROM (SELECT 1 FROM {table} "
+                      "WHERE field = :field AND trigram = :{name} LIMIT :max_postings + 1)")
+
+POSTING_STATEMENT = ("SELECT book_id FROM (SELECT book_id FROM {table} "
+                     "WHERE field = :field AND trigram = :{name} LIMIT :max_postings)")
+
+CANDIDATES_STATEMENT = ("SELECT book_id, count(*) AS shared FROM ({postings}) "
+                        "GROUP BY book_id ORDER BY shared DESC, book_id LIMIT :limit")
+
+
+def trigrams(text):
+    """
+    :return: the set of the trigrams of the normalised text padded with a space, as stored in the trigram table
+    """
+    padded = " " + normalise_text(text)[:MAX_TEXT_LENGTH] + " "
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(a, b):
+    """
+    Optimal string alignment distance, a transposition of adjacent characters counts as one edit
+    """
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+def word_distance(query, text):
+    """
+    :return: the smallest edit distance between the normalised query and a run of as many words of the text
+    """
+    query_words = re.findall(r"\w+", normalise_text(query))
+    words = re.findall(r"\w+", normalise_text(text))
+    if not query_words or not words:
+        return len(" ".join(query_words) or text or "")
+    size = min(len(query_words), len(words))
+    query = " ".join(query_words)
+    return min(edit_distance(query, " ".join(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+def max_distance(query):
+    """
+    :return: the number of typos tolerated in a query, one per three characters
+    """
+    return max(1, len(normalise_text(query)) // 3)
+
+
+def rank_candidates(field, query, books, shared, max_results):
+    """
+    Ranks the candidates by edit distance of their words to the query, then by the number of shared trigrams
+    :param books: the candidate books
+    :param shared: dict mapping the id of every candidate to the number of trigrams it shares with the query
+    :return: list of at most max_results books, within max_distance of the query
+    """
+    limit = max_distance(query)
+    scored = sorted((word_distance(query, getattr(book, field)), -shared[book.id], book.id, book) for book in books)
+    return [book for distance, _, _, book in scored if distance <= limit][:max_results]
+
+
+def format_statement(statement, **kwargs):
+    return statement.format(table=TRIGRAM_TABLE, **kwargs)
+
+
+def insert_statements(row, source=""):
+    """
+    :return: the statements that insert the trigrams of every fuzzy field of the row
+    """
+    return [format_statement(INSERT_TRIGRAMS, field=field, column=normalised_column(field), row=row, source=source)
+            for field in FUZZY_FIELDS]
+
+
+def trigger_statements():
+    columns = ", ".join(normalised_column(field) for field in FUZZY_FIELDS)
+    on_insert = insert_statements("new")
+    on_delete = [format_statement(DELETE_TRIGRAMS)]
+    return (
+        format_statement("CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON books BEGIN {body}; END",
+                         body="; ".join(on_insert)),
+        format_statement("CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON books BEGIN {body}; END",
+                         body="; ".join(on_delete)),
+        format_statement("CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {columns} ON books "
+                         "BEGIN {body}; END", columns=columns, body="; ".join(on_delete + on_insert)),
+    )
+
+
+class TrigramIndex(object):
+    """
+    Class that manages the trigram table of the normalised title and author columns, used for typo tolerant search
+    The table maps every trigram to the books containing it and is kept in sync with the books table by triggers,
+    so a search only reads the books that share trigrams with the query
+    """
+    def __init__(self, engine):
+        self.engine = engine
+
+    @staticmethod
+    def exists(connection):
+        result = connection.execute(sql.text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+                                    name=TRIGRAM_TABLE)
+        return result.scalar() is not None
+
+    def create(self):
+        """
+        Creates the trigram table and its triggers if missing and populates it from the existing books
+        """
+        with self.engine.begin() as connection:
+            populate = not self.exists(connection)
+            for statement in CREATE_STATEMENTS:
+                connection.execute(format_statement(statement))
+            if not connection.execute("SELECT count(*) FROM trigram_positions").scalar():
+                connection.execute("INSERT INTO trigram_positions (n) VALUES (?)",
+                                   [(n,) for n in range(1, MAX_TEXT_LENGTH + 1)])
+            for trigger in trigger_statements():
+                connection.execute(trigger)
+            if populate:
+                for statement in insert_statements("books", source="books, "):
+                    connection.execute(statement)
+
+    @staticmethod
+    def candidates(session, field, query, limit):
+        """
+        :param session: the session the query runs in
+        :param field: one of FUZZY_FIELDS
+        :param query: the search string
+        :param limit: maximum number of candidates
+        :return: list of (book id, number of trigrams shared with the query), most shared first
+        """
+        query_trigrams = TrigramIndex.selective_trigrams(session, field, query)
+        if not query_trigrams:
+            return []
+        names = ["trigram_{}".format(i) for i in range(len(query_trigrams))]
+        postings = " UNION ALL ".join(format_statement(POSTING_STATEMENT, name=name) for name in names)
+        statement = sql.text(format_statement(CANDIDATES_STATEMENT, postings=postings))
+        parameters = dict(zip(names, query_trigrams), field=field, limit=limit, max_postings=MAX_POSTINGS)
+        return [tuple(row) for row in session.execute(statement, parameters)]
+
+    @staticmethod
+    def selective_trigrams(session, field, query):
+        """
+        Trigrams in more than MAX_POSTINGS books, such as those of words every title shares, are skipped, so the
+        candidates are read from at most MAX_POSTINGS books per trigram whatever the size of the catalog
+        :return: the sorted trigrams of the query in 1 to MAX_POSTINGS books, all of them if none is
+        """
+        query_trigrams = sorted(trigrams(query))
+        if not query_trigrams:
+            return []
+        names = ["trigram_{}".format(i) for i in range(len(query_trigrams))]
+        statement = sql.text(" UNION ALL ".join(format_statement(POSTINGS_STATEMENT, name=name) for name in names))
+        parameters = dict(zip(names, query_trigrams), field=field, max_postings=MAX_POSTINGS)
+        selective = sorted(trigram for trigram, books in session.execute(statement, parameters)
+                           if 0 < books <= MAX_POSTINGS)
+        return selective or query_trigrams
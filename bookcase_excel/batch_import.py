@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import Manager
+
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_db.bulk_import import RowValidator, CHUNK_SIZE
+from bookcase_excel.bookcase_excel import Excel
+import bookcase_lib as lib
+
+QUEUED_CHUNKS = 4
+
+
+def parse_sheet(path, filename, sheet_name, chunks, chunk_size=CHUNK_SIZE):
+    """
+    Reads and validates one worksheet in a worker process, sending it to the writer a chunk at a time
+    :param path: the directory of the Excel file
+    :param filename:
+    :param sheet_name: the worksheet to read, the active one if None
+    :param chunks: queue that receives (list of normalised book attribute dicts, number of rejected rows) chunks,
+                   then an exception if reading failed, then None
+    :param chunk_size: number of valid rows per chunk
+    """
+    try:
+        rows = Excel(path).iter_excel(filename, sheet_name)
+        header = next(rows, None)
+        if header is None:
+            return
+        validator = RowValidator(partial(BookcaseDbManager.get_book_attributes_from_row,
+                                         BookcaseDbManager.get_indexes_for_book_attributes(header)))
+        chunk, rejected = [], 0
+        for mapping in validator.validate(rows):
+            chunk.append(mapping)
+            if len(chunk) == chunk_size:
+                chunks.put((chunk, validator.rejected - rejected))
+                chunk, rejected = [], validator.rejected
+        chunks.put((chunk, validator.rejected - rejected))
+    except Exception as e:
+        chunks.put(e)
+    finally:
+        chunks.put(None)
+
+
+def iter_chunks(queues):
+    """
+    :param queues: the chunk queues of the worksheets, in import order
+    :return: generator of the chunks of every worksheet in order
+    :raises: the exception a worker failed with
+    """
+    for chunks in queues:
+        for chunk in iter(chunks.get, None):
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+class BatchImporter(object):
+    """
+    Class that imports many Excel files and/or all the worksheets of a workbook
+    Worksheets are parsed and validated in a process pool and sent in chunks to a single writer,
+    which inserts them to DB in the order they were given. Every worksheet has a queue of at most QUEUED_CHUNKS,
+    so memory does not grow with the size of the worksheets and the writer starts with the first chunk.
+    The pool runs the worksheets in order, so the one the writer waits for is always being read
+    """
+    def __init__(self, path=lib.FileManager().path, workers=None, chunk_size=CHUNK_SIZE):
+        """
+        :param path: the directory of the Excel files
+        :param workers: number of worker processes, the number of CPUs if None
+        :param chunk_size: number of valid rows a worker sends at a time
+        """
+        self.path = path
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def list_sheets(self, filenames, all_sheets=True):
+        """
+        :param filenames: list of Excel files
+        :param all_sheets: read every worksheet if True else only the active one
+        :return: list of (filename, sheet name) pairs
+        """
+        sheets = []
+        for filename in filenames:
+            if all_sheets:
+                sheets.extend((filename, sheet_name) for sheet_name in Excel(self.path).sheet_names(filename))
+            else:
+                Excel.validate_filename(filename)
+                sheets.append((filename, None))
+        return sheets
+
+    def import_files(self, db_manager, filenames, all_sheets=True):
+        """
+        :param db_manager: the BookcaseDbManager of the DB to import to
+        :param filenames: list of Excel files
+        :param all_sheets: read every worksheet if True else only the active one
+        :return: ImportResult with the counts of imported and rejected rows
+        """
+        sheets = self.list_sheets(filenames, all_sheets)
+        if not sheets:
+            return db_manager.import_validated(())
+        # the manager is shut down first on errors, so that workers blocked on full queues fail and the pool exits
+        with ProcessPoolExecutor(self.workers) as executor, Manager() as manager:
+            queues = [manager.Queue(QUEUED_CHUNKS) for _ in sheets]
+            futures = [executor.submit(parse_sheet, self.path, filename, sheet_name, chunks, self.chunk_size)
+                       for (filename, sheet_name), chunks in zip(sheets, queues)]
+            try:
+                return db_manager.import_validated(iter_chunks(queues), self.chunk_size)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
@@ -1,5 +1,4 @@
 import re
-import openpyxl as xl
 
 import bookcase_exceptions as exc
 import bookcase_lib as lib
@@ -9,7 +8,11 @@ from bookcase_translations import Translations
 class Excel(object):
     """
     Class for input/output to Excel worksheet
+    openpyxl is imported when a workbook is first read or written, it takes longer to import than the whole GUI
     """
+    name = "Excel"
+    extension = ".xlsx"
+
     def __init__(self, path=lib.FileManager().path):
         self.path = path
 
@@ -33,25 +36,60 @@ class Excel(object):
         :param filename:
         :return: tuple of tuples representing the table
         """
+        return tuple(self.iter_excel(filename))
+
+    def iter_excel(self, filename, sheet_name=None):
+        """
+        Streams the table from the specified Excel file without loading the whole workbook
+        :param filename:
+        :param sheet_name: the worksheet to read, the active one if None
+        :return: generator of tuples, one per row of the table
+        """
+        import openpyxl as xl
+        self.validate_filename(filename)
+        return self.iter_rows(xl.load_workbook(self.path + filename, read_only=True), sheet_name)
+
+    def sheet_names(self, filename):
+        """
+        :param filename:
+        :return: list with the names of all worksheets in the Excel file
+        """
+        import openpyxl as xl
         self.validate_filename(filename)
-        workbook = xl.load_workbook(self.path + filename)
-        result = []
-        for row in workbook.active.iter_rows():
-            result.append(tuple(cell.value for cell in row))
-        return tuple(result)
+        workbook = xl.load_workbook(self.path + filename, read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+
+    def iter_table(self, filename):
+        return self.iter_excel(filename)
+
+    @staticmethod
+    def iter_rows(workbook, sheet_name=None):
+        try:
+            worksheet = workbook[sheet_name] if sheet_name else workbook.active
+            for row in worksheet.iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
 
     def write_excel(self, name, table):
         """
         Writes a table to an excel file
+        Rows are streamed to a write-only workbook so the table can be a generator of any size
         :param name: the name of the exported DB
-        :param table: 2-D array containing DB table dump
+        :param table: iterable of rows containing DB table dump
         :return: absolute path to file + filename
         """
-        workbook = xl.Workbook()
-        worksheet = workbook.active
-        for row_num, row in enumerate(table):
-            for col_num, value in enumerate(row):
-                worksheet.cell(row=row_num + 1, column=col_num + 1, value=value)
+        import openpyxl as xl
+        workbook = xl.Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        for row in table:
+            worksheet.append(row)
         file = self.path + "bookcase_{name}.xlsx".format(name=name)
         workbook.save(file)
         return file
+
+    def write_table(self, name, table):
+        return self.write_excel(name, table)
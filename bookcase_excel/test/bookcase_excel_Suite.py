@@ -1,5 +1,8 @@
 import os
 import unittest
+import openpyxl as xl
+from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_excel.batch_import import BatchImporter
 from bookcase_excel.bookcase_excel import Excel
 import bookcase_exceptions as exc
 
@@ -33,3 +36,70 @@ class BookcaseExcelSuite(unittest.TestCase):
 
         read_data = self.bookcase_excel.read_excel(self.filename)
         self.assertEqual(read_data, self.input_data)
+
+    def test_iter_excel(self):
+        self.bookcase_excel.write_excel("test_lib", self.input_data)
+        rows = self.bookcase_excel.iter_excel(self.filename)
+        self.assertEqual(next(rows), self.input_data[0])
+        self.assertEqual(tuple(rows), self.input_data[1:])
+
+    def test_iter_excel_invalid_filename(self):
+        try:
+            self.bookcase_excel.iter_excel("invalid.xlsx")
+            self.fail()
+        except exc.InvalidInputException:
+            pass
+
+    def test_write_file_from_generator(self):
+        self.bookcase_excel.write_excel("test_lib", (row for row in self.input_data))
+        self.assertEqual(self.bookcase_excel.read_excel(self.filename), self.input_data)
+
+    def test_sheet_names(self):
+        self.bookcase_excel.write_excel("test_lib", self.input_data)
+        self.assertEqual(len(self.bookcase_excel.sheet_names(self.filename)), 1)
+
+    def test_batch_import(self):
+        files = ("bookcase_test_lib.xlsx", "bookcase_test_branch.xlsx")
+        header = ("title", "author", "genre")
+        workbook = xl.Workbook()
+        workbook.active.append(header)
+        workbook.active.append(("Odyssey", "Homer", "epic"))
+        second_sheet = workbook.create_sheet()
+        second_sheet.append(header)
+        second_sheet.append(("Iliad", "Homer", "epic"))
+        second_sheet.append(("No Author", None, None))
+        workbook.save(files[1])
+        self.bookcase_excel.write_excel("test_lib", (header, ("Hamlet", "Shakespeare", "drama")))
+        manager = BookcaseDbManager(db_name="test_batch")
+        manager.create_db()
+        try:
+            result = BatchImporter(path="", workers=2).import_files(manager, files)
+            self.assertEqual(result, (3, 1))
+            self.assertEqual([book.title for book in manager.iter_books()], ["HAMLET", "ODYSSEY", "ILIAD"])
+        finally:
+            manager.cleanup()
+            for file in files[1:] + ("test_batch.db",):
+                os.remove(file)
+
+    def test_batch_import_in_chunks(self):
+        files = ("bookcase_test_lib.xlsx", "bookcase_test_branch.xlsx")
+        header = ("title", "author")
+        for file, prefix in zip(files, ("a", "b")):
+            Excel(path="").write_excel(file[len("bookcase_"):-len(".xlsx")],
+                                       [header] + [("{} {:02d}".format(prefix, i), "Homer") for i in range(25)] +
+                                       [(None, "No Title")])
+        manager = BookcaseDbManager(db_name="test_batch")
+        manager.create_db()
+        try:
+            result = BatchImporter(path="", workers=2, chunk_size=4).import_files(manager, files)
+            self.assertEqual(result, (50, 2))
+            titles = [book.title for book in manager.iter_books()]
+            self.assertEqual(titles, ["A {:02d}".format(i) for i in range(25)] +
+                             ["B {:02d}".format(i) for i in range(25)])
+            self.assertRaises(FileNotFoundError, BatchImporter(path="", workers=2).import_files, manager,
+                              ["bookcase_missing.xlsx"], all_sheets=False)
+            self.assertEqual(manager.count(), 50)
+        finally:
+            manager.cleanup()
+            for file in files[1:] + ("test_batch.db",):
+                os.remove(file)
@@ -4,3 +4,7 @@ class BookcaseManagerException(Exception):
 
 class InvalidInputException(BookcaseManagerException):
     pass
+
+
+class LockedException(BookcaseManagerException):
+    pass
@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+
+import bookcase_exceptions as exc
+
+
+class TaskCancelled(exc.BookcaseManagerException):
+    pass
+
+
+class Task(object):
+    """
+    Handle of a function running in a BackgroundWorker thread
+    """
+    def __init__(self, key, on_done, on_error, on_progress, events):
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.events = events
+        self._cancelled = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Marks the task as cancelled, its result will be discarded
+        The function stops at its next progress report if it is already running
+        """
+        self._cancelled.set()
+        if self.future:
+            self.future.cancel()
+
+    def report_progress(self, value):
+        """
+        Called from the worker thread to send progress to the main loop
+        :raises: TaskCancelled if the task has been cancelled
+        """
+        if self.cancelled:
+            raise TaskCancelled()
+        self.events.put((self, self.on_progress, value))
+
+    def track(self, iterable, every=1000):
+        """
+        Wraps an iterable to report the number of items consumed every so many items
+        :raises: TaskCancelled if the task is cancelled while iterating
+        """
+        count = 0
+        for count, item in enumerate(iterable, start=1):
+            if not count % every:
+                self.report_progress(count)
+            yield item
+        self.report_progress(count)
+
+
+class BackgroundWorker(object):
+    """
+    Class that runs DB work off the Tk main loop in a thread pool
+    Every thread owns a BookcaseDbManager, and so its own SQLite connections.
+    Results, errors and progress are queued and polled with root.after, so all callbacks run in the main loop
+    """
+    poll_interval = 50
+
+    def __init__(self, root, db_manager_factory, workers=2):
+        """
+        :param root: the Tk widget used to schedule polling
+        :param db_manager_factory: function that creates a BookcaseDbManager for a worker thread
+        :param workers: number of worker threads
+        """
+        self.root = root
+        self.db_manager_factory = db_manager_factory
+        self.executor = ThreadPoolExecutor(workers)
+        self.local = threading.local()
+        self.db_managers = []
+        self.lock = threading.Lock()
+        self.events = queue.Queue()
+        self.running = set()
+        self.latest = dict()
+        self.polling = False
+
+    def submit(self, key, function, on_done=lambda result: None, on_error=None, on_progress=lambda value: None):
+        """
+        Runs function(db_manager, task) in a worker thread
+        :param key: a newer task with the same key cancels the older one, None for tasks that are never replaced
+        :param on_done: called in the main loop with the result
+        :param on_error: called in the main loop with the exception raised, if any
+        :param on_progress: called in the main loop with the values passed to task.report_progress
+        :return: the Task
+        """
+        if key is not None:
+            self.cancel(key)
+        task = Task(key, on_done, on_error or self.raise_error, on_progress, self.events)
+        if key is not None:
+            self.latest[key] = task
+        self.running.add(task)
+        task.future = self.executor.submit(self.run, task, function)
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_interval, self.poll)
+        return task
+
+    def cancel(self, key):
+        """
+        Cancels the latest task submitted with key, if it is still running
+        """
+        task = self.latest.pop(key, None)
+        if task:
+            task.cancel()
+            self.running.discard(task)
+
+    def run(self, task, function):
+        if task.cancelled:
+            return
+        try:
+            result = function(self.get_db_manager(), task)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            self.events.put((task, task.on_error, e))
+            return
+        self.events.put((task, task.on_done, result))
+
+    def get_db_manager(self):
+        """
+        :return: the BookcaseDbManager of the calling worker thread
+        """
+        if not hasattr(self.local, "db_manager"):
+            self.local.db_manager = self.db_manager_factory()
+            with self.lock:
+                self.db_managers.append(self.local.db_manager)
+        return self.local.db_manager
+
+    def poll(self):
+        """
+        Dispatches queued events to their callbacks, ignoring the ones of cancelled tasks
+        """
+        while True:
+            try:
+                task, callback, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if not task.cancelled:
+                callback(value)
+            if callback is not task.on_progress:
+                self.running.discard(task)
+                if self.latest.get(task.key) is task:
+                    del self.latest[task.key]
+        if self.running:
+            self.root.after(self.poll_interval, self.poll)
+        else:
+            self.polling = False
+
+    @staticmethod
+    def raise_error(error):
+        raise error
+
+    def shutdown(self):
+        """
+        Cancels all tasks, waits for the running ones to stop and closes the worker DB managers
+        """
+        for task in self.running:
+            task.cancel()
+        self.running.clear()
+        self.latest.clear()
+        self.executor.shutdown(wait=True)
+        for db_manager in self.db_managers:
+            db_manager.cleanup()
+        del self.db_managers[:]
@@ -9,24 +9,27 @@ class BookcaseGui(object):
     Class to setup and run the root window
     """
     def __init__(self):
-        self.lock = lib.InstanceLock(lib.FileManager().path)
         self.root = tk.Tk()
         self.toolbar = MainToolbar(self.root)
 
     def cleanup(self):
         self.toolbar.cleanup()
-        self.lock.release_instance_lock()
 
     def setup_env(self):
-        self.lock.acquire_instance_lock()
         lib.Configuration().read_config()
 
-    def run(self):
+    def show(self):
+        """
+        Lays out the main window, it is drawn when the event loop runs
+        """
         self.setup_env()
         self.toolbar.setup_toolbar()
         StatusBar().pack(side=tk.BOTTOM, fill=tk.X)
         self.root.title("Bookcase Manager")
         self.root.geometry("1280x720+150+100")
+
+    def run(self):
+        self.show()
         self.root.mainloop()
 
 
@@ -1,11 +1,14 @@
 from collections import OrderedDict
+from functools import partial
+import os
 import tkinter as tk
 import tkinter.ttk as ttk
 
-from bookcase_db.bookcase_db import BookcaseDbManager
+from bookcase_csv.bookcase_csv import Csv, JsonLines
 from bookcase_excel.bookcase_excel import Excel
 from bookcase_exceptions import InvalidInputException
 import bookcase_lib as lib
+from bookcase_gui.background import BackgroundWorker
 from bookcase_gui.gui_data_schema import GuiBook
 from bookcase_translations import Translations
 import bookcase_exceptions as exc
@@ -15,6 +18,9 @@ FONT_11_NORMAL = ('Verdana', 11, 'normal')
 FONT_12_NORMAL = ('Verdana', 12, 'normal')
 FONT_14_NORMAL = ('Verdana', 14, 'normal')
 
+# row of a VirtualListbox page that is still being fetched
+LOADING = object()
+
 
 class ButtonToolbar(tk.Frame):
     """
@@ -23,22 +29,49 @@ class ButtonToolbar(tk.Frame):
     def __init__(self, root):
         super(ButtonToolbar, self).__init__(root, bg="Light Grey")
         self.root = root
-        self.photos = self.load_artifacts()
+        self.photos = Photos()
 
-    def create_toolbar_button(self, photo, command=lambda: None, on_hover_text="", side=tk.LEFT):
+    def create_toolbar_button(self, photo, command=lambda: None, on_hover_text="", side=tk.LEFT, text=""):
+        """
+        :param photo: the image of the button, the text is shown instead if None
+        """
         button = tk.Button(self, command=command)
-        button.config(image=photo, width=30, height=30)
+        if photo is not None:
+            button.config(image=photo, width=30, height=30)
+        else:
+            button.config(text=text, width=3, font=FONT_12_NORMAL)
         button.pack(side=side, padx=2, pady=2)
         button.bind("<Enter>", lambda x: StatusBar().set_status_from_event(x, on_hover_text))
         button.bind("<Leave>", StatusBar().clear_status_from_event)
         return button
 
-    @staticmethod
-    def load_artifacts():
-        photos = dict()
-        for file in lib.FileManager().load_photos():
-            photos[file] = tk.PhotoImage(file="artifacts/" + file)
-        return photos
+
+class Photos(object, metaclass=lib.Singleton):
+    """
+    Process wide cache of the toolbar images, shared by all toolbars
+    An image is read and decoded the first time it is requested, reopening a DB reuses the decoded images
+    """
+    def __init__(self):
+        self.path = lib.FileManager().artifacts_path
+        self.photos = dict()
+
+    def __getitem__(self, filename):
+        """
+        :param filename: the name of a file in the artifacts directory
+        :return: tk.PhotoImage
+        """
+        photo = self.photos.get(filename)
+        if photo is None:
+            photo = self.photos[filename] = tk.PhotoImage(file=os.path.join(self.path, filename))
+        return photo
+
+    def get(self, filename):
+        """
+        :return: the image or None if there is no such file
+        """
+        if filename not in self.photos and not os.path.isfile(os.path.join(self.path, filename)):
+            return None
+        return self[filename]
 
 
 class MainToolbar(ButtonToolbar):
@@ -67,11 +100,14 @@ class MainToolbar(ButtonToolbar):
             button.destroy()
 
     def create_lang_button(self):
-        lang = lib.Configuration().get_config("gui_language")
-        lang_changes = dict(gr="en", en="gr")
-        return self.create_toolbar_button(self.photos[lang_changes[lang] + "_icon.png"],
-                                          command=lambda: self.change_lang(lang_changes[lang]),
-                                          side=tk.RIGHT)
+        """
+        Creates the button that switches to the next available language, showing its flag if there is one
+        """
+        languages = Translations.languages()
+        lang = languages[(languages.index(Translations().language) + 1) % len(languages)]
+        return self.create_toolbar_button(self.photos.get(lang + "_icon.png"),
+                                          command=lambda: self.change_lang(lang),
+                                          side=tk.RIGHT, text=lang.upper())
 
     def change_lang(self, lang):
         """
@@ -80,6 +116,7 @@ class MainToolbar(ButtonToolbar):
         :param lang: Language to be ser
         """
         lib.Configuration().set_config("gui_language", lang)
+        Translations.set_language(lang)
         self.clear_toolbar()
         self.setup_toolbar()
 
@@ -101,9 +138,10 @@ class MainToolbar(ButtonToolbar):
         db_name = selection.strip(".db")
         if self.db_view and self.db_view.db_name == db_name:
             return
+        db_view = DbView(self.root, db_name, self.on_db_view_close)
         if self.db_view:
             self.db_view.close()
-        self.db_view = DbView(self.root, db_name, self.on_db_view_close)
+        self.db_view = db_view
         self.db_view.create_db_view()
 
     def create_new_db(self):
@@ -134,9 +172,30 @@ class DbView(ButtonToolbar):
     """
     Toolbar frame that manages the loaded DB
     """
+    file_formats = (Excel, Csv, JsonLines)
+
     def __init__(self, root, name, on_close_cb_func):
+        """
+        The DB is locked shared while the view is open, so other sessions and exports can read it
+        while bulk writers such as command line imports wait for it to close.
+        Every write of the view locks the DB for writing, see write_lock
+        :raises: LockedException if another process is writing to the DB
+        """
+        # SQLAlchemy is imported when the first DB is opened instead of delaying the main window
+        from bookcase_db.bookcase_db import BookcaseDbManager
+        self.db_file = lib.FileManager().path + name + ".db"
+        self.lock = lib.DbLock(self.db_file)
+        try:
+            self.lock.acquire(shared=True, timeout=0)
+        except exc.LockedException:
+            raise exc.LockedException(Translations().db_locked_msg + name)
+        try:
+            self.db_manager = BookcaseDbManager(lib.FileManager().path, db_name=name)
+        except Exception:
+            self.lock.release()
+            raise
         super(DbView, self).__init__(root)
-        self.db_manager = BookcaseDbManager(lib.FileManager().path, db_name=name)
+        self.worker = BackgroundWorker(root, partial(BookcaseDbManager, lib.FileManager().path, db_name=name))
         self._db_name = name
         self.book_view = None
         self.search_view = None
@@ -146,13 +205,56 @@ class DbView(ButtonToolbar):
     def db_name(self):
         return self._db_name
 
+    def write_lock(self, timeout=0):
+        """
+        Locks the DB exclusively for a write, so that it runs neither alongside command line readers
+        nor alongside the writes of other sessions of the DB
+        :param timeout: seconds to wait for the readers, writes in the main loop do not wait
+        :return: the acquired lock, released on exiting a with block
+        :raises: LockedException if another process is using the DB
+        """
+        try:
+            return lib.DbLock.for_writes(self.db_file).acquire(timeout=timeout)
+        except exc.LockedException:
+            raise exc.LockedException(Translations().db_busy_msg + self.db_name)
+
+    def locked_write(self, function):
+        """
+        :return: function(db_manager, task) for the BackgroundWorker that runs function holding the write lock
+        """
+        def write(db_manager, task):
+            with self.write_lock(timeout=lib.LOCK_TIMEOUT):
+                return function(db_manager, task)
+        return write
+
     def create_db_view(self):
-        self.db_manager.create_db()
-        print(self.db_manager.db_name)
+        """
+        Creates or migrates the DB in a background thread, the buttons are added once it is ready
+        """
         label = tk.Label(self, bg="SteelBlue1", text=self.db_manager.db_name, font=FONT_12_NORMAL,
                          relief=tk.GROOVE)
         label.pack(fill=tk.X)
+        self.pack(fill=tk.X, ipady=5)
+        StatusBar().set_status(Translations().preparing_db_msg)
+        self.worker.submit(None, self.locked_write(self.create_db),
+                           on_done=lambda result: self.create_buttons(),
+                           on_error=self.on_create_db_error,
+                           on_progress=partial(self.show_progress, Translations().preparing_db_msg))
 
+    @staticmethod
+    def create_db(db_manager, task):
+        db_manager.create_db(report_progress=task.report_progress)
+
+    def on_create_db_error(self, error):
+        """
+        Closes the view of a DB that could not be created or migrated
+        """
+        self.close()
+        StatusBar().set_status(error)
+
+    def create_buttons(self):
+        print(self.db_manager.db_name)
+        StatusBar().clear_status()
         self.create_toolbar_button(self.photos["edit.png"],
                                    command=self.open_book_view,
                                    on_hover_text=Translations().create_book_button_desc)
@@ -163,7 +265,6 @@ class DbView(ButtonToolbar):
         self.create_toolbar_button(self.photos["exit_button.png"],
                                    command=self.close,
                                    on_hover_text=Translations().exit_button_desc)
-        self.pack(fill=tk.X, ipady=5)
 
     def create_menu_button(self):
         button = tk.Menubutton(self)
@@ -173,36 +274,86 @@ class DbView(ButtonToolbar):
         button.bind("<Enter>", lambda x: StatusBar().set_status_from_event(x, Translations().import_export_desc))
         button.bind("<Leave>", StatusBar().clear_status_from_event)
 
-        button.menu.add_command(label=Translations().import_excel, command=self.import_from_excel, font=FONT_12_NORMAL)
-        button.menu.add_command(label=Translations().export_excel, command=self.export_to_excel, font=FONT_12_NORMAL)
+        for file_format in self.file_formats:
+            button.menu.add_command(label=Translations().import_from + file_format.name,
+                                    command=lambda fmt=file_format: self.import_from(fmt), font=FONT_12_NORMAL)
+        button.menu.add_command(label=Translations().batch_import_excel, command=self.batch_import_from_excel,
+                                font=FONT_12_NORMAL)
+        button.menu.add_separator()
+        for file_format in self.file_formats:
+            button.menu.add_command(label=Translations().export_to + file_format.name,
+                                    command=lambda fmt=file_format: self.export_to(fmt), font=FONT_12_NORMAL)
 
         button.pack(side=tk.LEFT, padx=2, pady=2)
 
-    def import_from_excel(self):
+    def import_from(self, file_format):
         """
-        Method called when import Excel menu option is selected.
-        Creates an open pop-up window
+        Method called when an import menu option is selected.
+        Creates an open pop-up window listing the files of the selected format
+        :param file_format: one of the classes in self.file_formats
         """
         top_level = tk.Toplevel(self.root)
-        OpenFrame(top_level, self.dump_excel_to_db, lib.FileManager().find_all_xlsx_files()).create_layout()
+        OpenFrame(top_level, lambda filename: self.dump_file_to_db(file_format, filename),
+                  lib.FileManager().find_files_with_extension(file_format.extension)).create_layout()
 
-    def dump_excel_to_db(self, filename):
+    def dump_file_to_db(self, file_format, filename):
         """
         Callback method called from open window.
-        Reads a table from excel and imports it to the database
+        Streams a table from the file and imports it to the database in a background thread
         """
-        table = Excel().read_excel(filename)
-        self.db_manager.import_table(table)
-        StatusBar().set_status(Translations().imported_from + filename)
+        file_format.validate_filename(filename)
+        self.worker.submit(None, self.locked_write(partial(self.import_file, file_format, filename)),
+                           on_done=lambda result: StatusBar().set_status(Translations().imported_from + filename),
+                           on_error=StatusBar().set_status,
+                           on_progress=partial(self.show_progress, Translations().importing_msg))
+
+    @staticmethod
+    def import_file(file_format, filename, db_manager, task):
+        return db_manager.import_table(task.track(file_format().iter_table(filename)))
 
-    def export_to_excel(self):
+    @staticmethod
+    def show_progress(message, count):
+        StatusBar().set_status("{msg} {count}".format(msg=message, count=count))
+
+    def batch_import_from_excel(self):
+        """
+        Method called when the batch import menu option is selected.
+        Creates an open pop-up window where many Excel files can be selected
         """
-        Method called when export Excel menu option is selected.
-        Gets a table dumped from DB and writes it to an excel workbook
+        top_level = tk.Toplevel(self.root)
+        OpenFrame(top_level, self.dump_excel_files_to_db, lib.FileManager().find_all_xlsx_files(),
+                  multiple=True).create_layout()
+
+    def dump_excel_files_to_db(self, filenames):
         """
-        table = self.db_manager.dump_table()
-        file = Excel().write_excel(self.db_manager.db_name, table)
-        StatusBar().set_status(Translations().exported_to + file)
+        Callback method called from open window.
+        Imports all worksheets of the selected Excel files in a background thread, parsing them in parallel
+        """
+        StatusBar().set_status(Translations().importing_msg)
+        self.worker.submit(None, self.locked_write(partial(self.import_excel_files, filenames)),
+                           on_done=lambda result: StatusBar().set_status(Translations().imported_from +
+                                                                         ", ".join(filenames)),
+                           on_error=StatusBar().set_status)
+
+    @staticmethod
+    def import_excel_files(filenames, db_manager, task):
+        from bookcase_excel.batch_import import BatchImporter
+        return BatchImporter().import_files(db_manager, filenames)
+
+    def export_to(self, file_format):
+        """
+        Method called when an export menu option is selected.
+        Streams the table from DB to a file of the selected format in a background thread
+        :param file_format: one of the classes in self.file_formats
+        """
+        self.worker.submit(None, partial(self.export_file, file_format),
+                           on_done=lambda file: StatusBar().set_status(Translations().exported_to + file),
+                           on_error=StatusBar().set_status,
+                           on_progress=partial(self.show_progress, Translations().exporting_msg))
+
+    @staticmethod
+    def export_file(file_format, db_manager, task):
+        return file_format().write_table(db_manager.db_name, task.track(db_manager.iter_table()))
 
     def open_book_view(self):
         """
@@ -212,7 +363,7 @@ class DbView(ButtonToolbar):
         if not self.book_view:
             if self.search_view:
                 self.search_view.close()
-            self.book_view = BookViewNew(self.root, self.db_manager, self.on_book_view_close)
+            self.book_view = BookViewNew(self.root, self.db_manager, self.write_lock, self.on_book_view_close)
             self.book_view.open_book_view()
 
     def open_search_view(self):
@@ -223,14 +374,18 @@ class DbView(ButtonToolbar):
         if not self.search_view:
             if self.book_view:
                 self.book_view.close()
-            self.search_view = SearchView(self.root, self.db_manager, self.on_search_view_close)
+            self.search_view = SearchView(self.root, self.db_manager, self.worker, self.write_lock,
+                                          self.on_search_view_close)
             self.search_view.open_search_view()
 
     def cleanup(self):
         """
         Cleanup method called when window is closing
+        Cancels running background tasks
         """
+        self.worker.shutdown()
         self.db_manager.cleanup()
+        self.lock.release()
 
     def close(self):
         """
@@ -262,7 +417,10 @@ class BookView(tk.Frame):
     """
     Base Frame Class for book view
     """
-    def __init__(self, root, db_manager, on_close_cb_func):
+    def __init__(self, root, db_manager, write_lock, on_close_cb_func):
+        """
+        :param write_lock: function that locks the DB for a write, DbView.write_lock
+        """
         super(BookView, self).__init__(root)
         self.gui_book = GuiBook()
 
@@ -288,6 +446,7 @@ class BookView(tk.Frame):
              (Translations().shelf_col_desc,
               (6, 2, 25, self.gui_book.get_object("shelf_col")))])
         self.db_manager = db_manager
+        self.write_lock = write_lock
         self.on_close_cb_func = on_close_cb_func
         self.buttons = None
 
@@ -340,8 +499,13 @@ class BookViewNew(BookView):
             return
         (title, author, translator, publisher,
          publication_year, isbn, copies, shelf) = self.gui_book.get_book_attributes_in_schema_form()
-        self.db_manager.add_book(title, author, translator=translator, publication_year=publication_year,
-                                 isbn=isbn, publisher=publisher, shelf=shelf, copies=copies)
+        try:
+            with self.write_lock():
+                self.db_manager.add_book(title, author, translator=translator, publication_year=publication_year,
+                                         isbn=isbn, publisher=publisher, shelf=shelf, copies=copies)
+        except exc.LockedException as e:
+            StatusBar().set_status(e)
+            return
         self.gui_book.clear_entries()
         StatusBar().set_status(Translations().book_saved_msg)
 
@@ -350,8 +514,8 @@ class BookViewOpen(BookView):
     """
     BookView frame used when a book from DB is displayed
     """
-    def __init__(self, root, db_manager, on_close_cb_func, book):
-        super(BookViewOpen, self).__init__(root, db_manager, on_close_cb_func)
+    def __init__(self, root, db_manager, write_lock, on_close_cb_func, book):
+        super(BookViewOpen, self).__init__(root, db_manager, write_lock, on_close_cb_func)
         self.root = root
         self.buttons = OrderedDict([(Translations().save_text, self.save_changes_to_db),
                                     (Translations().delete_text, self.delete),
@@ -370,8 +534,13 @@ class BookViewOpen(BookView):
             StatusBar().set_status(e)
             return
         if self.gui_book.changed(self.book):
-            self.gui_book.update_book(self.book)
-            self.db_manager.save_book()
+            try:
+                with self.write_lock():
+                    self.gui_book.update_book(self.book)
+                    self.db_manager.save_book()
+            except exc.LockedException as e:
+                StatusBar().set_status(e)
+                return
         StatusBar().set_status(Translations().book_saved_msg)
 
     def delete(self):
@@ -387,7 +556,12 @@ class BookViewOpen(BookView):
         Callback method for delete book prompt
         Deletes selected book from DB
         """
-        self.db_manager.delete_book(self.book)
+        try:
+            with self.write_lock():
+                self.db_manager.delete_book(self.book)
+        except exc.LockedException as e:
+            StatusBar().set_status(e)
+            return
         StatusBar().set_status(Translations().book_deleted_msg)
         self.close()
 
@@ -402,85 +576,193 @@ class BookViewOpen(BookView):
 class SearchView(tk.Frame):
     """
     Frame class used to facilitate queries to the DB and change book entries
+    Results are fetched from DB a page at a time, only for the part of the list being viewed
+    Searches run in a background thread, a new search cancels the one still running
+    Typing in the search entry searches live once typing pauses for live_search_delay ms.
+    Small result sets are kept in memory and narrowed while the query is being extended
+    The advanced search panel searches several fields at once
     """
-    def __init__(self, root, db_manager, on_close_cb_func):
+    live_search_delay = 200
+
+    def __init__(self, root, db_manager, worker, write_lock, on_close_cb_func):
         super(SearchView, self).__init__(root)
-        self.choices = (Translations().title_text, Translations().author_text, "ISBN",
-                        Translations().shelf_text, Translations().genre_text)
+        self.fields = OrderedDict([(Translations().title_text, "title"), (Translations().author_text, "author"),
+                                   ("ISBN", "isbn"), (Translations().shelf_text, "shelf"),
+                                   (Translations().genre_text, "genre")])
+        self.choices = tuple(self.fields.keys())
         self.option = ttk.Combobox(self, values=self.choices, state="readonly", font=FONT_11_NORMAL)
         self.option.set(self.choices[0])
         self.search_str = tk.Entry(self, width=60, font=FONT_11_NORMAL)
-        self.listbox_with_scroll = ListboxWithScroll(self, 100, FONT_11_NORMAL, self.open_book)
+        self.search_str.bind("<KeyRelease>", self.schedule_live_search)
+        self.option.bind("<<ComboboxSelected>>", self.schedule_live_search)
+        self.listbox_with_scroll = VirtualListbox(self, 100, FONT_11_NORMAL, self.open_book, worker)
+        self.advanced = AdvancedSearchFrame(self)
+        self.advanced_visible = False
         self.db_manager = db_manager
+        self.worker = worker
+        self.write_lock = write_lock
         self.on_close_cb_func = on_close_cb_func
         self.root = root
-        self.books = None
+        self.results = None
+        self.pending_search = None
 
     def open_search_view(self):
         self.option.grid(row=0, column=0, pady=10, sticky=tk.E)
         self.search_str.grid(row=0, column=1, pady=10)
 
+        self.advanced.create_layout()
+
         buttons_frame = ButtonFrame(self)
         buttons = OrderedDict(
-            [(Translations().search_text, self.perform_db_search), (Translations().cancel_text, self.close)])
+            [(Translations().search_text, self.perform_db_search),
+             (Translations().advanced_search_text, self.toggle_advanced_search),
+             (Translations().cancel_text, self.close)])
         buttons_frame.create_buttons(buttons)
-        buttons_frame.grid(row=1, columnspan=2)
+        buttons_frame.grid(row=2, columnspan=2)
 
         self.listbox_with_scroll.create_layout()
-        self.listbox_with_scroll.grid(row=2, columnspan=2)
+        self.listbox_with_scroll.grid(row=3, columnspan=2)
 
         self.pack(ipadx=40, ipady=10)
 
-    def get_db_search_results(self):
+    @staticmethod
+    def get_db_search_results(search, db_manager, offset, limit):
+        """
+        Row source of the search results, run in a worker thread
+        :param search: tuple of the field searched and the search string
+        :param db_manager: the BookcaseDbManager of the worker thread
+        :param offset: position of the first entry in the results
+        :param limit: number of entries
+        :returns: a page of entries if no search string is given else a page of the specific search results
+        """
+        field, string = search
+        return db_manager.search(field, string, limit=limit, offset=offset, ranked=False)
+
+    def schedule_live_search(self, event):
+        """
+        Debounces key presses, the search runs when no key is pressed for live_search_delay ms
+        """
+        if self.pending_search:
+            self.after_cancel(self.pending_search)
+        self.pending_search = self.after(self.live_search_delay, self.live_search)
+
+    def live_search(self):
+        """
+        Narrows the displayed results in memory if the query extends theirs, otherwise searches the DB
+        """
+        self.pending_search = None
+        search = (self.search_by(self.option.get()), self.search_str.get())
+        if self.results and (self.results.field, self.results.value) == search:
+            self.worker.cancel("search")
+        elif self.results and self.results.can_narrow(*search):
+            self.worker.cancel("search")
+            self.show_results(self.results.narrow(search[1]))
+        else:
+            self.perform_db_search()
+
+    def toggle_advanced_search(self):
         """
-        :returns: list of entries if no search string is given else specific search results
+        Method called when advanced search button is pushed
+        Switches between the single field search and the advanced search panel
         """
-        if not self.search_str.get():
-            return self.db_manager.get_all_books()
+        self.advanced_visible = not self.advanced_visible
+        if not self.advanced_visible:
+            self.advanced.grid_remove()
+            self.option.grid()
+            self.search_str.grid()
         else:
-            return self.search_by(self.option.get(), self.search_str.get())
+            self.option.grid_remove()
+            self.search_str.grid_remove()
+            self.advanced.grid(row=1, columnspan=2)
 
     def perform_db_search(self):
         """
         Method that performs DB search when search button is pushed
+        Only the number of results and the first page are queried here, the list fetches the rows it displays
+        """
+        if self.advanced_visible:
+            self.perform_advanced_search()
+            return
+        from bookcase_db.live_search import SearchResults
+        field, string = self.search_by(self.option.get()), self.search_str.get()
+        StatusBar().set_status(Translations().searching_msg)
+        self.worker.submit("search",
+                           lambda db_manager, task: SearchResults.query(db_manager, field, string,
+                                                                        self.listbox_with_scroll.page_size),
+                           on_done=self.show_results,
+                           on_error=StatusBar().set_status)
+
+    def perform_advanced_search(self):
+        """
+        Searches the books matching all the fields filled in the advanced search panel
+        """
+        try:
+            query = self.advanced.get_query()
+        except InvalidInputException as e:
+            StatusBar().set_status(e)
+            return
+        page_size = self.listbox_with_scroll.page_size
+        StatusBar().set_status(Translations().searching_msg)
+        self.worker.submit("search",
+                           lambda db_manager, task: (db_manager.count_matching(query),
+                                                     db_manager.find(query, limit=page_size)),
+                           on_done=lambda result: self.show_query_results(query, *result),
+                           on_error=StatusBar().set_status)
+
+    @staticmethod
+    def get_query_results(query, db_manager, offset, limit):
+        return db_manager.find(query, limit=limit, offset=offset)
+
+    def show_query_results(self, query, num_of_results, first_page):
+        """
+        Callback of a completed advanced search
         """
-        self.listbox_with_scroll.clear()
-        self.books = self.get_db_search_results()
-        if not self.books:
+        self.results = None
+        self.listbox_with_scroll.set_source(num_of_results, partial(self.get_query_results, query), first_page)
+        self.show_search_status(num_of_results)
+
+    def show_results(self, results):
+        """
+        Callback of a completed search
+        :param results: SearchResults
+        """
+        self.results = results
+        num_of_results = results.count
+        if results.loaded:
+            self.listbox_with_scroll.set_rows(results.books)
+        else:
+            self.listbox_with_scroll.set_source(num_of_results, partial(self.get_db_search_results,
+                                                                        (results.field, results.value)),
+                                                results.first_page)
+        self.show_search_status(num_of_results)
+
+    @staticmethod
+    def show_search_status(num_of_results):
+        if not num_of_results:
             StatusBar().set_status(Translations().no_books_found_msg)
         else:
             StatusBar().set_status("{found} {num} {msg}".format(found=Translations().found,
-                                                                num=len(self.books),
+                                                                num=num_of_results,
                                                                 msg=Translations().search_complete_msg))
-            self.listbox_with_scroll.insert_results(self.books)
 
-    def search_by(self, option, string):
+    def search_by(self, option):
         """
-        Performs the search based on the selected search type
         :parameter option: Option to select attribute for DB search
-        :parameter string: The search string
-        :returns list of book entries
+        :returns: the book attribute searched for the selected search type
         """
-        if option == Translations().title_text:
-            return self.db_manager.search_by_title(string)
-        if option == Translations().author_text:
-            return self.db_manager.search_by_author(string)
-        if option == "ISBN":
-            return self.db_manager.search_by_isbn(string)
-        if option == Translations().shelf_text:
-            return self.db_manager.search_by_shelf(string)
-        if option == Translations().genre_text:
-            return self.db_manager.search_by_genre(string)
-
+        return self.fields[option]
 
     def open_book(self, event):
         """
         Method called when a book entry is double clicked
         Creates a pop-up book view window
         """
+        selection = self.listbox_with_scroll.get_selection()
+        if selection is None:
+            return
         top_level = tk.Toplevel(self.root)
-        book_view = BookViewOpen(top_level, self.db_manager, self.perform_db_search,
-                                 self.books[self.listbox_with_scroll.get_selection()])
+        book_view = BookViewOpen(top_level, self.db_manager, self.write_lock, self.perform_db_search,
+                                 self.db_manager.get_book(selection.id))
         book_view.open_book_view()
         book_view.pack(fill=tk.BOTH)
 
@@ -488,10 +770,68 @@ class SearchView(tk.Frame):
         """
         Method called when cancel button is pushed
         """
+        if self.pending_search:
+            self.after_cancel(self.pending_search)
+        self.worker.cancel("search")
+        self.listbox_with_scroll.cancel_fetching(set())
         self.on_close_cb_func()
         self.destroy()
 
 
+class AdvancedSearchFrame(tk.Frame):
+    """
+    Frame class with an entry for every field of the advanced search
+    """
+    def __init__(self, root):
+        super(AdvancedSearchFrame, self).__init__(root)
+        self.title = tk.StringVar()
+        self.author = tk.StringVar()
+        self.genre = tk.StringVar()
+        self.isbn = tk.StringVar()
+        self.shelf = tk.StringVar()
+        self.year_from = tk.StringVar()
+        self.year_to = tk.StringVar()
+        self.entries_desc_grid_pref_var = OrderedDict(
+            [(Translations().title_text, (0, 0, 60, self.title)),
+             (Translations().author_text, (1, 0, 60, self.author)),
+             (Translations().genre_text, (2, 0, 30, self.genre)),
+             ("ISBN", (3, 0, 30, self.isbn)),
+             (Translations().shelf_prefix_text, (4, 0, 15, self.shelf)),
+             (Translations().year_from_text, (5, 0, 15, self.year_from)),
+             (Translations().year_to_text, (5, 2, 15, self.year_to))])
+
+    def create_layout(self):
+        for key in self.entries_desc_grid_pref_var.keys():
+            row, column, width, var = self.entries_desc_grid_pref_var[key]
+            msg = tk.Message(self, text=key, width=150, justify=tk.RIGHT, font=FONT_11_NORMAL)
+            msg.grid(row=row, column=column, padx=5, pady=5, sticky=tk.E)
+            tk.Entry(self, width=width, textvariable=var, font=FONT_11_NORMAL).grid(row=row, column=column + 1,
+                                                                                    pady=5, sticky=tk.W)
+
+    def get_query(self):
+        """
+        :return: BookQuery with a predicate for every filled entry
+        :raises: InvalidInputException if a year is not a number
+        """
+        from bookcase_db.query_planner import BookQuery
+        return (BookQuery()
+                .contains("title", self.title.get().strip())
+                .contains("author", self.author.get().strip())
+                .contains("genre", self.genre.get().strip())
+                .equals("isbn", self.isbn.get().strip())
+                .prefix("shelf", self.shelf.get().strip())
+                .between("publication_year", self.get_year(self.year_from), self.get_year(self.year_to)))
+
+    @staticmethod
+    def get_year(var):
+        year = var.get().strip()
+        if not year:
+            return None
+        if not year.isdigit():
+            raise InvalidInputException(Translations().year_validation_warning)
+        return int(year)
+
+
 class ButtonFrame(tk.Frame):
     """
     Frame class that creates a specified number of buttons
@@ -551,12 +891,17 @@ class OpenFrame(PopUpFrame):
     """
     Pop-up Window to load files
     """
-    def __init__(self, root, caller_cd_func, choices):
+    def __init__(self, root, caller_cd_func, choices, multiple=False):
+        """
+        :param multiple: allow selecting many files, the cb function then receives a list
+        """
         super(OpenFrame, self).__init__(root, caller_cd_func)
         self.choices = choices
+        self.multiple = multiple
 
     def create_layout(self):
-        listbox = tk.Listbox(self, width=60, font=FONT_11_NORMAL)
+        listbox = tk.Listbox(self, width=60, font=FONT_11_NORMAL,
+                             selectmode=tk.EXTENDED if self.multiple else tk.BROWSE)
         listbox.grid(row=0, column=0, padx=10, pady=15)
 
         if not self.choices:
@@ -565,7 +910,10 @@ class OpenFrame(PopUpFrame):
         else:
             for choice in self.choices:
                 listbox.insert(tk.END, choice)
-            ok_button_command = lambda: self.open_selection(listbox.get(listbox.curselection()))
+            if self.multiple:
+                ok_button_command = lambda: self.open_selection([listbox.get(i) for i in listbox.curselection()])
+            else:
+                ok_button_command = lambda: self.open_selection(listbox.get(listbox.curselection()))
 
         button_frame = ButtonFrame(self)
         buttons = OrderedDict(
@@ -621,7 +969,7 @@ class CreateDb(PopUpFrame):
             return
         try:
             self.caller_cb_func(selection)
-        except exc.InvalidInputException as e:
+        except exc.BookcaseManagerException as e:
             StatusBar().set_status(e)
             return
         self.root.destroy()
@@ -657,31 +1005,174 @@ class DeleteBookPrompt(PopUpFrame):
         self.root.destroy()
 
 
-class ListboxWithScroll(tk.Frame):
+class VirtualListbox(tk.Frame):
     """
-    Frame composed of a listbox and a scrollbar
+    Frame composed of a listbox and a scrollbar that displays a list of any length
+    Only the visible rows are rendered. Rows are fetched a page at a time from a row source in a background thread,
+    rows of pages still being fetched are shown as loading, and only the most recently viewed pages are kept
     """
-    def __init__(self, root, width, font, double_click_cb):
-        super(ListboxWithScroll, self).__init__(root)
-        self.scroll = tk.Scrollbar(self, orient=tk.VERTICAL)
-        self.listbox = tk.Listbox(self, width=width, font=font, yscrollcommand=self.scroll.set)
-        self.scroll.config(command=self.listbox.yview)
+    page_size = 100
+    cached_pages = 4
+
+    def __init__(self, root, width, font, double_click_cb, worker, height=20):
+        """
+        :param worker: the BackgroundWorker that fetches the pages
+        """
+        super(VirtualListbox, self).__init__(root)
+        self.height = height
+        self.worker = worker
+        self.scroll = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.listbox = tk.Listbox(self, width=width, height=height, font=font)
         self.listbox.bind('<Double-1>', double_click_cb)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.listbox.bind(sequence, self.on_mouse_wheel)
+        self.size = 0
+        self.fetch_rows = None
+        self.rows = None
+        self.top = 0
+        self.pages = OrderedDict()
+        self.fetching = set()
+        self.visible_rows = []
 
     def create_layout(self):
         self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=1)
 
+    def set_source(self, size, fetch_rows, first_page=None):
+        """
+        Replaces the displayed list and scrolls to its top
+        :param size: total number of rows in the list
+        :param fetch_rows: function that takes the db_manager of a worker thread, an offset and a limit
+                           and returns a list of rows
+        :param first_page: the first page_size rows, if already fetched
+        """
+        self.replace(size, fetch_rows, None)
+        if first_page is not None:
+            self.pages[0] = first_page
+        self.render()
+
+    def set_rows(self, rows):
+        """
+        Replaces the displayed list with rows already in memory and scrolls to its top
+        """
+        self.replace(len(rows), None, rows)
+        self.render()
+
+    def replace(self, size, fetch_rows, rows):
+        self.cancel_fetching(set())
+        self.size = size
+        self.fetch_rows = fetch_rows
+        self.rows = rows
+        self.pages.clear()
+        self.top = 0
+
     def clear(self):
         """
         Clears previous entries in the listbox frame
         """
-        if self.listbox.size():
-            self.listbox.delete(0, tk.END)
+        self.set_source(0, None)
+
+    def get_row(self, index):
+        """
+        :return: the row at index, LOADING if its page is being fetched or None if the row no longer exists
+        """
+        if self.rows is not None:
+            return self.rows[index]
+        page_number, position = divmod(index, self.page_size)
+        if page_number not in self.pages:
+            self.fetch_page(page_number)
+            return LOADING
+        self.pages.move_to_end(page_number)
+        page = self.pages[page_number]
+        return page[position] if position < len(page) else None
+
+    def page_key(self, page_number):
+        return "page", id(self), page_number
+
+    def fetch_page(self, page_number):
+        """
+        Fetches a page in the background, the list is rendered again when it arrives
+        """
+        if page_number in self.fetching:
+            return
+        self.fetching.add(page_number)
+        fetch_rows, offset, limit = self.fetch_rows, page_number * self.page_size, self.page_size
+        self.worker.submit(self.page_key(page_number),
+                           lambda db_manager, task: fetch_rows(db_manager, offset, limit),
+                           on_done=partial(self.on_page_fetched, page_number),
+                           on_error=partial(self.on_page_error, page_number))
+
+    def on_page_fetched(self, page_number, page):
+        self.fetching.discard(page_number)
+        self.pages[page_number] = page
+        while len(self.pages) > self.cached_pages:
+            self.pages.popitem(last=False)
+        self.render()
+
+    def on_page_error(self, page_number, error):
+        self.fetching.discard(page_number)
+        StatusBar().set_status(error)
+
+    @staticmethod
+    def row_text(row):
+        """
+        :return: the text a row is displayed with, rows are converted explicitly as Tkinter passes tuples,
+                 such as BookSummary rows, to Tcl as lists
+        """
+        return Translations().loading_msg if row is LOADING else str(row)
 
-    def insert_results(self, results):
-        for i, book in enumerate(results):
-            self.listbox.insert(i, book)
+    def cancel_fetching(self, keep):
+        """
+        Cancels the fetches of the pages that are no longer needed
+        :param keep: the page numbers still visible
+        """
+        for page_number in self.fetching - keep:
+            self.worker.cancel(self.page_key(page_number))
+        self.fetching &= keep
+
+    def render(self):
+        """
+        Fills the listbox with the rows of the visible window and updates the scrollbar
+        Fetches of pages scrolled out of view are cancelled
+        """
+        self.listbox.delete(0, tk.END)
+        last = min(self.top + self.height, self.size)
+        self.visible_rows = [row for row in (self.get_row(index) for index in range(self.top, last))
+                             if row is not None]
+        if self.visible_rows:
+            self.listbox.insert(tk.END, *(self.row_text(row) for row in self.visible_rows))
+        self.cancel_fetching(set(range(self.top // self.page_size, (max(last, 1) - 1) // self.page_size + 1)))
+        if self.size:
+            self.scroll.set(self.top / self.size, last / self.size)
+        else:
+            self.scroll.set(0, 1)
+
+    def scroll_to(self, top):
+        top = max(0, min(top, self.size - self.height))
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """
+        Scrollbar command, called with 'moveto fraction' or 'scroll number units|pages'
+        """
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(amount) * self.size))
+        elif action == tk.SCROLL:
+            step = self.height if unit == tk.PAGES else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    def on_mouse_wheel(self, event):
+        direction = -1 if event.num == 4 or event.delta > 0 else 1
+        self.scroll_to(self.top + direction * 3)
+        return "break"
 
     def get_selection(self):
-        return self.listbox.curselection()[-1]
+        """
+        :return: the selected row or None if nothing is selected
+        """
+        selection = self.listbox.curselection()
+        if not selection or self.visible_rows[selection[-1]] is LOADING:
+            return None
+        return self.visible_rows[selection[-1]]
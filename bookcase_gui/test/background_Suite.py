@@ -0,0 +1,104 @@
+import threading
+import time
+import unittest
+
+from bookcase_gui.background import BackgroundWorker, TaskCancelled
+
+
+class FakeRoot(object):
+    """
+    Stands in for the Tk root, the scheduled callbacks are run by run_pending
+    """
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def run_pending(self, worker, timeout=5):
+        deadline = time.time() + timeout
+        while worker.running and time.time() < deadline:
+            scheduled, self.scheduled = self.scheduled, []
+            for callback in scheduled:
+                callback()
+            time.sleep(0.01)
+
+
+class FakeDbManager(object):
+    def __init__(self):
+        self.closed = False
+
+    def cleanup(self):
+        self.closed = True
+
+
+class BackgroundWorkerTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.created = []
+        self.worker = BackgroundWorker(self.root, self.create_db_manager)
+        self.results = []
+
+    def create_db_manager(self):
+        self.created.append(FakeDbManager())
+        return self.created[-1]
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def test_result_is_delivered_in_poll(self):
+        self.worker.submit(None, lambda db_manager, task: 42, on_done=self.results.append)
+        self.assertEqual(self.results, [])
+        self.root.run_pending(self.worker)
+        self.assertEqual(self.results, [42])
+        self.assertFalse(self.worker.running)
+
+    def test_each_thread_owns_a_db_manager(self):
+        self.worker.submit(None, lambda db_manager, task: db_manager, on_done=self.results.append)
+        self.root.run_pending(self.worker)
+        self.assertIn(self.results[0], self.created)
+        self.worker.shutdown()
+        self.assertTrue(self.results[0].closed)
+
+    def test_errors_are_delivered_to_on_error(self):
+        errors = []
+
+        def fail(db_manager, task):
+            raise ValueError("failed")
+        self.worker.submit(None, fail, on_error=errors.append)
+        self.root.run_pending(self.worker)
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_progress_is_reported(self):
+        progress = []
+        self.worker.submit(None, lambda db_manager, task: list(task.track(range(25), every=10)),
+                           on_progress=progress.append)
+        self.root.run_pending(self.worker)
+        self.assertEqual(progress, [10, 20, 25])
+
+    def test_new_task_with_same_key_cancels_previous(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow(db_manager, task):
+            started.set()
+            release.wait(5)
+            for _ in task.track(range(10)):
+                pass
+            return "slow"
+        first = self.worker.submit("search", slow, on_done=self.results.append)
+        started.wait(5)
+        self.worker.submit("search", lambda db_manager, task: "fast", on_done=self.results.append)
+        release.set()
+        self.root.run_pending(self.worker)
+        self.assertTrue(first.cancelled)
+        self.assertEqual(self.results, ["fast"])
+
+    def test_report_progress_raises_when_cancelled(self):
+        task = self.worker.submit("search", lambda db_manager, task: None)
+        self.worker.cancel("search")
+        self.assertRaises(TaskCancelled, task.report_progress, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import configparser
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from bookcase_lib import ConfigStore
+
+
+class ConfigStoreTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.directory, "config.ini")
+        with open(self.config_file, "w") as configuration:
+            configuration.write("[LOCAL]\ngui_language = gr\npage_size = 50\nfuzzy = yes\nbroken = maybe\n"
+                                "[PROFILE]\ncache_size = 64\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_file(self):
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read(self.config_file)
+        return {label: dict(parser[label]) for label in parser.sections()}
+
+    def test_lookups(self):
+        store = ConfigStore(self.config_file, write_delay=0)
+        self.assertEqual(store.get_config("gui_language"), "gr")
+        self.assertEqual(store.get_int("page_size"), 50)
+        self.assertEqual(store.get_int("cache_size", label="PROFILE"), 64)
+        self.assertTrue(store.get_bool("fuzzy"))
+        self.assertEqual(store.get_int("missing", default=7), 7)
+        self.assertEqual(store.get_bool("broken", default=False), False)
+        self.assertRaises(KeyError, store.get_config, "missing")
+        self.assertRaises(ValueError, store.get_int, "gui_language")
+        self.assertRaises(ValueError, store.get_bool, "broken")
+        self.assertRaises(KeyError, store.get_bool, "missing")
+
+    def test_changes_are_merged_to_their_section(self):
+        store = ConfigStore(self.config_file, write_delay=0)
+        store.set_config("page_size", 100)
+        store.set_section({"cache_size": 0, "journal_mode": "WAL"}, "PROFILE")
+        self.assertEqual(self.read_file(), {
+            "LOCAL": {"gui_language": "gr", "page_size": "100", "fuzzy": "yes", "broken": "maybe"},
+            "PROFILE": {"cache_size": "0", "journal_mode": "WAL"}})
+        self.assertFalse(os.path.exists(self.config_file + ".tmp"))
+
+    def test_unchanged_values_are_not_written(self):
+        store = ConfigStore(self.config_file, write_delay=0)
+        with mock.patch.object(store, "write_config") as write_config:
+            store.set_config("page_size", 50)
+            store.set_section({"gui_language": "gr"}, "LOCAL")
+            write_config.assert_not_called()
+        self.assertFalse(store.dirty)
+
+    def test_changes_are_written_together_after_the_delay(self):
+        store = ConfigStore(self.config_file, write_delay=0.1)
+        with mock.patch("os.replace", wraps=os.replace) as replace:
+            store.set_config("page_size", 100)
+            store.set_config("gui_language", "en")
+            self.assertEqual(self.read_file()["LOCAL"]["page_size"], "50")
+            time.sleep(0.3)
+            self.assertEqual(replace.call_count, 1)
+        self.assertEqual(self.read_file()["LOCAL"]["page_size"], "100")
+        self.assertEqual(self.read_file()["LOCAL"]["gui_language"], "en")
+        self.assertFalse(store.dirty)
+
+    def test_failed_write_keeps_the_file(self):
+        store = ConfigStore(self.config_file, write_delay=60)
+        store.set_config("page_size", 100)
+        with mock.patch.object(configparser.ConfigParser, "write", side_effect=OSError("disk full")):
+            self.assertRaises(OSError, store.write_config)
+        self.assertEqual(self.read_file()["LOCAL"]["page_size"], "50")
+        self.assertTrue(store.dirty)
+        store.write_config()
+        self.assertEqual(self.read_file()["LOCAL"]["page_size"], "100")
+
+    def test_changes_are_written_at_exit(self):
+        os.mkdir(os.path.join(self.directory, "BookcaseDb"))
+        code = "import bookcase_lib as lib\nlib.Configuration().set_config('gui_language', 'gr')"
+        environment = dict(os.environ, HOME=self.directory, USERPROFILE=self.directory)
+        subprocess.run([sys.executable, "-c", code], env=environment, check=True)
+        self.config_file = os.path.join(self.directory, "BookcaseDb", "config.ini")
+        self.assertEqual(self.read_file(), {"LOCAL": {"gui_language": "gr"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+HEAVY_MODULES = ("sqlalchemy", "openpyxl")
+
+
+class StartupSuite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def imported_modules(self, code):
+        process = subprocess.run([sys.executable, "-c", code + "\nimport sys\nprint(' '.join(sys.modules))",
+                                  self.directory], stdout=subprocess.PIPE, universal_newlines=True, check=True)
+        return set(module.split(".")[0] for module in process.stdout.split())
+
+    def test_gui_does_not_import_heavy_modules(self):
+        modules = self.imported_modules("import bookcase_gui.gui")
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def test_excel_imports_openpyxl_on_first_use(self):
+        self.assertNotIn("openpyxl", self.imported_modules("import bookcase_excel.bookcase_excel"))
+        modules = self.imported_modules("import sys\n"
+                                        "from bookcase_excel.bookcase_excel import Excel\n"
+                                        "Excel(sys.argv[1] + '/').write_table('startup_suite', [(1,)])")
+        self.assertIn("openpyxl", modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
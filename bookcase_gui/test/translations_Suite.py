@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import bookcase_translations
+from bookcase_translations import Catalog, Translations, TEXTS
+
+
+class TranslationsSuite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.files = []
+        for patcher in (mock.patch.object(bookcase_translations, "language_files", return_value=self.files),
+                        mock.patch.object(bookcase_translations, "get_language", return_value="gr"),
+                        mock.patch.object(Translations, "catalogs", None),
+                        mock.patch.object(Translations, "active", None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def add_language_file(self, filename, content):
+        self.files.append(os.path.join(self.directory, filename))
+        with open(self.files[-1], "wb") as file:
+            file.write(content if isinstance(content, bytes) else content.encode("utf-8"))
+
+    def test_unreadable_language_files_are_skipped(self):
+        for filename, content in (("fr.json", '{"title_text": "Titre"}'), ("gr.json", '{"title_text": '),
+                                  ("de.json", '["Titel"]'), ("it.json", b"\xff")):
+            self.add_language_file(filename, content)
+        self.assertEqual(Translations.languages(), ["en", "fr", "gr"])
+        self.assertEqual(Translations().language, "gr")
+        self.assertEqual(Translations().title_text, TEXTS["title_text"]["gr"])
+
+    def test_missing_texts_fall_back_to_english(self):
+        self.add_language_file("fr.json", '{"title_text": "Titre", "unknown_text": "Inconnu"}')
+        Translations.set_language("fr")
+        self.assertEqual(Translations().title_text, "Titre")
+        self.assertEqual(Translations().search_text, TEXTS["search_text"]["en"])
+        self.assertFalse(hasattr(Translations(), "unknown_text"))
+
+    def test_catalogs_are_read_only(self):
+        catalog = Catalog("en", {name: texts["en"] for name, texts in TEXTS.items()})
+        with self.assertRaises(AttributeError):
+            catalog.title_text = "Name"
+        with self.assertRaises(AttributeError):
+            del catalog.title_text
+
+    def test_set_language_switches_the_active_catalog(self):
+        self.assertEqual(Translations().title_text, TEXTS["title_text"]["gr"])
+        Translations.set_language("en")
+        self.assertEqual(Translations().language, "en")
+        self.assertEqual(Translations().title_text, TEXTS["title_text"]["en"])
+        self.assertRaises(KeyError, Translations.set_language, "xx")
+        self.assertEqual(Translations().language, "en")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import tkinter as tk
+import unittest
+
+from bookcase_db.data_schema import BookSummary
+from bookcase_gui.gui_frames import LOADING, VirtualListbox
+from bookcase_translations import Translations
+
+SUMMARY = BookSummary(5, "LORD OF THE RINGS", "J.R.TOLKIEN", "", "", -1, "", 1, "FANTASY", "1-1")
+
+
+class VirtualListboxTestSuite(unittest.TestCase):
+    def test_row_text(self):
+        text = VirtualListbox.row_text(SUMMARY)
+        self.assertEqual(text, "LORD OF THE RINGS, J.R.TOLKIEN, , -1 | 1-1")
+        self.assertEqual(tk.Tcl().call("set", "row", text), text)
+        self.assertEqual(VirtualListbox.row_text(LOADING), Translations().loading_msg)
+
+    def test_render_summary(self):
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            self.skipTest("no display")
+        try:
+            listbox = VirtualListbox(root, 100, None, lambda event: None, None)
+            listbox.set_rows([SUMMARY])
+            self.assertEqual(listbox.listbox.get(0), "LORD OF THE RINGS, J.R.TOLKIEN, , -1 | 1-1")
+            listbox.listbox.selection_set(0)
+            self.assertIs(listbox.get_selection(), SUMMARY)
+        finally:
+            root.destroy()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,29 @@
-import os
+import atexit
 import configparser
+import os
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import bookcase_exceptions as exc
+
+WRITE_DELAY = 2.0
+
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.05
+# the lock files are kept in this subdirectory of the DB directory, out of the file names listed as DBs
+LOCK_DIRECTORY = "locks"
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
+
+MISSING = object()
 
 
 class Singleton(type):
@@ -14,49 +38,146 @@ class Singleton(type):
         return cls._instances[cls]
 
 
-class Configuration(object, metaclass=Singleton):
+class ConfigStore(object):
     """
-    Class that handles the creation and read/write operations of the configuration file
+    Configuration file cached in memory
+    Lookups are dict accesses, the file is read once, on first use. Changes are merged to their section and marked
+    dirty, they are written together after a debounce delay or at exit. The file is replaced atomically, so a crash
+    while writing never leaves a truncated configuration
     """
-    def __init__(self):
-        self.config = configparser.ConfigParser()
-        self.config_file = FileManager().path + "config.ini"
+    def __init__(self, config_file, write_delay=WRITE_DELAY):
+        """
+        :param config_file: the path of the configuration file
+        :param write_delay: seconds to wait for more changes before writing them, 0 writes on every change
+        """
+        self.config_file = config_file
+        self.write_delay = write_delay
+        self.sections = None
+        self.dirty = False
+        self.timer = None
+        self.lock = threading.RLock()
 
     def config_file_exists(self):
         return os.path.exists(self.config_file)
 
+    def load(self):
+        """
+        :return: dict mapping the labels to dicts of config parameters, read from file on first use
+        """
+        if self.sections is None:
+            with self.lock:
+                if self.sections is None:
+                    parser = configparser.ConfigParser(interpolation=None)
+                    parser.read(self.config_file, encoding="utf-8")
+                    self.sections = {label: dict(parser[label]) for label in parser.sections()}
+        return self.sections
+
     def set_config(self, key, value, label='LOCAL'):
         """
-        Write configuration element to file
+        Saves a configuration element, the other elements of the section are kept
         :param key: the name of the config parameter to be saved
         :param value: the value of the config parameter to be saved
         :param label: the label under which the parameter will be saved
         """
-        self.config[label] = {key: value}
-        self.write_config()
+        self.set_section({key: value}, label)
+
+    def set_section(self, values, label):
+        """
+        Saves many configuration elements of a section at once, the other elements of the section are kept
+        :param values: dict with the config parameters to be saved
+        :param label: the label under which the parameters will be saved
+        """
+        values = {key.lower(): str(value) for key, value in values.items()}
+        with self.lock:
+            section = self.load().setdefault(label, dict())
+            if all(section.get(key) == value for key, value in values.items()):
+                return
+            section.update(values)
+            self.dirty = True
+        self.schedule_write()
 
-    def get_config(self, key, label='LOCAL'):
+    def get_config(self, key, label='LOCAL', default=MISSING):
         """
-        Read configuration element from file
+        Read configuration element
         :param key: the name of the config parameter to read
         :param label: the label under which the parameter is saved
+        :param default: returned if the parameter is not set
+        :raises: KeyError if the parameter is not set and there is no default
         """
-        return self.config[label][key]
+        try:
+            return self.load()[label][key.lower()]
+        except KeyError:
+            if default is MISSING:
+                raise
+            return default
+
+    def get_int(self, key, label='LOCAL', default=MISSING):
+        """
+        :return: the configuration element as an int, the default if it is not set or not a number
+        """
+        try:
+            return int(self.get_config(key, label))
+        except (KeyError, ValueError):
+            if default is MISSING:
+                raise
+            return default
+
+    def get_bool(self, key, label='LOCAL', default=MISSING):
+        """
+        :return: the configuration element as a bool, the values configparser accepts for booleans are recognised,
+                 the default if it is not set or not a boolean
+        :raises: KeyError if the parameter is not set and ValueError if it is not a boolean, when there is no default
+        """
+        try:
+            value = self.get_config(key, label)
+            if value.lower() not in BOOLEAN_STATES:
+                raise ValueError("{key} is not a boolean: {value}".format(key=key, value=value))
+            return BOOLEAN_STATES[value.lower()]
+        except (KeyError, ValueError):
+            if default is MISSING:
+                raise
+            return default
+
+    def schedule_write(self):
+        """
+        Writes the changes after write_delay seconds, changes made meanwhile are written together
+        """
+        if not self.write_delay:
+            self.write_config()
+            return
+        with self.lock:
+            if self.timer is None:
+                self.timer = threading.Timer(self.write_delay, self.write_config)
+                self.timer.daemon = True
+                self.timer.start()
 
     def write_config(self):
         """
-        Writes to config file
+        Writes the pending changes to the config file through a temporary file renamed over it
         """
-        with open(self.config_file, 'w') as configuration:
-            self.config.write(configuration)
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.dirty:
+                return
+            parser = configparser.ConfigParser(interpolation=None)
+            parser.read_dict(self.sections)
+            temporary_file = self.config_file + ".tmp"
+            with open(temporary_file, 'w', encoding="utf-8") as configuration:
+                parser.write(configuration)
+                configuration.flush()
+                os.fsync(configuration.fileno())
+            os.replace(temporary_file, self.config_file)
+            self.dirty = False
 
     def read_config(self):
         """
         Reads the config file or creates it if it does not exist
         """
+        self.load()
         if not self.config_file_exists():
             self.setup_default_configuration()
-        self.config.read(self.config_file)
 
     def setup_default_configuration(self):
         """
@@ -64,34 +185,160 @@ class Configuration(object, metaclass=Singleton):
         Currently sets the language to English
         """
         self.set_config("gui_language", "en")
+        self.write_config()
 
 
-class InstanceLock(object):
+class Configuration(ConfigStore, metaclass=Singleton):
     """
-    Class that manages the instance lock for the bookcase manager
+    The configuration file of the program, in the data directory
+    Pending changes are written at exit
     """
-    def __init__(self, path):
-        self.file = path + ".lock"
-        self.fd = -1
+    def __init__(self):
+        super(Configuration, self).__init__(FileManager().path + "config.ini")
+        atexit.register(self.write_config)
+
 
-    def acquire_instance_lock(self):
+def process_exists(pid):
+    """
+    :return: True if a process with the pid is running
+    """
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class DbLock(object):
+    """
+    Cross process lock of a DB file, taken shared by readers and exclusive by writers
+    Many readers, e.g. GUI sessions and exports, hold it at the same time, while a bulk writer such as an import
+    waits for all of them and keeps them out until it is done.
+    GUI sessions hold it shared while open and take the write lock of the DB, see for_writes, exclusively around each
+    of their writes. Command line readers take the write lock shared too, so they never run alongside such a write.
+    It is an flock of locks/<db file name>.lock, released by the OS when the holder exits, so a crash never leaves a stale lock.
+    The exclusive holder writes its PID to the file, it is shown when a lock is not acquired.
+    Without fcntl, e.g. on Windows, the lock is the existence of the lock file, created with the PID of the holder,
+    and a lock file whose process is gone is stale and removed. Shared locks are then exclusive too: a command line
+    reader waits for the GUI session of the DB to close and two sessions of the same DB cannot be open at once
+    """
+    def __init__(self, db_file, lock_file=None):
         """
-        Tries to acquire instance lock by checking if the lock file exists and creating it if it doesn't
-        :raises FileExistsError: If lock file is present
+        :param db_file: path of the DB file
+        :param lock_file: path of the lock file, locks/<db file name>.lock in the directory of the DB if None
         """
-        if os.path.isfile(self.file):
-            raise FileExistsError
-        else:
-            self.fd = os.open(self.file, os.O_CREAT | os.O_EXCL)
+        self.db_file = db_file
+        self.file = lock_file or self.lock_file(db_file, ".lock")
+        self.fd = None
+        self.shared = False
+
+    @classmethod
+    def for_writes(cls, db_file):
+        """
+        :return: the write lock of a DB, locks/<db file name>.write.lock
+        """
+        return cls(db_file, cls.lock_file(db_file, ".write.lock"))
+
+    @staticmethod
+    def lock_file(db_file, extension):
+        directory, name = os.path.split(db_file)
+        return os.path.join(directory, LOCK_DIRECTORY, name + extension)
+
+    @property
+    def locked(self):
+        return self.fd is not None
+
+    def acquire(self, shared=False, timeout=LOCK_TIMEOUT):
+        """
+        :param shared: True for a read lock, False for an exclusive write lock
+        :param timeout: seconds to wait for the lock, None waits forever
+        :return: the lock itself, which releases on exiting a with block
+        :raises: LockedException if the lock is held by another process after timeout seconds
+        """
+        if self.locked:
+            raise exc.LockedException(self.file + " is already acquired")
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire(shared):
+            if deadline is not None and time.monotonic() >= deadline:
+                holder = self.holder()
+                raise exc.LockedException("{file} is in use by {process}".format(
+                    file=self.db_file,
+                    process="process {}".format(holder) if holder else "another process"))
+            time.sleep(LOCK_POLL_INTERVAL)
+        self.shared = shared
+        return self
+
+    def try_acquire(self, shared):
+        if fcntl is None:
+            return self.try_create()
+        fd = os.open(self.file, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        if not shared:
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
 
-    def release_instance_lock(self):
+    def try_create(self):
         """
-        Closes and removes lock file to release program lock
-        :return:
+        Lock file fallback, a stale lock file is removed and the lock retried at once
+        """
+        try:
+            self.fd = os.open(self.file, os.O_RDWR | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            if self.holder() is not None:
+                return False
+            try:
+                os.remove(self.file)
+            except OSError:
+                return False
+            return self.try_create()
+        os.write(self.fd, str(os.getpid()).encode())
+        return True
+
+    def holder(self):
         """
-        if self.fd != -1:
+        :return: the PID of the running process holding the lock exclusively, None if unknown
+        """
+        try:
+            with open(self.file) as file:
+                pid = int(file.read().strip())
+        except (OSError, ValueError):
+            return None
+        return pid if process_exists(pid) else None
+
+    def release(self):
+        if not self.locked:
+            return
+        if fcntl is None:
             os.close(self.fd)
             os.remove(self.file)
+        else:
+            if not self.shared:
+                os.ftruncate(self.fd, 0)
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
 
 
 class FileManager(object):
@@ -105,6 +352,30 @@ class FileManager(object):
     def path(self):
         return self._path
 
+    @property
+    def program_path(self):
+        """
+        :return: the directory of the files shipped with the program, the directory of the executable when frozen by
+        py2exe and of this module otherwise, whatever the working directory is
+        """
+        if getattr(sys, "frozen", False):
+            return os.path.dirname(sys.executable)
+        return os.path.dirname(os.path.abspath(__file__))
+
+    @property
+    def artifacts_path(self):
+        """
+        :return: the directory of the images shipped with the program
+        """
+        return os.path.join(self.program_path, "artifacts")
+
+    @property
+    def languages_path(self):
+        """
+        :return: the directory of the language files shipped with the program
+        """
+        return os.path.join(self.program_path, "languages")
+
     def data_directory_exist(self):
         return os.path.exists(self._path)
 
@@ -113,14 +384,13 @@ class FileManager(object):
             os.mkdir(self._path)
 
     def find_all_db_files(self):
-        return self.find_files_with_extension(".db")
+        """
+        :return: the DB files of the data directory, without the -wal and -shm files SQLite keeps next to open DBs
+        """
+        return [filename for filename in os.listdir(self._path) if filename.endswith(".db")]
 
     def find_all_xlsx_files(self):
         return self.find_files_with_extension(".xlsx")
 
     def find_files_with_extension(self, extension):
         return [filename for filename in os.listdir(self._path) if extension in filename]
-
-    @staticmethod
-    def load_photos():
-        return [file for file in os.listdir('artifacts') if ".png" in file]
@@ -1,116 +1,260 @@
+import json
+import os
+import threading
+
 import bookcase_lib as lib
 
+DEFAULT_LANGUAGE = "en"
 
-class Translations(object, metaclass=lib.Singleton):
-    def __init__(self):
-        self.author_first_name_desc = {"en": '* Author First Name',
-                                       "gr": '* Όνομα Συγγραφέα'}
-        self.author_last_name_desc = {"en": '* Author Last Name',
-                                      "gr": '* Επίθετο Συγγραφέα'}
-        self.author_text = {"en": 'Author',
-                            "gr": 'Συγγραφέας'}
-        self.book_deleted_msg = {"en": 'Book Deleted',
-                                 "gr": 'Το βιβλίο διαφράφηκε'}
-        self.book_saved_msg = {"en": 'Book Saved',
-                               "gr": 'Το βιβλίο αποθηκεύτηκε'}
-        self.cancel_text = {"en": 'Cancel',
-                            "gr": 'Άκυρο'}
-        self.create_book_button_desc = {"en": 'Create a new book entry',
-                                        "gr": 'Δημιουργία Νέου Βιβλίου'}
-        self.create_button_desc = {"en": 'Create a new Bookcase Database',
-                                   "gr": 'Δημιουργία Καινούργιας Βιβλιοθήκης'}
-        self.create_window_title = {"en": 'Create',
-                                    "gr": 'Δημιουργία'}
-        self.delete_confirm_msg = {"en": 'Are you sure you want to delete: ',
-                                   "gr": 'Είστε σίγουροι ότι θέλετε να διαγράψετε το βιβλίο: '}
-        self.delete_text = {"en": 'Delete',
-                            "gr": 'Διαγραφή'}
-        self.enter_db_name_msg = {"en": 'Enter DB Name:',
-                                  "gr": 'Επιλέξτε όνομα νέας βιβλιοθήκης:'}
-        self.exit_button_desc = {"en": 'Close Loaded Database',
-                                 "gr": 'Κλείσιμο ανοιχτής βιβλιοθήκης'}
-        self.exported_to = {"en": 'Successfully Exported to ',
-                            "gr": 'Επιτυχής εξαγωγή στο '}
-        self.export_excel = {"en": 'Export to Excel',
-                             "gr": 'Εξαγωγή σε Excel'}
-        self.found = {"en": 'Found',
-                      "gr": 'Βρέθηκαν'}
-        self.genre_text = {"en": "Genre",
-                           "gr": "Είδος"}
-        self.imported_from = {"en": 'Successfully Imported from ',
-                              "gr": 'Επιτυχής Εισαγωγή από '}
-        self.import_excel = {"en": 'Import from Excel',
-                             "gr": 'Εισαγωγή από Excel'}
-        self.import_export_desc = {"en": 'Import/Export Bookcase',
-                                   "gr": 'Εισαγωγή/Εξαγωγή βιβλιοθήκης'}
-        self.invalid_xl_msg = {"en": "Excel file not created by Bookcase Manager",
-                               "gr": "Το αρχείο δεν έχει δημιουργηθεί από το πρόγραμμα"}
-        self.isbn_validation_warn = {"en": 'Invalid ISBN format - Must be 10 or 13 digit long',
-                                     "gr": 'Το ISBN πρέπει να αποτελείται από 10 ή 13 ψηφία'}
-        self.mandatory_fields_warn = {"en": 'Fields with asterisk (*) are mandatory',
-                                      "gr": 'Τα πεδία με αστερίσκο (*) είναι υποχρεωτικά'}
-        self.no_books_found_msg = {"en": 'No books found matching the search criteria',
-                                   "gr": 'Δε βρέθηκαν βιβλία που να ταιριάζουν στα κριτήρια αναζήτησης'}
-        self.no_file_found_msg = {"en": 'No matching files found under ',
-                                  "gr": 'Δε βρέθηκαν αρχεία στο '}
-        self.no_spaces_in_names_warn = {"en": 'Use - instead of spaces in names',
-                                        "gr": 'Χρησιμοποιήστε παύλα αντί για κενό στα ονόματα'}
-        self.num_of_copies_desc = {"en": 'Num of Copies',
-                                   "gr": 'Αντίτυπα'}
-        self.num_of_copies_warn = {"en": 'Number of copies must be a number greater than 1',
-                                   "gr": 'Ο αριθμός αντιτύπων πρέπει να είναι μεγαλύτερος ίσος του 1'}
-        self.ok_text = {"en": 'Ok',
-                        "gr": 'Εντάξει'}
-        self.open_button_desc = {"en": 'Load an existing Bookcase Database',
-                                 "gr": 'Φόρτωση Βιβλιοθήκης'}
-        self.open_window_title = {"en": 'Open',
-                                  "gr": 'Άνοιγμα'}
-        self.publication_year_desc = {"en": 'Publication Year',
-                                      "gr": 'Έτος έκδοσης'}
-        self.publisher_desc = {"en": 'Publisher',
-                               "gr": 'Εκδοτικός Οίκος'}
-        self.save_text = {"en": 'Save',
-                          "gr": 'Αποθήκευση'}
-        self.search_button_desc = {"en": 'Search for book(s)',
-                                   "gr": 'Αναζήτηση Βιβλίων'}
-        self.search_complete_msg = {"en": 'books - Double click on book to open',
-                                    "gr": 'βιβλία - '
-                                          'Πατήστε διπλό κλικ πάνω στο βιβλίο που θέλετε να επεξεργαστείτε'}
-        self.search_text = {"en": 'Search',
-                            "gr": 'Αναζήτηση'}
-        self.shelf_col_desc = {"en": 'Shelf Column',
-                               "gr": 'Ράφι Στήλη'}
-        self.shelf_no_numbers_warn = {"en": 'Both Shelf column and row must be numbers',
-                                      "gr": 'Και η γραμμή και η στήλη πρέπει να είναι αριθμοί'}
-        self.shelf_row_col_not_set_warn = {"en": 'Both Shelf column and row must be set',
-                                           "gr": 'Το ράφι πρέπει να αποτελείται απο γραμμή ΚΑΙ στήλη'}
-        self.shelf_row_desc = {"en": 'Shelf Row',
-                               "gr": 'Ράφι Γραμμή'}
-        self.shelf_text = {"en": 'Shelf (Row-Column)',
-                           "gr": 'Ράφι (Γραμμή-Στήλη)'}
-        self.title_msg = {"en": '* Title',
-                          "gr": '* Τίτλος'}
-        self.title_text = {"en": 'Title',
-                           "gr": 'Τίτλος'}
-        self.translator_first_name_desc = {"en": 'Translator First Name',
-                                           "gr": 'Όνομα Μεταφραστη'}
-        self.translator_last_name_desc = {"en": 'Translator Last Name',
-                                          "gr": 'Επίθετο Μεταφραστή'}
-        self.translator_validation_warn = {"en": 'Both First and Last translator names should be set',
-                                           "gr": 'Ο Μεταφραστλης πρέπεί να έχει όνομα και επώνυμο'}
-        self.welcome_msg = {"en": 'Welcome',
-                            "gr": 'Καλώς ήρθατε!'}
-        self.year_validation_warning = {"en": 'Invalid year format',
-                                        "gr": 'Λάθος Έτος Έκδοσης'}
-
-    def __getattribute__(self, item):
-        text = super(Translations, self).__getattribute__(item)
-        return text[get_language()]
+LANGUAGE_FILE_EXTENSION = ".json"
 
+TEXTS = {
+    "advanced_search_text": {"en": 'Advanced',
+                             "gr": 'Σύνθετη'},
+    "author_first_name_desc": {"en": '* Author First Name',
+                               "gr": '* Όνομα Συγγραφέα'},
+    "author_last_name_desc": {"en": '* Author Last Name',
+                              "gr": '* Επίθετο Συγγραφέα'},
+    "author_text": {"en": 'Author',
+                    "gr": 'Συγγραφέας'},
+    "batch_import_excel": {"en": 'Import many Excel files (all sheets)',
+                           "gr": 'Εισαγωγή πολλών αρχείων Excel (όλα τα φύλλα)'},
+    "book_deleted_msg": {"en": 'Book Deleted',
+                         "gr": 'Το βιβλίο διαφράφηκε'},
+    "book_saved_msg": {"en": 'Book Saved',
+                       "gr": 'Το βιβλίο αποθηκεύτηκε'},
+    "cancel_text": {"en": 'Cancel',
+                    "gr": 'Άκυρο'},
+    "create_book_button_desc": {"en": 'Create a new book entry',
+                                "gr": 'Δημιουργία Νέου Βιβλίου'},
+    "create_button_desc": {"en": 'Create a new Bookcase Database',
+                           "gr": 'Δημιουργία Καινούργιας Βιβλιοθήκης'},
+    "create_window_title": {"en": 'Create',
+                            "gr": 'Δημιουργία'},
+    "db_busy_msg": {"en": 'The database is being read by another program, try again: ',
+                    "gr": 'Η βάση δεδομένων διαβάζεται από άλλο πρόγραμμα, δοκιμάστε ξανά: '},
+    "db_locked_msg": {"en": 'The database is being modified by another program: ',
+                      "gr": 'Η βάση δεδομένων τροποποιείται από άλλο πρόγραμμα: '},
+    "delete_confirm_msg": {"en": 'Are you sure you want to delete: ',
+                           "gr": 'Είστε σίγουροι ότι θέλετε να διαγράψετε το βιβλίο: '},
+    "delete_text": {"en": 'Delete',
+                    "gr": 'Διαγραφή'},
+    "enter_db_name_msg": {"en": 'Enter DB Name:',
+                          "gr": 'Επιλέξτε όνομα νέας βιβλιοθήκης:'},
+    "exit_button_desc": {"en": 'Close Loaded Database',
+                         "gr": 'Κλείσιμο ανοιχτής βιβλιοθήκης'},
+    "exported_to": {"en": 'Successfully Exported to ',
+                    "gr": 'Επιτυχής εξαγωγή στο '},
+    "exporting_msg": {"en": 'Exporting... books:',
+                      "gr": 'Εξαγωγή... βιβλία:'},
+    "export_to": {"en": 'Export to ',
+                  "gr": 'Εξαγωγή σε '},
+    "found": {"en": 'Found',
+              "gr": 'Βρέθηκαν'},
+    "genre_text": {"en": "Genre",
+                   "gr": "Είδος"},
+    "imported_from": {"en": 'Successfully Imported from ',
+                      "gr": 'Επιτυχής Εισαγωγή από '},
+    "import_from": {"en": 'Import from ',
+                    "gr": 'Εισαγωγή από '},
+    "importing_msg": {"en": 'Importing... books:',
+                      "gr": 'Εισαγωγή... βιβλία:'},
+    "import_export_desc": {"en": 'Import/Export Bookcase',
+                           "gr": 'Εισαγωγή/Εξαγωγή βιβλιοθήκης'},
+    "invalid_file_msg": {"en": "File not created by Bookcase Manager",
+                         "gr": "Το αρχείο δεν έχει δημιουργηθεί από το πρόγραμμα"},
+    "invalid_xl_msg": {"en": "Excel file not created by Bookcase Manager",
+                       "gr": "Το αρχείο δεν έχει δημιουργηθεί από το πρόγραμμα"},
+    "isbn_validation_warn": {"en": 'Invalid ISBN format - Must be 10 or 13 digit long',
+                             "gr": 'Το ISBN πρέπει να αποτελείται από 10 ή 13 ψηφία'},
+    "loading_msg": {"en": 'Loading...',
+                    "gr": 'Φόρτωση...'},
+    "mandatory_fields_warn": {"en": 'Fields with asterisk (*) are mandatory',
+                              "gr": 'Τα πεδία με αστερίσκο (*) είναι υποχρεωτικά'},
+    "no_books_found_msg": {"en": 'No books found matching the search criteria',
+                           "gr": 'Δε βρέθηκαν βιβλία που να ταιριάζουν στα κριτήρια αναζήτησης'},
+    "no_file_found_msg": {"en": 'No matching files found under ',
+                          "gr": 'Δε βρέθηκαν αρχεία στο '},
+    "no_spaces_in_names_warn": {"en": 'Use - instead of spaces in names',
+                                "gr": 'Χρησιμοποιήστε παύλα αντί για κενό στα ονόματα'},
+    "num_of_copies_desc": {"en": 'Num of Copies',
+                           "gr": 'Αντίτυπα'},
+    "num_of_copies_warn": {"en": 'Number of copies must be a number greater than 1',
+                           "gr": 'Ο αριθμός αντιτύπων πρέπει να είναι μεγαλύτερος ίσος του 1'},
+    "ok_text": {"en": 'Ok',
+                "gr": 'Εντάξει'},
+    "open_button_desc": {"en": 'Load an existing Bookcase Database',
+                         "gr": 'Φόρτωση Βιβλιοθήκης'},
+    "open_window_title": {"en": 'Open',
+                          "gr": 'Άνοιγμα'},
+    "preparing_db_msg": {"en": 'Preparing the database... steps done:',
+                         "gr": 'Προετοιμασία βάσης δεδομένων... ολοκληρωμένα βήματα:'},
+    "publication_year_desc": {"en": 'Publication Year',
+                              "gr": 'Έτος έκδοσης'},
+    "publisher_desc": {"en": 'Publisher',
+                       "gr": 'Εκδοτικός Οίκος'},
+    "save_text": {"en": 'Save',
+                  "gr": 'Αποθήκευση'},
+    "search_button_desc": {"en": 'Search for book(s)',
+                           "gr": 'Αναζήτηση Βιβλίων'},
+    "searching_msg": {"en": 'Searching...',
+                      "gr": 'Αναζήτηση...'},
+    "search_complete_msg": {"en": 'books - Double click on book to open',
+                            "gr": 'βιβλία - '
+                            'Πατήστε διπλό κλικ πάνω στο βιβλίο που θέλετε να επεξεργαστείτε'},
+    "search_text": {"en": 'Search',
+                    "gr": 'Αναζήτηση'},
+    "shelf_col_desc": {"en": 'Shelf Column',
+                       "gr": 'Ράφι Στήλη'},
+    "shelf_no_numbers_warn": {"en": 'Both Shelf column and row must be numbers',
+                              "gr": 'Και η γραμμή και η στήλη πρέπει να είναι αριθμοί'},
+    "shelf_row_col_not_set_warn": {"en": 'Both Shelf column and row must be set',
+                                   "gr": 'Το ράφι πρέπει να αποτελείται απο γραμμή ΚΑΙ στήλη'},
+    "shelf_row_desc": {"en": 'Shelf Row',
+                       "gr": 'Ράφι Γραμμή'},
+    "shelf_prefix_text": {"en": 'Shelf starts with',
+                          "gr": 'Ράφι που ξεκινά με'},
+    "shelf_text": {"en": 'Shelf (Row-Column)',
+                   "gr": 'Ράφι (Γραμμή-Στήλη)'},
+    "title_msg": {"en": '* Title',
+                  "gr": '* Τίτλος'},
+    "title_text": {"en": 'Title',
+                   "gr": 'Τίτλος'},
+    "translator_first_name_desc": {"en": 'Translator First Name',
+                                   "gr": 'Όνομα Μεταφραστη'},
+    "translator_last_name_desc": {"en": 'Translator Last Name',
+                                  "gr": 'Επίθετο Μεταφραστή'},
+    "translator_validation_warn": {"en": 'Both First and Last translator names should be set',
+                                   "gr": 'Ο Μεταφραστλης πρέπεί να έχει όνομα και επώνυμο'},
+    "welcome_msg": {"en": 'Welcome',
+                    "gr": 'Καλώς ήρθατε!'},
+    "year_from_text": {"en": 'Year from',
+                       "gr": 'Έτος από'},
+    "year_to_text": {"en": 'to',
+                     "gr": 'έως'},
+    "year_validation_warning": {"en": 'Invalid year format',
+                                "gr": 'Λάθος Έτος Έκδοσης'},
+}
 
-def get_language():
-    try:
-        return lib.Configuration().get_config("gui_language")
-    except KeyError:
-        return "en"
+TEXT_NAMES = tuple(sorted(TEXTS))
+
+
+def read_only(catalog, *args):
+    raise AttributeError("translation catalogs are read only")
+
+
+class Catalog(object):
+    """
+    The texts of one language, built once
+    Texts are slots so a lookup is a plain attribute access, and the catalog cannot be changed after it is built
+    """
+    __slots__ = ("language",) + TEXT_NAMES
+
+    def __init__(self, language, texts, fallback=None):
+        """
+        :param language: the language code, e.g. "en"
+        :param texts: dict mapping the text names to the texts of the language
+        :param fallback: Catalog whose texts are used for the names missing from texts
+        """
+        object.__setattr__(self, "language", language)
+        for name in TEXT_NAMES:
+            object.__setattr__(self, name, texts[name] if name in texts else getattr(fallback, name))
+
+    __setattr__ = read_only
+    __delattr__ = read_only
+
+    @classmethod
+    def from_file(cls, filename, fallback):
+        """
+        Builds the catalog of a language file, a JSON object mapping text names to texts named after the language,
+        e.g. fr.json. Unknown names are ignored
+        :param filename: path of the language file
+        :param fallback: Catalog of the texts missing from the file
+        :raises: ValueError if the file is not a JSON object
+        """
+        with open(filename, encoding="utf-8") as file:
+            texts = json.load(file)
+        if not isinstance(texts, dict):
+            raise ValueError("{filename} is not a JSON object".format(filename=filename))
+        language = os.path.splitext(os.path.basename(filename))[0]
+        return cls(language, {name: str(text) for name, text in texts.items() if name in TEXTS}, fallback)
+
+
+def builtin_catalogs():
+    """
+    :return: dict mapping the languages of TEXTS to their catalogs
+    """
+    default = Catalog(DEFAULT_LANGUAGE, {name: texts[DEFAULT_LANGUAGE] for name, texts in TEXTS.items()})
+    catalogs = {DEFAULT_LANGUAGE: default}
+    for language in sorted(set(language for texts in TEXTS.values() for language in texts) - {DEFAULT_LANGUAGE}):
+        catalogs[language] = Catalog(language, {name: texts[language] for name, texts in TEXTS.items()
+                                                if language in texts}, default)
+    return catalogs
 
+
+def language_files():
+    """
+    :return: the language files of the languages directory of the program and of the data directory,
+             the latter overriding the former
+    """
+    files = []
+    for directory in (lib.FileManager().languages_path, os.path.join(lib.FileManager().path, "languages")):
+        if os.path.isdir(directory):
+            files.extend(os.path.join(directory, filename) for filename in sorted(os.listdir(directory))
+                         if filename.endswith(LANGUAGE_FILE_EXTENSION))
+    return files
+
+
+class Translations(object):
+    """
+    The texts of the GUI in the active language, e.g. Translations().title_text
+    Calling Translations returns the active Catalog, switching the language swaps the active catalog.
+    Catalogs are built once, on first use, from TEXTS and the language files
+    """
+    catalogs = None
+    active = None
+    lock = threading.Lock()
+
+    def __new__(cls):
+        return cls.active or cls.load()
+
+    @classmethod
+    def load(cls):
+        """
+        Builds the catalogs and activates the language of the configuration
+        Language files that cannot be read are skipped, their language keeps its builtin catalog if it has one
+        :return: the active Catalog
+        """
+        with cls.lock:
+            if cls.catalogs is None:
+                catalogs = builtin_catalogs()
+                for filename in language_files():
+                    try:
+                        catalog = Catalog.from_file(filename, catalogs[DEFAULT_LANGUAGE])
+                    except (ValueError, KeyError, OSError):
+                        continue
+                    catalogs[catalog.language] = catalog
+                cls.catalogs = catalogs
+                cls.active = catalogs.get(get_language(), catalogs[DEFAULT_LANGUAGE])
+        return cls.active
+
+    @classmethod
+    def languages(cls):
+        """
+        :return: sorted list of the available language codes
+        """
+        cls.load()
+        return sorted(cls.catalogs)
+
+    @classmethod
+    def set_language(cls, language):
+        """
+        Activates the catalog of a language
+        :raises: KeyError if the language is not available
+        """
+        cls.load()
+        cls.active = cls.catalogs[language]
+
+
+def get_language():
+    return lib.Configuration().get_config("gui_language", default=DEFAULT_LANGUAGE)
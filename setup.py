@@ -1,7 +1,8 @@
 from distutils.core import setup
 import py2exe
 import os
-images = [os.path.join(os.path.abspath('artifacts'), file) for file in os.listdir('artifacts')]
+artifacts = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+images = [os.path.join(artifacts, file) for file in os.listdir(artifacts)]
 setup(name="Bookcase Manager",
       version="1.0",
       description="Application to manage your home library",
@@ -13,7 +14,7 @@ setup(name="Bookcase Manager",
       options={
           'py2exe': {
               'packages': ['sqlalchemy', 'openpyxl'],
-              'includes': ['bookcase_db', 'bookcase_excel', 'bookcase_gui'],
+              'includes': ['bookcase_cli', 'bookcase_csv', 'bookcase_db', 'bookcase_excel', 'bookcase_gui'],
               'bundle_files': 2
           }
       },